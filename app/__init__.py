@@ -127,6 +127,7 @@ def create_app(config_class: type[Config] | Config = Config) -> Flask:
         "ADJUNTOS_UPLOAD_FOLDER": upload_root / app.config.get("ADJUNTOS_SUBFOLDER", "adjuntos"),
         "DOCSCAN_UPLOAD_FOLDER": upload_root / app.config.get("DOCSCAN_SUBFOLDER", "docscan"),
         "EQUIPOS_UPLOAD_FOLDER": upload_root / app.config.get("EQUIPOS_SUBFOLDER", "equipos"),
+        "QR_CACHE_FOLDER": upload_root / app.config.get("QR_SUBFOLDER", "qr"),
     }.items():
         folder.mkdir(parents=True, exist_ok=True)
         app.config[key] = str(folder)
@@ -204,7 +205,9 @@ def create_app(config_class: type[Config] | Config = Config) -> Flask:
     # Make available inside Jinja templates
     app.jinja_env.globals['endpoint_exists'] = endpoint_exists
 
-    from app.models.usuario import Usuario  # imported lazily to avoid circular imports
+    from app.models.rol import Rol  # imported lazily to avoid circular imports
+    from app.models.usuario import Usuario
+    from app.security.principal import get_principal_cache
 
     @login_manager.user_loader
     def load_user(user_id: str) -> Usuario | None:  # type: ignore[override]
@@ -214,12 +217,16 @@ def create_app(config_class: type[Config] | Config = Config) -> Flask:
             user_pk = int(user_id)
         except (ValueError, TypeError):  # pragma: no cover - defensive
             return None
-        stmt = (
-            select(Usuario)
-            .options(joinedload(Usuario.rol))
-            .where(Usuario.id == user_pk)
-        )
-        return db.session.execute(stmt).scalar_one_or_none()
+        options = [joinedload(Usuario.rol)]
+        if get_principal_cache().peek(user_pk) is None:
+            # First request of this user in the process: bring what the
+            # principal is compiled from in the same round trip.
+            options = [
+                joinedload(Usuario.rol).joinedload(Rol.permisos),
+                joinedload(Usuario.hospitales_roles),
+            ]
+        stmt = select(Usuario).options(*options).where(Usuario.id == user_pk)
+        return db.session.execute(stmt).unique().scalar_one_or_none()
 
     from app.routes.actas import actas_bp
     from app.routes.adjuntos import adjuntos_bp
@@ -266,6 +273,10 @@ def create_app(config_class: type[Config] | Config = Config) -> Flask:
 
     app.add_url_rule("/", endpoint="index", view_func=app.view_functions["main.index"])
 
+    from app.services import audit_service
+
+    audit_service.init_app(app)
+
     # Materialise the favicon lazily so we avoid storing binary blobs in the
     # repository while still serving ``/static/favicon.ico`` and preventing the
     # browser from issuing 404 requests for the asset.
@@ -112,5 +112,326 @@ def register_commands(app: Flask) -> None:
             )
         db.session.commit()
 
+    @app.cli.group("metrics")
+    def metrics_group() -> None:
+        """Comandos de métricas del dashboard."""
+
+    @metrics_group.command("snapshot")
+    @with_appcontext
+    def metrics_snapshot_command() -> None:
+        """Store today's KPI snapshot in metricas_diarias (replacing it)."""
+
+        from app.services.metricas_service import take_snapshot
+
+        rows = take_snapshot(db.session)
+        click.secho(f"Snapshot de métricas guardado ({rows} filas).", fg="green")
+
+    @app.cli.group("insumos")
+    def insumos_group() -> None:
+        """Comandos de mantenimiento de insumos."""
+
+    @insumos_group.command("reconstruir-hospitales")
+    @with_appcontext
+    def rebuild_insumo_hospital_command() -> None:
+        """Rebuild the insumo_hospital table from active equipment associations."""
+
+        from app.services.insumo_service import reconstruir_insumo_hospital
+
+        filas = reconstruir_insumo_hospital()
+        click.secho(f"Tabla insumo_hospital reconstruida ({filas} filas).", fg="green")
+
+    @app.cli.group("equipos")
+    def equipos_group() -> None:
+        """Comandos del inventario de equipos."""
+
+    @equipos_group.command("import")
+    @click.argument("archivo", type=click.Path(exists=True, dir_okay=False))
+    @click.option(
+        "--usuario",
+        "username",
+        default=None,
+        help="Usuario al que se atribuyen las altas en el historial.",
+    )
+    @click.option(
+        "--batch-size",
+        "batch_size",
+        default=None,
+        type=click.IntRange(min=1),
+        help="Equipos insertados por transacción (por defecto EQUIPOS_IMPORT_BATCH_SIZE).",
+    )
+    @with_appcontext
+    def equipos_import_command(archivo: str, username: str | None, batch_size: int | None) -> None:
+        """Import equipos from a CSV or XLSX file."""
+
+        from app.models import Usuario
+        from app.services.audit_service import log_action
+        from app.services.equipo_import_service import importar_equipos
+
+        usuario_id = None
+        if username:
+            usuario_id = db.session.scalar(select(Usuario.id).where(Usuario.username == username))
+            if usuario_id is None:
+                raise click.BadParameter(f"No existe el usuario {username}.", param_hint="--usuario")
+
+        try:
+            with open(archivo, "rb") as handle:
+                result = importar_equipos(
+                    db.session,
+                    handle,
+                    archivo,
+                    usuario_id=usuario_id,
+                    batch_size=batch_size or current_app.config["EQUIPOS_IMPORT_BATCH_SIZE"],
+                )
+        except ValueError as exc:
+            raise click.ClickException(str(exc)) from exc
+
+        for error in result.errores:
+            click.echo(f"Fila {error.fila}: {error.mensaje}", err=True)
+        log_action(
+            usuario_id=usuario_id,
+            accion="importar",
+            modulo="inventario",
+            tabla="equipos",
+            cambios={
+                "archivo": archivo,
+                "filas": result.filas,
+                "creados": result.creados,
+                "errores": len(result.errores),
+            },
+        )
+        db.session.commit()
+        click.secho(
+            f"Equipos importados: {result.creados} de {result.filas} filas, "
+            f"{len(result.errores)} con errores ({result.filas_por_segundo:.0f} filas/s).",
+            fg="green" if not result.errores else "yellow",
+        )
+
+    @equipos_group.command("etiquetas")
+    @click.option("--hospital", "hospital_id", type=int, default=None, help="ID del hospital.")
+    @click.option("--servicio", "servicio_id", type=int, default=None, help="ID del servicio.")
+    @click.option("--oficina", "oficina_id", type=int, default=None, help="ID de la oficina.")
+    @click.option("--estado", "estado", default=None, help="Estado de los equipos (p. ej. operativo).")
+    @click.option(
+        "--output",
+        "output",
+        type=click.Path(dir_okay=False),
+        default="etiquetas.pdf",
+        show_default=True,
+        help="Archivo generado (HTML si WeasyPrint no está instalado).",
+    )
+    @click.option(
+        "--base-url",
+        "base_url",
+        default=None,
+        help="URL pública codificada en los QR (por defecto QR_BASE_URL).",
+    )
+    @click.option(
+        "--processes",
+        "processes",
+        type=click.IntRange(min=1),
+        default=None,
+        help="Procesos que generan los QR faltantes (por defecto QR_RENDER_PROCESSES o CPUs).",
+    )
+    @with_appcontext
+    def equipos_etiquetas_command(
+        hospital_id: int | None,
+        servicio_id: int | None,
+        oficina_id: int | None,
+        estado: str | None,
+        output: str,
+        base_url: str | None,
+        processes: int | None,
+    ) -> None:
+        """Write a printable QR label sheet for the matching equipos."""
+
+        import os
+        import time
+        from pathlib import Path
+
+        from app.models import Equipo, EstadoEquipo
+        from app.services import pdf_service
+        from app.services.etiqueta_service import preparar_etiquetas, render_hoja
+
+        seleccion = Equipo.query
+        if hospital_id:
+            seleccion = seleccion.filter(Equipo.hospital_id == hospital_id)
+        if servicio_id:
+            seleccion = seleccion.filter(Equipo.servicio_id == servicio_id)
+        if oficina_id:
+            seleccion = seleccion.filter(Equipo.oficina_id == oficina_id)
+        if estado:
+            try:
+                seleccion = seleccion.filter(Equipo.estado == EstadoEquipo(estado))
+            except ValueError as exc:
+                raise click.BadParameter(f"Estado desconocido: {estado}.", param_hint="--estado") from exc
+
+        started = time.perf_counter()
+        try:
+            etiquetas = preparar_etiquetas(
+                seleccion,
+                base_url=base_url,
+                processes=processes
+                or current_app.config.get("QR_RENDER_PROCESSES")
+                or os.cpu_count()
+                or 1,
+            )
+        except RuntimeError as exc:
+            raise click.ClickException(str(exc)) from exc
+        if not etiquetas:
+            click.echo("No hay equipos con ese filtro.")
+            return
+        output_path = Path(output)
+        if pdf_service.HTML is None and output_path.suffix.lower() == ".pdf":
+            output_path = output_path.with_suffix(".html")
+            click.echo("WeasyPrint no está disponible: la hoja se genera en HTML.", err=True)
+        path = render_hoja(etiquetas, output_path)
+        click.secho(
+            f"{len(etiquetas)} etiquetas en {path} ({time.perf_counter() - started:.1f} s).",
+            fg="green",
+        )
+
+    @app.cli.group("search")
+    def search_group() -> None:
+        """Comandos del índice de búsqueda global."""
+
+    @search_group.command("reindex")
+    @click.option(
+        "--batch-size",
+        "batch_size",
+        default=500,
+        show_default=True,
+        type=click.IntRange(min=1),
+        help="Cantidad de registros indexados por transacción.",
+    )
+    @click.option(
+        "--if-empty",
+        "if_empty",
+        is_flag=True,
+        help="Reconstruir solo si el índice está vacío (p. ej. tras crear la tabla).",
+    )
+    @with_appcontext
+    def search_reindex_command(batch_size: int, if_empty: bool) -> None:
+        """Rebuild the search_documents index from the source tables."""
+
+        from app.models import SearchDocument
+        from app.services.search_index_service import reindex_all
+
+        if if_empty and db.session.scalar(select(SearchDocument.id).limit(1)) is not None:
+            click.echo("El índice de búsqueda ya tiene documentos; no se reconstruye.")
+            return
+        total = reindex_all(batch_size=batch_size, echo=click.echo)
+        click.secho(f"Índice de búsqueda reconstruido ({total} documentos).", fg="green")
+
+    @app.cli.group("audit")
+    def audit_group() -> None:
+        """Comandos de mantenimiento de la auditoría."""
+
+    def _parse_month_option(ctx, param, value):
+        from app.services.audit_archive_service import parse_month
+
+        try:
+            return parse_month(value)
+        except ValueError as exc:
+            raise click.BadParameter(str(exc)) from exc
+
+    @audit_group.command("archive")
+    @click.option(
+        "--before",
+        "before",
+        required=True,
+        callback=_parse_month_option,
+        help="Mes (AAAA-MM) desde el cual se conservan los registros.",
+    )
+    @click.option(
+        "--output",
+        "output",
+        type=click.Path(file_okay=False),
+        default=None,
+        help="Carpeta de los archivos .jsonl.gz (por defecto AUDIT_ARCHIVE_FOLDER).",
+    )
+    @click.option(
+        "--batch-size",
+        "batch_size",
+        default=1000,
+        show_default=True,
+        type=click.IntRange(min=1),
+        help="Cantidad de registros exportados y eliminados por transacción.",
+    )
+    @click.option(
+        "--detach-only",
+        is_flag=True,
+        help="En PostgreSQL, desvincular las particiones sin eliminarlas.",
+    )
+    @with_appcontext
+    def audit_archive_command(before, output, batch_size: int, detach_only: bool) -> None:
+        """Export audit entries older than --before to JSONL and remove them."""
+
+        from app.services.audit_archive_service import archive_before
+
+        result = archive_before(
+            db.session,
+            before,
+            output or current_app.config["AUDIT_ARCHIVE_FOLDER"],
+            batch_size=batch_size,
+            detach_only=detach_only,
+            echo=click.echo,
+        )
+        click.secho(
+            f"Auditoría archivada: {result.rows} registros en {len(result.files)} archivos.",
+            fg="green",
+        )
+
+    @audit_group.command("partitions")
+    @click.option(
+        "--months-ahead",
+        "months_ahead",
+        default=3,
+        show_default=True,
+        type=click.IntRange(min=0),
+        help="Meses futuros para los que se crean particiones.",
+    )
+    @with_appcontext
+    def audit_partitions_command(months_ahead: int) -> None:
+        """Create the upcoming monthly partitions of auditorias (PostgreSQL)."""
+
+        from app.services.audit_archive_service import ensure_partitions, is_partitioned
+
+        if not is_partitioned(db.session):
+            click.echo("La tabla auditorias no está particionada en esta base.")
+            return
+        created = ensure_partitions(db.session, months_ahead=months_ahead, echo=click.echo)
+        click.secho(f"Particiones creadas: {', '.join(created) or 'ninguna'}.", fg="green")
+
+    # ``flask db`` is the Flask-Migrate group registered by ``init_extensions``.
+    db_group = app.cli.commands.get("db")
+    if db_group is None:
+        return
+
+    @db_group.command("index-audit")
+    @click.option(
+        "--strict",
+        is_flag=True,
+        help="Terminar con código 1 si hay columnas sin índice.",
+    )
+    @with_appcontext
+    def db_index_audit_command(strict: bool) -> None:
+        """Report foreign keys and relationship orderings without a covering index."""
+
+        from app.services.index_audit_service import ALLOWED_UNINDEXED, audit_indexes
+
+        findings = audit_indexes(db.metadata, db.Model.registry, ALLOWED_UNINDEXED)
+        for finding in findings:
+            click.echo(str(finding))
+        if not findings:
+            click.secho(
+                "Todas las claves foráneas y ordenamientos tienen índice "
+                f"(salvo {len(ALLOWED_UNINDEXED)} excepciones documentadas).",
+                fg="green",
+            )
+            return
+        click.secho(f"{len(findings)} columnas sin índice.", fg="yellow")
+        if strict:
+            raise SystemExit(1)
+
 
 __all__ = ["register_commands"]
@@ -228,6 +228,37 @@ class EquipoFiltroForm(FlaskForm):
         ]
 
 
+def _optional_int(value) -> int | None:
+    return int(value) if value not in (None, "", "0") else None
+
+
+class EquipoLoteForm(FlaskForm):
+    """Bulk state or location change over selected or filtered equipment."""
+
+    aplicar_filtro = BooleanField("Aplicar a todos los equipos del filtro actual")
+    estado = SelectField("Nuevo estado", coerce=str, validators=[Optional()])
+    hospital_id = SelectField(
+        "Hospital destino", coerce=_optional_int, validators=[Optional()], validate_choice=False
+    )
+    servicio_id = SelectField(
+        "Servicio destino", coerce=_optional_int, validators=[Optional()], validate_choice=False
+    )
+    oficina_id = SelectField(
+        "Oficina destino", coerce=_optional_int, validators=[Optional()], validate_choice=False
+    )
+    motivo = StringField("Motivo", validators=[Optional(), Length(max=255)])
+    submit = SubmitField("Aplicar")
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.estado.choices = [("", "Sin cambios")] + [
+            (estado.value, estado.name.replace("_", " ").title()) for estado in EstadoEquipo
+        ]
+        self.hospital_id.choices = [("", "Sin cambios")]
+        self.servicio_id.choices = [("", "Sin servicio")]
+        self.oficina_id.choices = [("", "Sin oficina")]
+
+
 class EquipoAdjuntoForm(FlaskForm):
     """Upload form for equipment attachments."""
 
@@ -241,6 +272,19 @@ class EquipoAdjuntoForm(FlaskForm):
     submit = SubmitField("Subir archivo")
 
 
+class EquipoImportForm(FlaskForm):
+    """Upload form for bulk equipment imports."""
+
+    archivo = FileField(
+        "Archivo",
+        validators=[
+            FileRequired(message="Seleccione un archivo"),
+            FileAllowed({"csv", "xlsx"}, "Formatos permitidos: CSV o XLSX"),
+        ],
+    )
+    submit = SubmitField("Importar")
+
+
 class EquipoAdjuntoDeleteForm(FlaskForm):
     """Simple CSRF protected form to remove an attachment."""
 
@@ -395,6 +439,8 @@ __all__ = [
     "EquipoFiltroForm",
     "EquipoAdjuntoForm",
     "EquipoAdjuntoDeleteForm",
+    "EquipoImportForm",
+    "EquipoLoteForm",
     "EquipoHistorialFiltroForm",
     "EquipoActaFiltroForm",
     "TipoEquipoCreateForm",
@@ -10,10 +10,21 @@ from .equipo import Equipo, EquipoHistorial, EstadoEquipo, TipoEquipo
 from .equipo_adjunto import EquipoAdjunto
 from .hospital import Hospital, Oficina, Servicio, Institucion
 from .hospital_usuario_rol import HospitalUsuarioRol
-from .insumo import EquipoInsumo, Insumo, InsumoMovimiento, InsumoSerie, MovimientoTipo, SerieEstado
+from .insumo import (
+    EquipoInsumo,
+    Insumo,
+    InsumoHospital,
+    InsumoMovimiento,
+    InsumoSerie,
+    MovimientoTipo,
+    SerieEstado,
+)
 from .licencia import Licencia, TipoLicencia, EstadoLicencia
+from .metrica import MetricaDiaria
 from .permisos import Modulo, Permiso
 from .rol import Rol
+from .search_document import SearchDocument
+from .secuencia import Secuencia
 from .usuario import Usuario
 from .vlan import Vlan, VlanDispositivo
 
@@ -38,6 +49,7 @@ __all__ = [
     "Oficina",
     "HospitalUsuarioRol",
     "Insumo",
+    "InsumoHospital",
     "InsumoMovimiento",
     "InsumoSerie",
     "EquipoInsumo",
@@ -46,9 +58,12 @@ __all__ = [
     "Licencia",
     "TipoLicencia",
     "EstadoLicencia",
+    "MetricaDiaria",
     "Modulo",
     "Permiso",
     "Rol",
+    "SearchDocument",
+    "Secuencia",
     "Usuario",
     "Vlan",
     "VlanDispositivo",
@@ -9,12 +9,13 @@ from sqlalchemy import (
     DateTime,
     Enum as SAEnum,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
     func,
 )
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.orm import Mapped, mapped_column, query_expression, relationship
 
 from .base import Base
 
@@ -44,7 +45,7 @@ class Acta(Base):
         DateTime(timezone=True), server_default=func.current_timestamp(), nullable=False
     )
     usuario_id: Mapped[int | None] = mapped_column(ForeignKey("usuarios.id"))
-    hospital_id: Mapped[int | None] = mapped_column(ForeignKey("instituciones.id"))
+    hospital_id: Mapped[int | None] = mapped_column(ForeignKey("instituciones.id"), index=True)
     servicio_id: Mapped[int | None] = mapped_column(ForeignKey("servicios.id"))
     oficina_id: Mapped[int | None] = mapped_column(ForeignKey("oficinas.id"))
     observaciones: Mapped[str | None] = mapped_column(Text())
@@ -66,12 +67,19 @@ class Acta(Base):
     items: Mapped[list["ActaItem"]] = relationship(
         "ActaItem", back_populates="acta", cascade="all, delete-orphan"
     )
+    # Number of items, filled in by ``acta_service.actas_de_equipo``.
+    items_count: Mapped[int | None] = query_expression()
 
 
 class ActaItem(Base):
     """Assets included in an acta."""
 
     __tablename__ = "acta_items"
+    __table_args__ = (
+        Index("ix_acta_items_acta_id", "acta_id"),
+        # Semi-join from an equipo to its actas, read from the index alone.
+        Index("ix_acta_items_equipo_id_acta_id", "equipo_id", "acta_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     acta_id: Mapped[int] = mapped_column(ForeignKey("actas.id"), nullable=False)
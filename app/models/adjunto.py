@@ -5,7 +5,7 @@ from datetime import datetime
 from enum import Enum
 from typing import TYPE_CHECKING
 
-from sqlalchemy import DateTime, Enum as SAEnum, ForeignKey, String, Text, func
+from sqlalchemy import DateTime, Enum as SAEnum, ForeignKey, Index, String, Text, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import Base
@@ -30,6 +30,10 @@ class Adjunto(Base):
     """Document attached to an equipment."""
 
     __tablename__ = "adjuntos"
+    __table_args__ = (
+        Index("ix_adjuntos_equipo_id", "equipo_id"),
+        Index("ix_adjuntos_uploaded_at", "uploaded_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     equipo_id: Mapped[int] = mapped_column(ForeignKey("equipos.id"), nullable=False)
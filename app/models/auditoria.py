@@ -4,7 +4,7 @@ from __future__ import annotations
 from datetime import datetime
 from typing import TYPE_CHECKING
 
-from sqlalchemy import DateTime, ForeignKey, Integer, JSON, String, Text, func
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, JSON, String, Text, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import Base
@@ -18,6 +18,15 @@ class Auditoria(Base):
     """Audit entry storing who, what and when."""
 
     __tablename__ = "auditorias"
+    # Filter combinations offered by the audit page, newest first. On
+    # PostgreSQL the table is range partitioned by month on ``created_at``
+    # (see migration 0009), so its primary key there is ``(id, created_at)``.
+    __table_args__ = (
+        Index("ix_auditorias_created_at", "created_at"),
+        Index("ix_auditorias_hospital_id_created_at", "hospital_id", "created_at"),
+        Index("ix_auditorias_usuario_id_created_at", "usuario_id", "created_at"),
+        Index("ix_auditorias_modulo_accion_created_at", "modulo", "accion", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     usuario_id: Mapped[int | None] = mapped_column(ForeignKey("usuarios.id"))
@@ -5,7 +5,7 @@ from datetime import date, datetime
 from enum import Enum
 from typing import TYPE_CHECKING
 
-from sqlalchemy import Date, DateTime, Enum as SAEnum, ForeignKey, String, Text, func
+from sqlalchemy import Date, DateTime, Enum as SAEnum, ForeignKey, Index, String, Text, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import Base
@@ -28,6 +28,10 @@ class Docscan(Base):
     """Scanned document with metadata."""
 
     __tablename__ = "docscan"
+    __table_args__ = (
+        Index("ix_docscan_uploaded_at", "uploaded_at"),
+        Index("ix_docscan_hospital_id_uploaded_at", "hospital_id", "uploaded_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     titulo: Mapped[str] = mapped_column(String(150), nullable=False)
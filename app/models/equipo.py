@@ -22,6 +22,8 @@ from sqlalchemy import (
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
+from app.utils.search import normalize_serial, sqlite_sortable_timestamp
+
 from .base import Base
 if TYPE_CHECKING:  # pragma: no cover
     from .acta import ActaItem
@@ -102,6 +104,9 @@ class Equipo(Base):
     marca: Mapped[str | None] = mapped_column(String(100), index=True)
     modelo: Mapped[str | None] = mapped_column(String(100), index=True)
     numero_serie: Mapped[str | None] = mapped_column(String(120), index=True)
+    # Lowercase copies without separators backing serial prefix searches.
+    numero_serie_norm: Mapped[str | None] = mapped_column(String(120), index=True)
+    codigo_norm: Mapped[str | None] = mapped_column(String(50), index=True)
     sin_numero_serie: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
     hospital_id: Mapped[int] = mapped_column(ForeignKey("instituciones.id"), nullable=False)
     servicio_id: Mapped[int | None] = mapped_column(ForeignKey("servicios.id"))
@@ -145,7 +150,10 @@ class Equipo(Base):
         "EquipoAdjunto", back_populates="equipo", cascade="all, delete-orphan"
     )
     historial: Mapped[list["EquipoHistorial"]] = relationship(
-        "EquipoHistorial", back_populates="equipo", cascade="all, delete-orphan"
+        "EquipoHistorial",
+        back_populates="equipo",
+        cascade="all, delete-orphan",
+        order_by="(EquipoHistorial.fecha.desc(), EquipoHistorial.id.desc())",
     )
 
     @property
@@ -223,4 +231,44 @@ def _tipo_equipo_before_update(mapper, connection, target: TipoEquipo) -> None:
     _ensure_tipo_equipo_slug(target)
 
 
+def _sync_equipo_normalized(target: Equipo) -> None:
+    target.numero_serie_norm = normalize_serial(target.numero_serie)
+    target.codigo_norm = normalize_serial(target.codigo)
+
+
+@event.listens_for(Equipo, "before_insert")
+def _equipo_before_insert(mapper, connection, target: Equipo) -> None:
+    _sync_equipo_normalized(target)
+
+
+@event.listens_for(Equipo, "before_update")
+def _equipo_before_update(mapper, connection, target: Equipo) -> None:
+    _sync_equipo_normalized(target)
+
+
+# The pg_trgm GIN indexes serving substring filters only exist in migration
+# 0007: ``create_all`` must keep working without the extension.
 Index("ix_equipos_descripcion", Equipo.descripcion)
+# Keyset pagination of ``equipos.listar`` (newest first), also per hospital
+# and estado filter.
+Index("ix_equipos_created_at_id", Equipo.created_at, Equipo.id)
+Index("ix_equipos_hospital_id_created_at", Equipo.hospital_id, Equipo.created_at)
+Index("ix_equipos_estado_created_at", Equipo.estado, Equipo.created_at)
+Index("ix_equipos_tipo_id", Equipo.tipo_id)
+Index("ix_equipos_servicio_id", Equipo.servicio_id)
+Index("ix_equipos_oficina_id", Equipo.oficina_id)
+# Cursor pagination of the history feed on ``(fecha, id)``, newest first. On
+# SQLite the cursor sorts on a canonical rendering of ``fecha`` (see
+# ``sqlite_sortable_timestamp``), so the index is built on that expression.
+Index(
+    "ix_equipos_historial_equipo_id_fecha_id",
+    EquipoHistorial.equipo_id,
+    EquipoHistorial.fecha.desc(),
+    EquipoHistorial.id.desc(),
+).ddl_if(callable_=lambda ddl, target, bind, **kw: kw["dialect"].name != "sqlite")
+Index(
+    "ix_equipos_historial_equipo_id_fecha_id",
+    EquipoHistorial.equipo_id,
+    sqlite_sortable_timestamp(EquipoHistorial.fecha).desc(),
+    EquipoHistorial.id.desc(),
+).ddl_if(dialect="sqlite")
@@ -10,15 +10,21 @@ from sqlalchemy import (
     DateTime,
     Enum as SAEnum,
     ForeignKey,
+    Index,
     Integer,
     Numeric,
     String,
     Text,
     UniqueConstraint,
+    and_,
+    event,
     func,
+    literal_column,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
+from app.utils.search import normalize_serial
+
 from .base import Base
 
 if TYPE_CHECKING:  # pragma: no cover
@@ -41,6 +47,7 @@ class Insumo(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
     nombre: Mapped[str] = mapped_column(String(120), nullable=False)
     numero_serie: Mapped[str | None] = mapped_column(String(100), index=True)
+    numero_serie_norm: Mapped[str | None] = mapped_column(String(100), index=True)
     descripcion: Mapped[str | None] = mapped_column(Text())
     unidad_medida: Mapped[str | None] = mapped_column(String(20))
     stock: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
@@ -63,7 +70,10 @@ class Insumo(Base):
         "EquipoInsumo", back_populates="insumo", cascade="all, delete-orphan"
     )
     movimientos: Mapped[list["InsumoMovimiento"]] = relationship(
-        "InsumoMovimiento", back_populates="insumo", cascade="all, delete-orphan"
+        "InsumoMovimiento",
+        back_populates="insumo",
+        cascade="all, delete-orphan",
+        order_by="InsumoMovimiento.fecha",
     )
 
     def ajustar_stock(self, cantidad: int) -> None:
@@ -75,10 +85,23 @@ class Insumo(Base):
         self.stock = nuevo
 
 
+# SQL expressions shared by the critical-stock ranking and its partial index.
+# ``nullif`` keeps the expression safe for rows outside the index predicate.
+# The constants are rendered inline: as bound parameters the query's
+# expression would no longer match the indexed one.
+INSUMO_CRITICO = and_(Insumo.stock_minimo > 0, Insumo.stock <= Insumo.stock_minimo)
+INSUMO_COBERTURA = func.round(
+    Insumo.stock * literal_column("100.0", Numeric)
+    / func.nullif(Insumo.stock_minimo, literal_column("0", Integer))
+)
+INSUMO_FALTANTE = Insumo.stock_minimo - Insumo.stock
+
+
 class InsumoMovimiento(Base):
     """Individual stock movement entry."""
 
     __tablename__ = "insumo_movimientos"
+    __table_args__ = (Index("ix_insumo_movimientos_insumo_id_fecha", "insumo_id", "fecha"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     insumo_id: Mapped[int] = mapped_column(ForeignKey("insumos.id"), nullable=False)
@@ -115,6 +138,7 @@ class InsumoSerie(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
     insumo_id: Mapped[int] = mapped_column(ForeignKey("insumos.id"), nullable=False, index=True)
     nro_serie: Mapped[str] = mapped_column(String(128), unique=True, nullable=False, index=True)
+    nro_serie_norm: Mapped[str | None] = mapped_column(String(128), index=True)
     estado: Mapped[SerieEstado] = mapped_column(
         SAEnum(SerieEstado, name="insumo_serie_estado"),
         default=SerieEstado.LIBRE,
@@ -156,8 +180,49 @@ class EquipoInsumo(Base):
     asociado_por: Mapped["Usuario | None"] = relationship("Usuario")
 
 
+class InsumoHospital(Base):
+    """Hospitales donde un insumo tiene asociaciones activas a equipos.
+
+    Tabla materializada a partir de ``equipos_insumos``; la mantienen los
+    flujos de asociación/desasociación y ``flask insumos reconstruir-hospitales``.
+    """
+
+    __tablename__ = "insumo_hospital"
+
+    insumo_id: Mapped[int] = mapped_column(
+        ForeignKey("insumos.id", ondelete="CASCADE"), primary_key=True
+    )
+    hospital_id: Mapped[int] = mapped_column(
+        ForeignKey("instituciones.id", ondelete="CASCADE"), primary_key=True, index=True
+    )
+    asociaciones: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+Index(
+    "ix_insumos_criticos",
+    INSUMO_COBERTURA,
+    INSUMO_FALTANTE.desc(),
+    Insumo.nombre,
+    postgresql_where=INSUMO_CRITICO,
+    sqlite_where=INSUMO_CRITICO,
+)
+
+
+@event.listens_for(Insumo, "before_insert")
+@event.listens_for(Insumo, "before_update")
+def _insumo_normalize_serial(mapper, connection, target: Insumo) -> None:
+    target.numero_serie_norm = normalize_serial(target.numero_serie)
+
+
+@event.listens_for(InsumoSerie, "before_insert")
+@event.listens_for(InsumoSerie, "before_update")
+def _insumo_serie_normalize_serial(mapper, connection, target: InsumoSerie) -> None:
+    target.nro_serie_norm = normalize_serial(target.nro_serie)
+
+
 __all__ = [
     "Insumo",
+    "InsumoHospital",
     "InsumoMovimiento",
     "MovimientoTipo",
     "InsumoSerie",
@@ -0,0 +1,65 @@
+"""Daily KPI rollups backing dashboard deltas and trends."""
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import TYPE_CHECKING
+
+from sqlalchemy import Date, DateTime, ForeignKey, Index, Integer, String, UniqueConstraint, func, text
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from .base import Base
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .hospital import Hospital
+
+
+class MetricaDiaria(Base):
+    """Value of one dashboard metric for a hospital (or globally) on a day.
+
+    Rows with ``hospital_id`` ``NULL`` hold the totals across every
+    institution, which are not always the sum of the per-hospital rows
+    (insumos shared by several hospitals, licencias without hospital).
+    """
+
+    __tablename__ = "metricas_diarias"
+    __table_args__ = (
+        UniqueConstraint(
+            "fecha",
+            "hospital_id",
+            "metrica",
+            "clave",
+            name="uq_metrica_diaria",
+        ),
+        # NULLs are distinct in the constraint above, so the global rows
+        # need their own partial unique index.
+        Index(
+            "uq_metricas_diarias_global",
+            "fecha",
+            "metrica",
+            "clave",
+            unique=True,
+            postgresql_where=text("hospital_id IS NULL"),
+            sqlite_where=text("hospital_id IS NULL"),
+        ),
+        Index("ix_metricas_diarias_metrica_fecha", "metrica", "fecha"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    fecha: Mapped[date] = mapped_column(Date, nullable=False, index=True)
+    hospital_id: Mapped[int | None] = mapped_column(
+        ForeignKey("instituciones.id", ondelete="CASCADE")
+    )
+    metrica: Mapped[str] = mapped_column(String(50), nullable=False)
+    clave: Mapped[str] = mapped_column(String(120), nullable=False, default="")
+    valor: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.current_timestamp(), nullable=False
+    )
+
+    hospital: Mapped["Hospital | None"] = relationship("Hospital")
+
+    def __repr__(self) -> str:  # pragma: no cover - helper
+        return f"MetricaDiaria(fecha={self.fecha!r}, metrica={self.metrica!r}, valor={self.valor!r})"
+
+
+__all__ = ["MetricaDiaria"]
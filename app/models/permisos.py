@@ -48,7 +48,7 @@ class Permiso(Base):
     __tablename__ = "permisos"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    rol_id: Mapped[int] = mapped_column(ForeignKey("roles.id"), nullable=False)
+    rol_id: Mapped[int] = mapped_column(ForeignKey("roles.id"), nullable=False, index=True)
     modulo: Mapped[Modulo] = mapped_column(SAEnum(Modulo, name="modulo_permiso"), nullable=False)
     hospital_id: Mapped[int | None] = mapped_column(ForeignKey("instituciones.id"))
     can_read: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
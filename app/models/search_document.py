@@ -0,0 +1,79 @@
+"""Denormalized search index shared by the global search."""
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import DateTime, Index, Integer, String, Text, UniqueConstraint, event, func, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+FTS_TABLE = "search_documents_fts"
+
+# Dialect specific objects created alongside ``search_documents``. PostgreSQL
+# gets a generated tsvector column with a GIN index; SQLite an external-content
+# FTS5 table kept in sync by triggers.
+POSTGRES_DDL = (
+    "ALTER TABLE search_documents ADD COLUMN IF NOT EXISTS busqueda tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('spanish', coalesce(contenido, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_search_documents_busqueda "
+    "ON search_documents USING gin (busqueda)",
+)
+SQLITE_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "contenido, content='search_documents', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, contenido) VALUES (new.id, new.contenido); END",
+    f"CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, contenido) "
+    "VALUES ('delete', old.id, old.contenido); END",
+    f"CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, contenido) "
+    "VALUES ('delete', old.id, old.contenido); "
+    f"INSERT INTO {FTS_TABLE}(rowid, contenido) VALUES (new.id, new.contenido); END",
+)
+
+
+class SearchDocument(Base):
+    """One searchable row per indexed entity, scoped by hospital."""
+
+    __tablename__ = "search_documents"
+    __table_args__ = (
+        UniqueConstraint("entidad", "entidad_id", name="uq_search_documents_entidad"),
+        Index("ix_search_documents_hospital_id", "hospital_id"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    entidad: Mapped[str] = mapped_column(String(20), nullable=False)
+    entidad_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    hospital_id: Mapped[int | None] = mapped_column(Integer)
+    titulo: Mapped[str] = mapped_column(String(255), nullable=False, default="")
+    detalle: Mapped[str] = mapped_column(String(255), nullable=False, default="")
+    url: Mapped[str] = mapped_column(String(255), nullable=False, default="#")
+    contenido: Mapped[str] = mapped_column(Text(), nullable=False, default="")
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.current_timestamp(),
+        onupdate=func.current_timestamp(),
+        nullable=False,
+    )
+
+    def __repr__(self) -> str:  # pragma: no cover - helper
+        return f"SearchDocument(entidad={self.entidad!r}, entidad_id={self.entidad_id!r})"
+
+
+@event.listens_for(SearchDocument.__table__, "after_create")
+def _create_full_text_objects(target, connection, **kw) -> None:
+    statements = {"postgresql": POSTGRES_DDL, "sqlite": SQLITE_DDL}.get(connection.dialect.name, ())
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+@event.listens_for(SearchDocument.__table__, "before_drop")
+def _drop_full_text_objects(target, connection, **kw) -> None:
+    if connection.dialect.name == "sqlite":
+        connection.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+
+
+__all__ = ["SearchDocument"]
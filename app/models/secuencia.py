@@ -0,0 +1,34 @@
+"""Named counters handing out consecutive numbers."""
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class Secuencia(Base):
+    """Last number handed out for ``clave`` (e.g. ``EQ-20240115``).
+
+    Values are reserved with an atomic ``UPDATE ... RETURNING`` increment, see
+    :mod:`app.services.secuencia_service`.
+    """
+
+    __tablename__ = "secuencias"
+
+    clave: Mapped[str] = mapped_column(String(60), primary_key=True)
+    valor: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.current_timestamp(),
+        onupdate=func.current_timestamp(),
+        nullable=False,
+    )
+
+    def __repr__(self) -> str:  # pragma: no cover - debugging helper
+        return f"Secuencia(clave={self.clave!r}, valor={self.valor!r})"
+
+
+__all__ = ["Secuencia"]
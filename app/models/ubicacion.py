@@ -56,7 +56,7 @@ class Oficina(Base):
         ForeignKey("servicios.id", ondelete="CASCADE"), nullable=False
     )
     institucion_id: Mapped[int] = mapped_column(
-        ForeignKey("instituciones.id", ondelete="CASCADE"), nullable=False
+        ForeignKey("instituciones.id", ondelete="CASCADE"), nullable=False, index=True
     )
 
     servicio: Mapped["Servicio"] = relationship("Servicio", back_populates="oficinas")
@@ -50,7 +50,7 @@ class Usuario(Base, UserMixin):
     password_hash: Mapped[str] = mapped_column(String(255), nullable=False)
     activo: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
     rol_id: Mapped[int] = mapped_column(ForeignKey("roles.id"), nullable=False)
-    hospital_id: Mapped[int | None] = mapped_column(ForeignKey("instituciones.id"))
+    hospital_id: Mapped[int | None] = mapped_column(ForeignKey("instituciones.id"), index=True)
     servicio_id: Mapped[int | None] = mapped_column(ForeignKey("servicios.id"))
     oficina_id: Mapped[int | None] = mapped_column(ForeignKey("oficinas.id"))
     theme_pref: Mapped[ThemePreference] = mapped_column(
@@ -114,20 +114,19 @@ class Usuario(Base, UserMixin):
 
         return [self.role] if self.role else []
 
+    @property
+    def principal(self):
+        """Compiled permission sets, see :mod:`app.security.principal`."""
+
+        from app.security.principal import get_principal  # avoid circular import
+
+        return get_principal(self)
+
     @property
     def permissions(self) -> list[str]:
         """Flattened permission strings (``module:action``)."""
 
-        if not self.rol:
-            return []
-        perms: list[str] = []
-        for permiso in self.rol.permisos:
-            prefix = permiso.modulo.value
-            if permiso.can_read:
-                perms.append(f"{prefix}:read")
-            if permiso.can_write:
-                perms.append(f"{prefix}:write")
-        return perms
+        return sorted(self.principal.permissions)
 
     def has_role(self, *roles: str) -> bool:
         if not roles:
@@ -136,29 +135,14 @@ class Usuario(Base, UserMixin):
         return bool(current and any(current == role.lower() for role in roles))
 
     def has_permission(self, permiso: str) -> bool:
-        return permiso in self.permissions
+        return self.principal.has_permission(permiso)
 
     def allowed_hospital_ids(self, modulo: str | None = None) -> set[int]:
         """Return hospital IDs where the user has access to ``modulo``."""
 
         if not self.rol:
             return set()
-        if self.rol.nombre.lower() == "superadmin":
-            ids = {permiso.hospital_id for permiso in self.rol.permisos if permiso.hospital_id}
-            if not ids:
-                ids = {rel.hospital_id for rel in self.hospitales_roles}
-            return ids
-
-        hospital_ids: set[int] = set()
-        for permiso in self.rol.permisos:
-            if modulo and permiso.modulo.value != modulo:
-                continue
-            if permiso.hospital_id:
-                hospital_ids.add(permiso.hospital_id)
-        if self.hospital_id:
-            hospital_ids.add(self.hospital_id)
-        hospital_ids.update(rel.hospital_id for rel in self.hospitales_roles)
-        return hospital_ids
+        return self.principal.allowed_hospital_ids(modulo, self.hospital_id)
 
     @property
     def hospitales_asignados(self) -> list[int]:
@@ -4,7 +4,7 @@ from __future__ import annotations
 from datetime import datetime
 from typing import TYPE_CHECKING
 
-from sqlalchemy import DateTime, ForeignKey, String, UniqueConstraint, func
+from sqlalchemy import DateTime, ForeignKey, Index, String, UniqueConstraint, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import Base
@@ -72,6 +72,7 @@ class VlanDispositivo(Base):
             "direccion_ip",
             name="uq_vlan_dispositivo_ip",
         ),
+        Index("ix_vlan_dispositivos_vlan_id", "vlan_id"),
     )
 
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -83,7 +84,7 @@ class VlanDispositivo(Base):
     direccion_ip: Mapped[str] = mapped_column(String(45), nullable=False)
     direccion_mac: Mapped[str | None] = mapped_column(String(32))
     hospital_id: Mapped[int] = mapped_column(
-        ForeignKey("instituciones.id", ondelete="CASCADE"), nullable=False
+        ForeignKey("instituciones.id", ondelete="CASCADE"), nullable=False, index=True
     )
     servicio_id: Mapped[int | None] = mapped_column(
         ForeignKey("servicios.id", ondelete="SET NULL")
@@ -1,18 +1,13 @@
 """API endpoints serving dashboard metrics."""
 from __future__ import annotations
 
-import json
-import time
-from typing import Iterator
-
-from flask import Response, current_app, jsonify, stream_with_context
+from flask import Response, current_app, jsonify, request
 from flask_login import current_user, login_required
-from sqlalchemy import select
-from sqlalchemy.orm import joinedload
 
-from app.extensions import db
-from app.models import Usuario
 from app.services.dashboard_service import collect_dashboard_metrics
+from app.services.dashboard_stream_service import get_broadcaster, stream_scope_events
+from app.services.metricas_service import ensure_daily_snapshot, scope_trends
+from app.utils.scope import get_user_hospital_scope
 
 from . import api_bp
 
@@ -26,37 +21,44 @@ def dashboard_metrics():
     return jsonify(payload)
 
 
+@api_bp.route("/dashboard/trends")
+@login_required
+def dashboard_trends():
+    """Return daily KPI history from ``metricas_diarias`` for sparklines."""
+
+    days = request.args.get("days", 90, type=int) or 90
+    days = max(1, min(days, 365))
+    ensure_daily_snapshot()
+    return jsonify(scope_trends(get_user_hospital_scope(current_user), days))
+
+
 @api_bp.route("/dashboard/stream")
 @login_required
 def dashboard_stream() -> Response:
-    """Stream dashboard updates using Server Sent Events."""
-
-    try:
-        user_id = int(current_user.get_id())
-    except (TypeError, ValueError):
-        user_id = None
-    interval = current_app.config.get("DASHBOARD_STREAM_INTERVAL", 30)
-    retry = current_app.config.get("DASHBOARD_STREAM_RETRY", interval * 1000)
-
-    @stream_with_context
-    def generate() -> Iterator[str]:
-        yield f"retry: {retry}\n\n"
-        while True:
-            if user_id is None:
-                break
-            stmt = (
-                select(Usuario)
-                .options(joinedload(Usuario.rol))
-                .where(Usuario.id == user_id)
-            )
-            user = db.session.execute(stmt).scalar_one_or_none()
-            if user is None:
-                break
-            payload = collect_dashboard_metrics(user)
-            yield f"data: {json.dumps(payload)}\n\n"
-            time.sleep(max(1, int(interval)))
-
-    return Response(generate(), mimetype="text/event-stream")
-
-
-__all__ = ["dashboard_metrics", "dashboard_stream"]
+    """Stream dashboard updates using Server Sent Events.
+
+    Connections sharing a hospital scope subscribe to the same producer, so
+    the metrics are computed once per interval for all of them.
+    """
+
+    config = current_app.config
+    interval = max(1, int(config.get("DASHBOARD_STREAM_INTERVAL", 30)))
+    retry = int(config.get("DASHBOARD_STREAM_RETRY", interval * 1000))
+    heartbeat = max(1, int(config.get("DASHBOARD_STREAM_HEARTBEAT", 15)))
+    max_age = max(interval, int(config.get("DASHBOARD_STREAM_MAX_AGE", 300)))
+
+    events = stream_scope_events(
+        get_broadcaster(),
+        get_user_hospital_scope(current_user),
+        interval=interval,
+        heartbeat=heartbeat,
+        retry=retry,
+        max_age=max_age,
+    )
+    response = Response(events, mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+__all__ = ["dashboard_metrics", "dashboard_stream", "dashboard_trends"]
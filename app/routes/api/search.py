@@ -9,6 +9,7 @@ from sqlalchemy import asc, or_
 
 from app.models import Equipo, Hospital, Insumo, Oficina, Servicio, TipoEquipo
 from app.services.equipo_service import format_equipo_option
+from app.utils.search import build_substring_search, keyset_paginate
 
 from . import api_bp
 
@@ -35,16 +36,17 @@ def _format_hospital_label(hospital: Hospital) -> str:
     return f"{hospital.nombre} - {locality}" if locality else hospital.nombre
 
 
+def _format_item(formatted):
+    if isinstance(formatted, dict):
+        if "text" not in formatted and "label" in formatted:
+            formatted = {**formatted, "text": formatted["label"]}
+        elif "label" not in formatted and "text" in formatted:
+            formatted = {**formatted, "label": formatted["text"]}
+    return formatted
+
+
 def _build_paginated_response(pagination, formatter):
-    items = []
-    for entry in pagination.items:
-        formatted = formatter(entry)
-        if isinstance(formatted, dict):
-            if "text" not in formatted and "label" in formatted:
-                formatted = {**formatted, "text": formatted["label"]}
-            elif "label" not in formatted and "text" in formatted:
-                formatted = {**formatted, "label": formatted["text"]}
-        items.append(formatted)
+    items = [_format_item(formatter(entry)) for entry in pagination.items]
     return jsonify(
         {
             "items": items,
@@ -55,6 +57,41 @@ def _build_paginated_response(pagination, formatter):
     )
 
 
+def _keyset_requested() -> bool:
+    """Return ``True`` when the client paginates with ``?after=<cursor>``."""
+
+    return "after" in request.args
+
+
+def _build_keyset_response(query, sort_keys, formatter, per_page: int):
+    """Respond with the page after ``?after`` without counting the matches.
+
+    The total is only computed when the client sends ``with_total=1``.
+    """
+
+    try:
+        page = keyset_paginate(
+            query,
+            sort_keys,
+            after=request.args.get("after"),
+            per_page=per_page,
+            with_total=request.args.get("with_total", type=int) == 1,
+        )
+    except ValueError:
+        return (
+            jsonify({"results": [], "next_cursor": None, "more": False, "message": "Cursor inválido"}),
+            400,
+        )
+    payload = {
+        "results": [_format_item(formatter(entry)) for entry in page.items],
+        "next_cursor": page.next_cursor,
+        "more": page.more,
+    }
+    if page.total is not None:
+        payload["total"] = page.total
+    return jsonify(payload)
+
+
 def _log_missing_dependency(endpoint: str, **extra) -> None:
     payload = {"endpoint": endpoint, "status": 400, **extra}
     current_app.logger.warning(json.dumps(payload, ensure_ascii=False))
@@ -78,11 +115,14 @@ def search_hospitales():
         if direccion_column is not None and direccion_column not in conditions:
             conditions.append(direccion_column.ilike(like))
         lookup = lookup.filter(or_(*conditions))
+
+    def formatter(hospital):
+        return {"id": hospital.id, "label": _format_hospital_label(hospital)}
+
+    if _keyset_requested():
+        return _build_keyset_response(lookup, [Hospital.nombre, Hospital.id], formatter, per_page)
     pagination = lookup.paginate(page=page, per_page=per_page, error_out=False)
-    return _build_paginated_response(
-        pagination,
-        lambda hospital: {"id": hospital.id, "label": _format_hospital_label(hospital)},
-    )
+    return _build_paginated_response(pagination, formatter)
 
 
 @api_bp.route("/search_servicios")
@@ -119,10 +159,13 @@ def search_servicios_lookup():
         like = f"%{query_value}%"
         lookup = lookup.filter(Servicio.nombre.ilike(like))
 
+    def formatter(servicio):
+        return {"id": servicio.id, "label": servicio.nombre}
+
+    if _keyset_requested():
+        return _build_keyset_response(lookup, [Servicio.nombre, Servicio.id], formatter, per_page)
     pagination = lookup.paginate(page=page, per_page=per_page, error_out=False)
-    return _build_paginated_response(
-        pagination, lambda servicio: {"id": servicio.id, "label": servicio.nombre}
-    )
+    return _build_paginated_response(pagination, formatter)
 
 
 @api_bp.route("/search_oficinas")
@@ -177,11 +220,13 @@ def search_oficinas_lookup():
         like = f"%{query_value}%"
         lookup = lookup.filter(Oficina.nombre.ilike(like))
 
+    def formatter(oficina):
+        return {"id": oficina.id, "label": oficina.nombre}
+
+    if _keyset_requested():
+        return _build_keyset_response(lookup, [Oficina.nombre, Oficina.id], formatter, per_page)
     pagination = lookup.paginate(page=page, per_page=per_page, error_out=False)
-    return _build_paginated_response(
-        pagination,
-        lambda oficina: {"id": oficina.id, "label": oficina.nombre},
-    )
+    return _build_paginated_response(pagination, formatter)
 
 
 @api_bp.route("/equipos/search")
@@ -214,22 +259,34 @@ def search_equipos():
         search = search.filter(Equipo.oficina_id == oficina_id)
 
     if query_value:
-        like = f"%{query_value}%"
-        filters = [
-            TipoEquipo.nombre.ilike(like),
-            Equipo.descripcion.ilike(like),
-            Equipo.marca.ilike(like),
-            Equipo.modelo.ilike(like),
-            Equipo.numero_serie.ilike(like),
+        columns = [
+            TipoEquipo.nombre,
+            Equipo.descripcion,
+            Equipo.marca,
+            Equipo.modelo,
+            Equipo.numero_serie,
         ]
         codigo_column = getattr(Equipo, "codigo", None)
         if codigo_column is not None:
-            filters.append(codigo_column.ilike(like))
+            columns.append(codigo_column)
         patrimonial_column = getattr(Equipo, "bien_patrimonial", None)
         if patrimonial_column is not None:
-            filters.append(patrimonial_column.ilike(like))
-        search = search.filter(or_(*filters))
+            columns.append(patrimonial_column)
+        search = search.filter(
+            build_substring_search(
+                columns,
+                query_value,
+                serial_columns=[Equipo.numero_serie_norm, Equipo.codigo_norm],
+            )
+        )
 
+    if _keyset_requested():
+        return _build_keyset_response(
+            search,
+            [TipoEquipo.nombre, Equipo.marca, Equipo.modelo, Equipo.id],
+            format_equipo_option,
+            per_page,
+        )
     pagination = search.paginate(page=page, per_page=per_page, error_out=False)
     items = [format_equipo_option(equipo) for equipo in pagination.items]
     return jsonify({"results": items, "pagination": {"more": pagination.has_next}})
@@ -247,14 +304,16 @@ def search_servicios():
         like = f"%{query_value}%"
         search = search.filter(Servicio.nombre.ilike(like))
 
-    pagination = search.paginate(page=page, per_page=per_page, error_out=False)
-    return _build_paginated_response(
-        pagination,
-        lambda servicio: {
+    def formatter(servicio):
+        return {
             "id": servicio.id,
             "label": f"{servicio.institucion.nombre} · {servicio.nombre}",
-        },
-    )
+        }
+
+    if _keyset_requested():
+        return _build_keyset_response(search, [Servicio.nombre, Servicio.id], formatter, per_page)
+    pagination = search.paginate(page=page, per_page=per_page, error_out=False)
+    return _build_paginated_response(pagination, formatter)
 
 
 @api_bp.route("/oficinas/search")
@@ -291,14 +350,16 @@ def search_oficinas():
         like = f"%{query_value}%"
         search = search.filter(Oficina.nombre.ilike(like))
 
-    pagination = search.paginate(page=page, per_page=per_page, error_out=False)
-    return _build_paginated_response(
-        pagination,
-        lambda oficina: {
+    def formatter(oficina):
+        return {
             "id": oficina.id,
             "label": f"{oficina.institucion.nombre} · {oficina.nombre}",
-        },
-    )
+        }
+
+    if _keyset_requested():
+        return _build_keyset_response(search, [Oficina.nombre, Oficina.id], formatter, per_page)
+    pagination = search.paginate(page=page, per_page=per_page, error_out=False)
+    return _build_paginated_response(pagination, formatter)
 
 
 @api_bp.route("/insumos/search")
@@ -313,7 +374,10 @@ def search_insumos():
         like = f"%{query_value}%"
         search = search.filter(Insumo.nombre.ilike(like))
 
+    def formatter(insumo):
+        return {"id": insumo.id, "label": insumo.nombre}
+
+    if _keyset_requested():
+        return _build_keyset_response(search, [Insumo.nombre, Insumo.id], formatter, per_page)
     pagination = search.paginate(page=page, per_page=per_page, error_out=False)
-    return _build_paginated_response(
-        pagination, lambda insumo: {"id": insumo.id, "label": insumo.nombre}
-    )
+    return _build_paginated_response(pagination, formatter)
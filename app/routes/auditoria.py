@@ -3,16 +3,21 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from flask import Blueprint, render_template, request
+from flask import Blueprint, abort, render_template, request
 from flask_login import current_user, login_required
+from sqlalchemy.orm import joinedload
 
+from app.extensions import db
 from app.models import Auditoria, Hospital, Usuario
 from app.security import require_roles
-from app.utils.search import apply_text_search, paginate_query
+from app.utils.search import apply_text_search, capped_count, estimated_table_count, keyset_paginate
 
 
 auditoria_bp = Blueprint("auditoria", __name__, url_prefix="/auditorias")
 
+# Filtered totals stop counting here; the page shows "10 000+".
+COUNT_CAP = 10_000
+
 
 @auditoria_bp.route("/")
 @login_required
@@ -37,7 +42,7 @@ def index():
     desde_dt = parse_date(fecha_desde)
     hasta_dt = parse_date(fecha_hasta)
 
-    query = Auditoria.query.outerjoin(Auditoria.usuario).outerjoin(Auditoria.hospital)
+    query = Auditoria.query
     allowed_hospitals = current_user.allowed_hospital_ids()
     if allowed_hospitals:
         query = query.filter(
@@ -65,18 +70,35 @@ def index():
             q,
         )
 
-    page = request.args.get("page", type=int, default=1)
     per_page = request.args.get("per_page", type=int, default=20)
-    pagination = paginate_query(
-        query.order_by(Auditoria.created_at.desc()), page=page, per_page=per_page
+    after = request.args.get("after") or None
+    try:
+        keyset = keyset_paginate(
+            query.options(joinedload(Auditoria.usuario), joinedload(Auditoria.hospital)),
+            [Auditoria.created_at, Auditoria.id],
+            after=after,
+            per_page=per_page,
+            descending=True,
+        )
+    except ValueError:
+        abort(400)
+    filtered = any(
+        (allowed_hospitals, usuario_id, hospital_id, modulo, accion, desde_dt, hasta_dt, q)
     )
+    # Planner statistics are only meaningful for the whole table.
+    if filtered:
+        total = capped_count(query, COUNT_CAP)
+    else:
+        total = estimated_table_count(Auditoria, COUNT_CAP)
 
-    usuarios = Usuario.query.order_by(Usuario.nombre).all()
-    selected_hospital = Hospital.query.get(hospital_id) if hospital_id else None
+    selected_usuario = db.session.get(Usuario, usuario_id) if usuario_id else None
+    selected_hospital = db.session.get(Hospital, hospital_id) if hospital_id else None
 
     return render_template(
         "auditoria/index.html",
-        pagination=pagination,
+        keyset=keyset,
+        total=total,
+        is_first_page=after is None,
         filtros={
             "q": q,
             "usuario_id": usuario_id,
@@ -86,7 +108,7 @@ def index():
             "desde": fecha_desde,
             "hasta": fecha_hasta,
         },
-        usuarios=usuarios,
+        selected_usuario=selected_usuario,
         selected_hospital=selected_hospital,
     )
 
@@ -11,12 +11,39 @@ from app.extensions import db
 from app.forms.login import LoginForm
 from app.models import Usuario
 from app.services.audit_service import log_action
-from app.services.licencia_service import usuario_con_licencia_activa
+from app.services.licencia_service import (
+    usuario_con_licencia_activa,
+    usuario_con_licencia_activa_cacheada,
+)
 from app.utils import is_safe_redirect_target
 
 
 auth_bp = Blueprint("auth", __name__, url_prefix="/auth")
 
+SCHEMA_EXTENSION_KEY = "licencias_schema_ready"
+
+
+def _resolve_license_schema(app) -> bool:
+    """Check once whether the tables used by :func:`validar_licencia` exist.
+
+    Only a positive answer is memoized so a database migrated after startup
+    enables the guard without restarting the process.
+    """
+
+    if app.extensions.get(SCHEMA_EXTENSION_KEY):
+        return True
+    with app.app_context():
+        inspector = inspect(db.engine)
+        ready = inspector.has_table("usuarios") and inspector.has_table("licencias")
+    if ready:
+        app.extensions[SCHEMA_EXTENSION_KEY] = True
+    return ready
+
+
+@auth_bp.record_once
+def _resolve_license_schema_on_startup(state) -> None:
+    _resolve_license_schema(state.app)
+
 
 @auth_bp.route("/login", methods=["GET", "POST"])
 def login():
@@ -35,8 +62,8 @@ def login():
         else:
             login_user(usuario)
             usuario.ultimo_login = datetime.utcnow()
-            db.session.commit()
             log_action(usuario_id=usuario.id, accion="login", modulo="auth")
+            db.session.commit()
             next_page = request.args.get("next")
             if next_page and not is_safe_redirect_target(next_page):
                 current_app.logger.warning(
@@ -59,13 +86,13 @@ def logout():
 
 @auth_bp.before_app_request
 def validar_licencia():
-    engine = db.engine
-    inspector = inspect(engine)
-    if not inspector.has_table("usuarios") or not inspector.has_table("licencias"):
+    if request.endpoint == "static":
+        return None
+    if not _resolve_license_schema(current_app._get_current_object()):
         return None
     if not current_user.is_authenticated:
         return None
-    if usuario_con_licencia_activa(current_user.id):
+    if usuario_con_licencia_activa_cacheada(current_user.id):
         flash("Acceso denegado: licencia aprobada activa", "danger")
         logout_user()
         return redirect(url_for("auth.login"))
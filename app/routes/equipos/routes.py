@@ -1,7 +1,11 @@
 """Blueprint managing equipment inventory."""
 from __future__ import annotations
 
+import hashlib
+import re
+import tempfile
 from datetime import date, datetime, time
+from io import BytesIO
 from pathlib import Path
 from uuid import uuid4
 
@@ -15,12 +19,15 @@ from flask import (
     redirect,
     render_template,
     request,
+    send_file,
+    session,
     url_for,
 )
 from flask_login import current_user, login_required
-from sqlalchemy import func, or_
+from flask_wtf.csrf import generate_csrf
+from sqlalchemy import func, or_, select
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload, selectinload
 from werkzeug.utils import secure_filename
 
 from app.extensions import db
@@ -30,13 +37,13 @@ from app.forms.equipo import (
     EquipoFiltroForm,
     EquipoForm,
     EquipoHistorialFiltroForm,
+    EquipoImportForm,
+    EquipoLoteForm,
     TipoEquipoDeleteForm,
     TipoEquipoCreateForm,
     TipoEquipoUpdateForm,
 )
 from app.models import (
-    Acta,
-    ActaItem,
     Equipo,
     EquipoAdjunto,
     EquipoHistorial,
@@ -54,19 +61,28 @@ from app.models import (
     TipoEquipo,
 )
 from app.security import permissions_required, require_hospital_access, require_roles
+from app.services import pdf_service
+from app.services.acta_service import actas_de_equipo
 from app.services.audit_service import log_action
-from app.services.equipo_service import generate_internal_serial
+from app.services.equipo_bulk_service import CambioMasivo, aplicar_cambio_masivo
+from app.services.equipo_import_service import importar_equipos
+from app.services.equipo_service import (
+    cached_equipo_count,
+    equipo_tab_counts,
+    generate_internal_serial,
+)
+from app.services.etiqueta_service import preparar_etiquetas, render_hoja
+from app.services.insumo_service import actualizar_insumo_hospital
 from app.services.file_service import equipment_upload_dir, generate_image_thumbnail
-from app.utils import normalize_enum_value
+from app.services.qr_service import qr_cache_path
+from app.utils import humanize_bytes, normalize_enum_value
+from app.utils.search import build_substring_search, keyset_paginate, keyset_pagination
 
 
 equipos_bp = Blueprint("equipos", __name__, url_prefix="/equipos")
 
 MAX_REMOTE_PAGE_SIZE = 50
-
-
-def _paginar(query, page: int, per_page: int):
-    return query.paginate(page=page, per_page=per_page, error_out=False)
+QR_DIGEST_RE = re.compile(r"[0-9a-f]{64}")
 
 
 def _parse_limit(value: int | None, default: int = 10) -> int:
@@ -88,17 +104,64 @@ def _parse_iso_date(raw: str | None) -> date | None:
         return datetime.strptime(raw, "%Y-%m-%d").date()
     except ValueError:
         return None
-@equipos_bp.route("/")
-@login_required
-@permissions_required("inventario:read")
-@require_hospital_access(Modulo.INVENTARIO)
-def listar():
-    form = EquipoFiltroForm(request.args)
-    page = request.args.get("page", type=int, default=1)
-    per_page = current_app.config.get("DEFAULT_PAGE_SIZE", 20)
 
-    query = Equipo.query.options(selectinload(Equipo.tipo)).order_by(Equipo.created_at.desc())
-    allowed = getattr(g, "allowed_hospitals", set())
+
+def _remote_page(items: list[dict], total: int, limit: int, offset: int):
+    next_offset = offset + limit if offset + limit < total else None
+    prev_offset = max(offset - limit, 0) if offset > 0 else None
+    return jsonify(
+        {
+            "items": items,
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "next_offset": next_offset,
+            "previous_offset": prev_offset,
+        }
+    )
+
+
+def _detalle_etag(equipo: Equipo, conteos: dict[str, int]) -> str:
+    updated_at = equipo.updated_at.isoformat() if equipo.updated_at else ""
+    # The header and actions depend on the viewer and its role's permissions.
+    usuario = getattr(current_user, "id", "")
+    rol = getattr(current_user, "rol", None)
+    permisos_version = rol.permisos_version if rol is not None else ""
+    # The page embeds CSRF tokens: tie it to the session's token and renew it
+    # before the signed copies expire, so a revalidated page can still post.
+    generate_csrf()
+    csrf = session.get(current_app.config.get("WTF_CSRF_FIELD_NAME", "csrf_token"), "")
+    limite = current_app.config.get("WTF_CSRF_TIME_LIMIT", 3600)
+    periodo = int(datetime.now().timestamp() // (limite // 2)) if limite else 0
+    partes = [str(equipo.id), updated_at, str(usuario), str(permisos_version), csrf, str(periodo)]
+    partes.extend(f"{clave}={valor}" for clave, valor in sorted(conteos.items()))
+    return hashlib.sha1("|".join(partes).encode("utf-8")).hexdigest()
+
+
+def _historial_query(
+    equipo_id: int, texto: str = "", desde: date | None = None, hasta: date | None = None
+):
+    query = EquipoHistorial.query.options(joinedload(EquipoHistorial.usuario)).filter(
+        EquipoHistorial.equipo_id == equipo_id
+    )
+    if texto:
+        # The equipo_id range of the index bounds the rows ILIKE has to scan.
+        like = f"%{texto}%"
+        query = query.filter(
+            or_(
+                EquipoHistorial.accion.ilike(like),
+                EquipoHistorial.descripcion.ilike(like),
+            )
+        )
+    if desde:
+        query = query.filter(EquipoHistorial.fecha >= datetime.combine(desde, time.min))
+    if hasta:
+        query = query.filter(EquipoHistorial.fecha <= datetime.combine(hasta, time.max))
+    return query
+
+
+def _filtrar_equipos(form: EquipoFiltroForm, allowed: set[int]):
+    query = Equipo.query
     if allowed:
         query = query.filter(Equipo.hospital_id.in_(allowed))
     if form.hospital_id.data and form.hospital_id.data != 0:
@@ -106,22 +169,117 @@ def listar():
     if form.estado.data:
         query = query.filter(Equipo.estado == form.estado.data)
     if form.buscar.data:
-        like = f"%{form.buscar.data}%"
         query = query.filter(
-            or_(
-                Equipo.descripcion.ilike(like),
-                Equipo.codigo.ilike(like),
-                Equipo.numero_serie.ilike(like),
+            build_substring_search(
+                [Equipo.descripcion, Equipo.codigo, Equipo.numero_serie],
+                form.buscar.data,
+                serial_columns=[Equipo.numero_serie_norm, Equipo.codigo_norm],
             )
         )
+    return query
+
+
+@equipos_bp.route("/")
+@login_required
+@permissions_required("inventario:read")
+@require_hospital_access(Modulo.INVENTARIO)
+def listar():
+    form = EquipoFiltroForm(request.args)
+    per_page = current_app.config.get("DEFAULT_PAGE_SIZE", 20)
+
+    allowed = getattr(g, "allowed_hospitals", set())
+    query = _filtrar_equipos(form, allowed)
 
-    pagination = _paginar(query, page, per_page)
+    signature = (
+        tuple(sorted(allowed)),
+        form.hospital_id.data or None,
+        form.estado.data or None,
+        (form.buscar.data or "").strip().lower(),
+    )
+    total = cached_equipo_count(query, signature)
+    try:
+        pagination = keyset_pagination(
+            query.options(selectinload(Equipo.tipo)),
+            [Equipo.created_at, Equipo.id],
+            page_token=request.args.get("page"),
+            per_page=per_page,
+            total=total,
+            descending=True,
+        )
+    except ValueError:
+        abort(400)
     return render_template(
         "equipos/listar.html",
         form=form,
+        lote_form=EquipoLoteForm(),
         equipos=pagination.items,
         pagination=pagination,
     )
+
+
+@equipos_bp.post("/lote")
+@login_required
+@permissions_required("inventario:write")
+@require_hospital_access(Modulo.INVENTARIO)
+def cambio_masivo():
+    form = EquipoLoteForm()
+    destino = url_for("equipos.listar", **request.args.to_dict(flat=True))
+    if not form.validate_on_submit():
+        for errors in form.errors.values():
+            for error in errors:
+                flash(error, "danger")
+        return redirect(destino)
+
+    allowed = getattr(g, "allowed_hospitals", set())
+    if form.aplicar_filtro.data:
+        seleccion = _filtrar_equipos(EquipoFiltroForm(request.args), allowed)
+    else:
+        ids = request.form.getlist("ids", type=int)
+        if not ids:
+            flash("Seleccione al menos un equipo.", "warning")
+            return redirect(destino)
+        seleccion = Equipo.query.filter(Equipo.id.in_(ids))
+        if allowed:
+            seleccion = seleccion.filter(Equipo.hospital_id.in_(allowed))
+
+    cambio = CambioMasivo(
+        estado=EstadoEquipo(form.estado.data) if form.estado.data else None,
+        hospital_id=form.hospital_id.data,
+        servicio_id=form.servicio_id.data,
+        oficina_id=form.oficina_id.data,
+    )
+    try:
+        actualizados = aplicar_cambio_masivo(
+            db.session,
+            seleccion,
+            cambio,
+            usuario_id=current_user.id,
+            motivo=(form.motivo.data or "").strip() or None,
+            hospital_ids=allowed or None,
+        )
+    except ValueError as exc:
+        db.session.rollback()
+        flash(str(exc), "danger")
+        return redirect(destino)
+
+    if actualizados:
+        log_action(
+            usuario_id=current_user.id,
+            accion="cambio_masivo",
+            modulo="inventario",
+            tabla="equipos",
+            cambios={
+                "ids": actualizados,
+                "estado": form.estado.data or None,
+                "hospital_id": cambio.hospital_id,
+                "servicio_id": cambio.servicio_id,
+                "oficina_id": cambio.oficina_id,
+                "motivo": form.motivo.data or None,
+            },
+        )
+    db.session.commit()
+    flash(f"{len(actualizados)} equipos actualizados.", "success")
+    return redirect(destino)
 @equipos_bp.route("/crear", methods=["GET", "POST"])
 @login_required
 @permissions_required("inventario:write")
@@ -194,7 +352,7 @@ def crear():
         detalle_alta = "Alta de equipo nuevo" if form.es_nuevo.data else "Alta de equipo usado"
         equipo.registrar_evento(current_user, "Alta", detalle_alta)
         db.session.add(equipo)
-        db.session.commit()
+        db.session.flush()
         log_action(
             usuario_id=current_user.id,
             accion="crear",
@@ -202,12 +360,130 @@ def crear():
             tabla="equipos",
             registro_id=equipo.id,
         )
+        db.session.commit()
         flash("Equipo creado correctamente", "success")
         return redirect(url_for("equipos.listar"))
 
     return render_template("equipos/crear.html", form=form, titulo="Nuevo equipo")
 
 
+@equipos_bp.route("/importar", methods=["GET", "POST"])
+@login_required
+@permissions_required("inventario:write")
+@require_hospital_access(Modulo.INVENTARIO)
+def importar():
+    form = EquipoImportForm()
+    resultado = None
+
+    if form.validate_on_submit():
+        archivo = form.archivo.data
+        allowed = getattr(g, "allowed_hospitals", set())
+        try:
+            resultado = importar_equipos(
+                db.session,
+                archivo.stream,
+                archivo.filename or "",
+                usuario_id=current_user.id,
+                hospital_ids=allowed or None,
+                batch_size=current_app.config.get("EQUIPOS_IMPORT_BATCH_SIZE", 500),
+            )
+        except ValueError as exc:
+            flash(str(exc), "danger")
+            return render_template("equipos/importar.html", form=form, resultado=None), 400
+        log_action(
+            usuario_id=current_user.id,
+            accion="importar",
+            modulo="inventario",
+            tabla="equipos",
+            cambios={
+                "archivo": archivo.filename,
+                "filas": resultado.filas,
+                "creados": resultado.creados,
+                "errores": len(resultado.errores),
+            },
+        )
+        db.session.commit()
+        flash(
+            f"Importación finalizada: {resultado.creados} de {resultado.filas} equipos creados.",
+            "success" if not resultado.errores else "warning",
+        )
+
+    return render_template("equipos/importar.html", form=form, resultado=resultado)
+
+
+@equipos_bp.route("/etiquetas")
+@login_required
+@permissions_required("inventario:read")
+@require_hospital_access(Modulo.INVENTARIO)
+def etiquetas():
+    """Label sheet for the listing filter, an oficina/servicio or selected ids."""
+
+    destino = url_for("equipos.listar", **request.args.to_dict(flat=True))
+    allowed = getattr(g, "allowed_hospitals", set())
+    ids = request.args.getlist("ids", type=int)
+    if ids:
+        seleccion = Equipo.query.filter(Equipo.id.in_(ids))
+        if allowed:
+            seleccion = seleccion.filter(Equipo.hospital_id.in_(allowed))
+    else:
+        seleccion = _filtrar_equipos(EquipoFiltroForm(request.args), allowed)
+    servicio_id = request.args.get("servicio_id", type=int)
+    if servicio_id:
+        seleccion = seleccion.filter(Equipo.servicio_id == servicio_id)
+    oficina_id = request.args.get("oficina_id", type=int)
+    if oficina_id:
+        seleccion = seleccion.filter(Equipo.oficina_id == oficina_id)
+
+    total = seleccion.order_by(None).count()
+    limite = current_app.config.get("EQUIPOS_ETIQUETAS_MAX", 5000)
+    if not total:
+        flash("No hay equipos para imprimir con ese filtro.", "warning")
+        return redirect(destino)
+    if total > limite:
+        flash(
+            f"El filtro incluye {total} equipos; el máximo por hoja es {limite}. "
+            "Acote el filtro o use «flask equipos etiquetas».",
+            "warning",
+        )
+        return redirect(destino)
+    try:
+        # Missing images are rendered inline: the web workers are threaded, so
+        # large first prints belong to ``flask equipos etiquetas``.
+        hoja = preparar_etiquetas(seleccion)
+    except RuntimeError as exc:
+        flash(str(exc), "danger")
+        return redirect(destino)
+
+    if pdf_service.HTML is None:
+        return render_template(
+            "equipos/etiquetas.html",
+            etiquetas=hoja,
+            qr_src=lambda etiqueta: url_for("equipos.qr_imagen", digest=etiqueta.digest),
+            imprimir=True,
+        )
+    with tempfile.TemporaryDirectory() as tmp:
+        contenido = render_hoja(hoja, Path(tmp) / "etiquetas.pdf").read_bytes()
+    return send_file(
+        BytesIO(contenido),
+        mimetype="application/pdf",
+        as_attachment=True,
+        download_name="etiquetas.pdf",
+    )
+
+
+@equipos_bp.route("/qr/<digest>.png")
+@login_required
+@permissions_required("inventario:read")
+def qr_imagen(digest: str):
+    if not QR_DIGEST_RE.fullmatch(digest):
+        abort(404)
+    path = qr_cache_path(current_app.config["QR_CACHE_FOLDER"], digest)
+    if not path.is_file():
+        abort(404)
+    # The name is the hash of the content, so the image never changes.
+    return send_file(path, mimetype="image/png", max_age=31536000)
+
+
 @equipos_bp.route("/<int:equipo_id>/editar", methods=["GET", "POST"])
 @login_required
 @permissions_required("inventario:write")
@@ -257,6 +533,8 @@ def editar(equipo_id: int):
             else (form.numero_serie.data or "").strip()
         )
 
+        cambia_hospital = equipo.hospital_id != hospital.id
+
         equipo.codigo = form.codigo.data or None
         equipo.tipo_id = form.tipo.data
         equipo.estado = form.estado.data
@@ -282,7 +560,15 @@ def editar(equipo_id: int):
 
         detalle_alta = "Actualización de equipo nuevo" if form.es_nuevo.data else "Actualización de equipo"
         equipo.registrar_evento(current_user, "Actualización", detalle_alta)
-        db.session.commit()
+        if cambia_hospital:
+            actualizar_insumo_hospital(
+                db.session.scalars(
+                    select(EquipoInsumo.insumo_id).where(
+                        EquipoInsumo.equipo_id == equipo.id,
+                        EquipoInsumo.fecha_desasociacion.is_(None),
+                    )
+                ).all()
+            )
         log_action(
             usuario_id=current_user.id,
             accion="editar",
@@ -290,6 +576,7 @@ def editar(equipo_id: int):
             tabla="equipos",
             registro_id=equipo.id,
         )
+        db.session.commit()
         flash("Equipo actualizado", "success")
         return redirect(url_for("equipos.detalle", equipo_id=equipo.id))
 
@@ -301,77 +588,34 @@ def editar(equipo_id: int):
 def detalle(equipo_id: int):
     equipo = (
         Equipo.query.options(
-            selectinload(Equipo.tipo),
-            selectinload(Equipo.insumos_asociados)
-            .selectinload(EquipoInsumo.serie)
-            .selectinload(InsumoSerie.insumo),
-            selectinload(Equipo.insumos_asociados).selectinload(EquipoInsumo.insumo),
-            selectinload(Equipo.insumos_asociados).selectinload(EquipoInsumo.asociado_por),
+            joinedload(Equipo.tipo),
+            joinedload(Equipo.hospital),
+            joinedload(Equipo.servicio),
+            joinedload(Equipo.oficina),
         )
         .get_or_404(equipo_id)
     )
-
-    form_adjuntos = EquipoAdjuntoForm()
-    per_page = current_app.config.get("DEFAULT_PAGE_SIZE", 25)
-
-    insumos_page = request.args.get("insumos_page", type=int, default=1)
-    insumos_query = (
-        EquipoInsumo.query.options(
-            selectinload(EquipoInsumo.insumo),
-            selectinload(EquipoInsumo.serie).selectinload(InsumoSerie.insumo),
-            selectinload(EquipoInsumo.asociado_por),
-        )
-        .filter(
-            EquipoInsumo.equipo_id == equipo.id,
-            EquipoInsumo.fecha_desasociacion.is_(None),
+    # The tabs load through the ``*_datos`` endpoints; only their counts are
+    # part of the page, so they and ``updated_at`` identify its content.
+    conteos = equipo_tab_counts(db.session, equipo.id)
+    etag = _detalle_etag(equipo, conteos)
+    if "_flashes" not in session and request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.make_response(
+            render_template(
+                "equipos/detalle.html",
+                equipo=equipo,
+                conteos=conteos,
+                adjunto_form=EquipoAdjuntoForm(),
+                max_upload_size=_max_upload_size(),
+                page_size=current_app.config.get("DEFAULT_PAGE_SIZE", 25),
+            )
         )
-        .order_by(EquipoInsumo.fecha_asociacion.desc())
-    )
-    insumos_pagination = insumos_query.paginate(
-        page=insumos_page, per_page=per_page, error_out=False
-    )
-
-    historial_page = request.args.get("historial_page", type=int, default=1)
-    historial_query = (
-        EquipoHistorial.query.options(selectinload(EquipoHistorial.usuario))
-        .filter(EquipoHistorial.equipo_id == equipo.id)
-        .order_by(EquipoHistorial.fecha.desc())
-    )
-    historial_pagination = historial_query.paginate(
-        page=historial_page, per_page=per_page, error_out=False
-    )
-
-    actas_page = request.args.get("actas_page", type=int, default=1)
-    actas_query = (
-        Acta.query.join(Acta.items)
-        .filter(ActaItem.equipo_id == equipo.id)
-        .order_by(Acta.fecha.desc())
-        .distinct()
-    )
-    actas_pagination = actas_query.paginate(
-        page=actas_page, per_page=per_page, error_out=False
-    )
-
-    evidencias_page = request.args.get("evidencias_page", type=int, default=1)
-    evidencias_query = (
-        EquipoAdjunto.query.filter(EquipoAdjunto.equipo_id == equipo.id)
-        .order_by(EquipoAdjunto.created_at.desc(), EquipoAdjunto.id.desc())
-    )
-    evidencias_pagination = evidencias_query.paginate(
-        page=evidencias_page, per_page=per_page, error_out=False
-    )
-
-    return render_template(
-        "equipos/detalle.html",
-        equipo=equipo,
-        insumos_pagination=insumos_pagination,
-        historial_pagination=historial_pagination,
-        actas_pagination=actas_pagination,
-        evidencias_pagination=evidencias_pagination,
-        adjunto_form=form_adjuntos,
-        tipos_acta=list(TipoActa),
-        max_upload_size=current_app.config.get("EQUIPOS_MAX_FILE_SIZE", 10 * 1024 * 1024),
-    )
+    response.set_etag(etag, weak=True)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
 
 
 @equipos_bp.post("/<int:equipo_id>/insumos/asociar")
@@ -432,7 +676,7 @@ def asociar_insumo(equipo_id: int):
         "Asociación de insumo",
         f"{insumo.nombre} · {serie.nro_serie}",
     )
-    db.session.flush()
+    actualizar_insumo_hospital([insumo.id])
     db.session.commit()
 
     respuesta = {
@@ -505,6 +749,7 @@ def quitar_insumo(equipo_id: int):
         "Desasociación de insumo",
         f"{insumo.nombre} · {serie.nro_serie}",
     )
+    actualizar_insumo_hospital([insumo.id])
     db.session.commit()
 
     return jsonify(
@@ -517,42 +762,114 @@ def quitar_insumo(equipo_id: int):
     )
 
 
-@equipos_bp.route("/<int:equipo_id>/historial/datos")
+@equipos_bp.route("/<int:equipo_id>/insumos/datos")
 @login_required
 @permissions_required("inventario:read")
 @require_hospital_access(Modulo.INVENTARIO)
-def historial_datos(equipo_id: int):
+def insumos_datos(equipo_id: int):
     equipo = Equipo.query.get_or_404(equipo_id)
 
     limit = _parse_limit(request.args.get("limit", type=int), default=10)
     offset = _parse_offset(request.args.get("offset", type=int))
-    tipo = (request.args.get("tipo", "") or "").strip()
-    desde = _parse_iso_date(request.args.get("desde"))
-    hasta = _parse_iso_date(request.args.get("hasta"))
 
-    query = (
-        EquipoHistorial.query.filter(EquipoHistorial.equipo_id == equipo.id)
-        .order_by(EquipoHistorial.fecha.desc())
+    query = EquipoInsumo.query.filter(
+        EquipoInsumo.equipo_id == equipo.id,
+        EquipoInsumo.fecha_desasociacion.is_(None),
     )
-    if tipo:
-        like = f"%{tipo}%"
-        query = query.filter(
-            or_(
-                EquipoHistorial.accion.ilike(like),
-                EquipoHistorial.descripcion.ilike(like),
-            )
-        )
-    if desde:
-        query = query.filter(
-            EquipoHistorial.fecha >= datetime.combine(desde, time.min)
-        )
-    if hasta:
-        query = query.filter(
-            EquipoHistorial.fecha <= datetime.combine(hasta, time.max)
+    total = query.count()
+    asignaciones = (
+        query.options(
+            joinedload(EquipoInsumo.insumo),
+            joinedload(EquipoInsumo.serie),
+            joinedload(EquipoInsumo.asociado_por),
         )
+        .order_by(EquipoInsumo.fecha_asociacion.desc(), EquipoInsumo.id.desc())
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
 
+    items = [
+        {
+            "id": asignacion.id,
+            "insumo": {"id": asignacion.insumo.id, "nombre": asignacion.insumo.nombre},
+            "serie": {"id": asignacion.serie.id, "nro_serie": asignacion.serie.nro_serie},
+            "fecha_asociacion": asignacion.fecha_asociacion.isoformat()
+            if asignacion.fecha_asociacion
+            else None,
+            "asociado_por": asignacion.asociado_por.nombre if asignacion.asociado_por else None,
+        }
+        for asignacion in asignaciones
+    ]
+    return _remote_page(items, total, limit, offset)
+
+
+@equipos_bp.route("/<int:equipo_id>/evidencias/datos")
+@login_required
+@permissions_required("inventario:read")
+@require_hospital_access(Modulo.INVENTARIO)
+def evidencias_datos(equipo_id: int):
+    equipo = Equipo.query.get_or_404(equipo_id)
+
+    limit = _parse_limit(request.args.get("limit", type=int), default=10)
+    offset = _parse_offset(request.args.get("offset", type=int))
+
+    query = EquipoAdjunto.query.filter(EquipoAdjunto.equipo_id == equipo.id)
     total = query.count()
-    registros = query.offset(offset).limit(limit).all()
+    archivos = (
+        query.order_by(EquipoAdjunto.created_at.desc(), EquipoAdjunto.id.desc())
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+
+    items = []
+    for archivo in archivos:
+        mime_type = archivo.mime_type or "application/octet-stream"
+        es_imagen = mime_type.startswith("image/")
+        items.append(
+            {
+                "id": archivo.id,
+                "filename": archivo.filename,
+                "mime_type": mime_type,
+                "size_display": humanize_bytes(archivo.size_in_bytes()),
+                "fecha_display": archivo.created_at.strftime("%d/%m/%Y %H:%M")
+                if archivo.created_at
+                else "",
+                "thumbnail_url": url_for("files.thumbnail", file_id=archivo.id) if es_imagen else None,
+                "view_url": url_for("files.view_file", file_id=archivo.id),
+                "download_url": url_for("files.download_file", file_id=archivo.id),
+                "delete_url": url_for("files.delete_file", file_id=archivo.id),
+            }
+        )
+    return _remote_page(items, total, limit, offset)
+
+
+@equipos_bp.route("/<int:equipo_id>/historial/datos")
+@login_required
+@permissions_required("inventario:read")
+@require_hospital_access(Modulo.INVENTARIO)
+def historial_datos(equipo_id: int):
+    equipo = Equipo.query.get_or_404(equipo_id)
+
+    limit = _parse_limit(request.args.get("limit", type=int), default=10)
+    query = _historial_query(
+        equipo.id,
+        (request.args.get("tipo", "") or "").strip(),
+        _parse_iso_date(request.args.get("desde")),
+        _parse_iso_date(request.args.get("hasta")),
+    )
+    try:
+        page = keyset_paginate(
+            query,
+            [EquipoHistorial.fecha, EquipoHistorial.id],
+            after=request.args.get("cursor") or None,
+            per_page=limit,
+            with_total=request.args.get("with_total", type=int) == 1,
+            descending=True,
+        )
+    except ValueError:
+        return jsonify({"items": [], "next_cursor": None, "more": False, "message": "Cursor inválido"}), 400
 
     items = [
         {
@@ -565,24 +882,17 @@ def historial_datos(equipo_id: int):
             else "",
             "usuario": registro.usuario.nombre if registro.usuario else None,
         }
-        for registro in registros
+        for registro in page.items
     ]
-
-    next_offset = offset + limit if offset + limit < total else None
-    prev_offset = offset - limit if offset > 0 else None
-    if prev_offset is not None and prev_offset < 0:
-        prev_offset = 0
-
-    return jsonify(
-        {
-            "items": items,
-            "total": total,
-            "limit": limit,
-            "offset": offset,
-            "next_offset": next_offset,
-            "previous_offset": prev_offset,
-        }
-    )
+    payload = {
+        "items": items,
+        "limit": limit,
+        "next_cursor": page.next_cursor,
+        "more": page.more,
+    }
+    if page.total is not None:
+        payload["total"] = page.total
+    return jsonify(payload)
 
 
 @equipos_bp.route("/<int:equipo_id>/actas/datos")
@@ -593,33 +903,22 @@ def actas_datos(equipo_id: int):
     equipo = Equipo.query.get_or_404(equipo_id)
 
     limit = _parse_limit(request.args.get("limit", type=int), default=10)
-    offset = _parse_offset(request.args.get("offset", type=int))
-    tipo = (request.args.get("tipo") or "").strip()
-    desde = _parse_iso_date(request.args.get("desde"))
-    hasta = _parse_iso_date(request.args.get("hasta"))
-
-    query = (
-        Acta.query.join(Acta.items)
-        .filter(ActaItem.equipo_id == equipo.id)
-        .order_by(Acta.fecha.desc())
-        .distinct()
-    )
-
-    if tipo:
-        try:
-            tipo_enum = TipoActa(tipo)
-        except ValueError:
-            tipo_enum = None
-        if tipo_enum:
-            query = query.filter(Acta.tipo == tipo_enum)
-
-    if desde:
-        query = query.filter(Acta.fecha >= datetime.combine(desde, time.min))
-    if hasta:
-        query = query.filter(Acta.fecha <= datetime.combine(hasta, time.max))
-
-    total = query.count()
-    actas = query.offset(offset).limit(limit).all()
+    try:
+        tipo = TipoActa((request.args.get("tipo") or "").strip())
+    except ValueError:
+        tipo = None
+    try:
+        page = actas_de_equipo(
+            equipo.id,
+            after=request.args.get("cursor") or None,
+            per_page=limit,
+            tipo=tipo,
+            desde=_parse_iso_date(request.args.get("desde")),
+            hasta=_parse_iso_date(request.args.get("hasta")),
+            with_total=request.args.get("with_total", type=int) == 1,
+        )
+    except ValueError:
+        return jsonify({"items": [], "next_cursor": None, "more": False, "message": "Cursor inválido"}), 400
 
     items = [
         {
@@ -628,26 +927,20 @@ def actas_datos(equipo_id: int):
             "tipo_label": normalize_enum_value(acta.tipo) if acta.tipo else "",
             "fecha": acta.fecha.isoformat() if acta.fecha else None,
             "fecha_display": acta.fecha.strftime("%d/%m/%Y") if acta.fecha else "",
+            "items_count": acta.items_count,
             "url": url_for("actas.detalle", acta_id=acta.id),
         }
-        for acta in actas
+        for acta in page.items
     ]
-
-    next_offset = offset + limit if offset + limit < total else None
-    prev_offset = offset - limit if offset > 0 else None
-    if prev_offset is not None and prev_offset < 0:
-        prev_offset = 0
-
-    return jsonify(
-        {
-            "items": items,
-            "total": total,
-            "limit": limit,
-            "offset": offset,
-            "next_offset": next_offset,
-            "previous_offset": prev_offset,
-        }
-    )
+    payload = {
+        "items": items,
+        "limit": limit,
+        "next_cursor": page.next_cursor,
+        "more": page.more,
+    }
+    if page.total is not None:
+        payload["total"] = page.total
+    return jsonify(payload)
 
 
 def _max_upload_size() -> int:
@@ -706,7 +999,7 @@ def subir_adjunto(equipo_id: int):
     )
     db.session.add(adjunto)
     equipo.registrar_evento(current_user, "Adjunto", f"Archivo {original_name} cargado")
-    db.session.commit()
+    db.session.flush()
     log_action(
         usuario_id=current_user.id,
         accion="subir_adjunto",
@@ -714,6 +1007,7 @@ def subir_adjunto(equipo_id: int):
         tabla="equipos_adjuntos",
         registro_id=adjunto.id,
     )
+    db.session.commit()
     flash("Archivo adjuntado correctamente.", "success")
     return redirect(url_for("equipos.detalle", equipo_id=equipo.id))
 
@@ -726,37 +1020,35 @@ def historial_completo(equipo_id: int):
     equipo = Equipo.query.get_or_404(equipo_id)
     form = EquipoHistorialFiltroForm(request.args)
 
-    query = (
-        EquipoHistorial.query.filter(EquipoHistorial.equipo_id == equipo.id)
-        .order_by(EquipoHistorial.fecha.desc())
-    )
-
     if form.validate():
-        if form.accion.data:
-            like = f"%{form.accion.data.strip()}%"
-            query = query.filter(
-                or_(
-                    EquipoHistorial.accion.ilike(like),
-                    EquipoHistorial.descripcion.ilike(like),
-                )
-            )
-        if form.fecha_desde.data:
-            inicio = datetime.combine(form.fecha_desde.data, time.min)
-            query = query.filter(EquipoHistorial.fecha >= inicio)
-        if form.fecha_hasta.data:
-            fin = datetime.combine(form.fecha_hasta.data, time.max)
-            query = query.filter(EquipoHistorial.fecha <= fin)
-
-    page = request.args.get("page", type=int, default=1)
-    per_page = current_app.config.get("DEFAULT_PAGE_SIZE", 20)
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        query = _historial_query(
+            equipo.id,
+            (form.accion.data or "").strip(),
+            form.fecha_desde.data,
+            form.fecha_hasta.data,
+        )
+    else:
+        query = _historial_query(equipo.id)
+
+    after = request.args.get("after") or None
+    try:
+        keyset = keyset_paginate(
+            query,
+            [EquipoHistorial.fecha, EquipoHistorial.id],
+            after=after,
+            per_page=current_app.config.get("DEFAULT_PAGE_SIZE", 20),
+            descending=True,
+        )
+    except ValueError:
+        abort(400)
 
     return render_template(
         "equipos/historial.html",
         equipo=equipo,
         form=form,
-        registros=pagination.items,
-        pagination=pagination,
+        registros=keyset.items,
+        keyset=keyset,
+        is_first_page=after is None,
     )
 
 
@@ -768,33 +1060,32 @@ def actas_completas(equipo_id: int):
     equipo = Equipo.query.get_or_404(equipo_id)
     form = EquipoActaFiltroForm(request.args)
 
-    query = (
-        Acta.query.join(Acta.items)
-        .filter(ActaItem.equipo_id == equipo.id)
-        .order_by(Acta.fecha.desc())
-        .distinct()
-    )
-
+    filtros = {}
     if form.validate():
-        if form.tipo.data:
-            query = query.filter(Acta.tipo == TipoActa(form.tipo.data))
-        if form.fecha_desde.data:
-            inicio = datetime.combine(form.fecha_desde.data, time.min)
-            query = query.filter(Acta.fecha >= inicio)
-        if form.fecha_hasta.data:
-            fin = datetime.combine(form.fecha_hasta.data, time.max)
-            query = query.filter(Acta.fecha <= fin)
-
-    page = request.args.get("page", type=int, default=1)
-    per_page = current_app.config.get("DEFAULT_PAGE_SIZE", 20)
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        filtros = {
+            "tipo": TipoActa(form.tipo.data) if form.tipo.data else None,
+            "desde": form.fecha_desde.data,
+            "hasta": form.fecha_hasta.data,
+        }
+
+    after = request.args.get("after") or None
+    try:
+        keyset = actas_de_equipo(
+            equipo.id,
+            after=after,
+            per_page=current_app.config.get("DEFAULT_PAGE_SIZE", 20),
+            **filtros,
+        )
+    except ValueError:
+        abort(400)
 
     return render_template(
         "equipos/actas.html",
         equipo=equipo,
         form=form,
-        actas=pagination.items,
-        pagination=pagination,
+        actas=keyset.items,
+        keyset=keyset,
+        is_first_page=after is None,
     )
 
 
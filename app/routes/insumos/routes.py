@@ -3,16 +3,16 @@ from __future__ import annotations
 
 from flask import Blueprint, current_app, flash, g, jsonify, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
-from sqlalchemy import or_
 from sqlalchemy.orm import selectinload
 
 from app.extensions import db
 from app.forms.insumo import InsumoForm, InsumoSeriesForm, MovimientoForm
-from app.models import Equipo, Insumo, InsumoSerie, MovimientoTipo, Modulo, SerieEstado
+from app.models import Insumo, InsumoMovimiento, InsumoSerie, MovimientoTipo, Modulo, SerieEstado
 from app.security import permissions_required, require_hospital_access
 from app.services import insumo_service
 from app.services.audit_service import log_action
 from app.services.equipo_service import equipment_options_for_ids
+from app.utils.search import build_substring_search
 
 insumos_bp = Blueprint("insumos", __name__, url_prefix="/insumos")
 
@@ -34,18 +34,13 @@ def listar():
     query = Insumo.query.order_by(Insumo.nombre)
     allowed = getattr(g, "allowed_hospitals", set())
     if allowed:
-        query = (
-            query.outerjoin(Insumo.equipos)
-            .filter(or_(Equipo.hospital_id.in_(allowed), Equipo.id.is_(None)))
-            .distinct()
-        )
+        query = query.filter(insumo_service.filtro_alcance_insumos(allowed))
     if buscar:
-        like = f"%{buscar}%"
         query = query.filter(
-            or_(
-                Insumo.nombre.ilike(like),
-                Insumo.numero_serie.ilike(like),
-                Insumo.descripcion.ilike(like),
+            build_substring_search(
+                [Insumo.nombre, Insumo.numero_serie, Insumo.descripcion],
+                buscar,
+                serial_columns=[Insumo.numero_serie_norm],
             )
         )
 
@@ -83,9 +78,9 @@ def crear():
         )
         db.session.add(insumo)
         db.session.flush()
+        log_action(usuario_id=current_user.id, accion="crear", modulo="insumos", tabla="insumos", registro_id=insumo.id)
         db.session.commit()
         flash("Insumo creado", "success")
-        log_action(usuario_id=current_user.id, accion="crear", modulo="insumos", tabla="insumos", registro_id=insumo.id)
         return redirect(url_for("insumos.listar"))
     return render_template(
         "insumos/formulario.html",
@@ -109,8 +104,8 @@ def editar(insumo_id: int):
         insumo.stock = form.stock.data
         insumo.stock_minimo = form.stock_minimo.data or 0
         insumo.costo_unitario = form.costo_unitario.data
-        db.session.commit()
         log_action(usuario_id=current_user.id, accion="editar", modulo="insumos", tabla="insumos", registro_id=insumo.id)
+        db.session.commit()
         flash("Insumo actualizado", "success")
         return redirect(url_for("insumos.detalle", insumo_id=insumo.id))
     return render_template(
@@ -135,11 +130,11 @@ def series_disponibles():
         .order_by(InsumoSerie.nro_serie.asc())
     )
     if query:
-        like = f"%{query}%"
         base_query = base_query.filter(
-            or_(
-                InsumoSerie.nro_serie.ilike(like),
-                Insumo.nombre.ilike(like),
+            build_substring_search(
+                [InsumoSerie.nro_serie, Insumo.nombre],
+                query,
+                serial_columns=[InsumoSerie.nro_serie_norm],
             )
         )
 
@@ -170,10 +165,18 @@ def detalle(insumo_id: int):
         .order_by(InsumoSerie.nro_serie.asc())
         .all()
     )
+    # Served by ix_insumo_movimientos_insumo_id_fecha instead of loading them all.
+    recientes = (
+        InsumoMovimiento.query.filter_by(insumo_id=insumo.id)
+        .options(selectinload(InsumoMovimiento.usuario), selectinload(InsumoMovimiento.equipo))
+        .order_by(InsumoMovimiento.fecha.desc(), InsumoMovimiento.id.desc())
+        .limit(20)
+        .all()
+    )
     return render_template(
         "insumos/detalle.html",
         insumo=insumo,
-        movimientos=insumo.movimientos[-20:],
+        movimientos=recientes[::-1],
         movimiento_form=movimiento_form,
         serie_form=serie_form,
         series=series,
@@ -10,6 +10,7 @@ from app.extensions import db
 from app.forms.permisos import PermisoForm
 from app.models import Hospital, Modulo, Permiso, Rol, Usuario
 from app.security import permissions_required
+from app.security.principal import bump_role_version
 from app.services.audit_service import log_action
 
 permisos_bp = Blueprint("permisos", __name__, url_prefix="/permisos")
@@ -221,6 +222,7 @@ def guardar_usuario(usuario_id: int):
     principal = next((hid for hid in hospital_ids if hid != 0), None)
     usuario.hospital_id = principal
 
+    bump_role_version(role.id)
     db.session.commit()
     log_action(
         usuario_id=current_user.id,
@@ -250,6 +252,7 @@ def crear():
             allow_export=form.allow_export.data,
         )
         db.session.add(permiso)
+        bump_role_version(permiso.rol_id)
         db.session.commit()
         log_action(usuario_id=current_user.id, accion="crear", modulo="permisos", tabla="permisos", registro_id=permiso.id)
         flash("Permiso creado", "success")
@@ -266,12 +269,14 @@ def editar(permiso_id: int):
     permiso = Permiso.query.get_or_404(permiso_id)
     form = PermisoForm(obj=permiso)
     if form.validate_on_submit():
+        rol_anterior_id = permiso.rol_id
         permiso.rol_id = form.rol_id.data
         permiso.modulo = Modulo(form.modulo.data)
         permiso.hospital_id = form.hospital_id.data or None
         permiso.can_read = form.can_read.data
         permiso.can_write = form.can_write.data
         permiso.allow_export = form.allow_export.data
+        bump_role_version(rol_anterior_id, permiso.rol_id)
         db.session.commit()
         log_action(usuario_id=current_user.id, accion="editar", modulo="permisos", tabla="permisos", registro_id=permiso.id)
         flash("Permiso actualizado", "success")
@@ -2,9 +2,11 @@
 from __future__ import annotations
 
 from flask import Blueprint, render_template, request
-from flask_login import login_required
+from flask_login import current_user, login_required
 
-from app.services.search_service import global_search
+from app.services.search_index_service import ENTITY_LABELS
+from app.services.search_service import search_page
+from app.utils.scope import get_user_hospital_scope
 
 search_bp = Blueprint("search", __name__, url_prefix="/search")
 
@@ -14,20 +16,26 @@ search_bp = Blueprint("search", __name__, url_prefix="/search")
 def search() -> str:
     query = request.args.get("q", "")
     page = request.args.get("page", type=int, default=1)
+    tipo = request.args.get("tipo") or None
     per_page = 10
 
-    resultados = global_search(query)
-    total = len(resultados)
-    start = (page - 1) * per_page
-    end = start + per_page
-    paginated = resultados[start:end]
+    resultados = search_page(
+        query,
+        get_user_hospital_scope(current_user),
+        page=page,
+        per_page=per_page,
+        tipo=tipo,
+    )
 
     return render_template(
         "search/results.html",
         query=query,
-        results=paginated,
-        page=page,
-        has_prev=page > 1,
-        has_next=end < total,
-        total=total,
+        results=resultados.items,
+        counts=resultados.counts,
+        labels=ENTITY_LABELS,
+        tipo=resultados.tipo,
+        page=resultados.page,
+        has_prev=resultados.has_prev,
+        has_next=resultados.has_next,
+        total=resultados.total,
     )
@@ -8,8 +8,9 @@ from flask import Blueprint, abort, jsonify, request
 from flask_login import current_user, login_required
 
 from app.models import Hospital, HospitalUsuarioRol, Rol, Usuario
+from app.security.principal import bump_role_version
 from app.services.audit_service import log_action
-from app.utils.search import apply_text_search, paginate_query
+from app.utils.search import apply_text_search, keyset_paginate, paginate_query
 
 search_api_bp = Blueprint("search_api", __name__, url_prefix="/api/search")
 
@@ -97,6 +98,27 @@ def live_search(resource: str):
         query = config.extra_filters(query)
 
     page, per_page = _sanitize_page()
+    if "after" in request.args:
+        # Cursor mode: seek past the last (label, id) seen and skip COUNT(*).
+        try:
+            keyset = keyset_paginate(
+                query,
+                [config.columns[0], config.model.id],
+                after=request.args.get("after"),
+                per_page=per_page,
+                with_total=request.args.get("with_total", type=int) == 1,
+            )
+        except ValueError:
+            abort(400)
+        payload = {
+            "results": [config.formatter(item) for item in keyset.items],
+            "next_cursor": keyset.next_cursor,
+            "more": keyset.more,
+        }
+        if keyset.total is not None:
+            payload["total"] = keyset.total
+        return jsonify(payload)
+
     pagination = paginate_query(query, page=page, per_page=per_page)
     items = [config.formatter(item) for item in pagination.items]
     return jsonify(
@@ -168,6 +190,7 @@ def bulk_update_usuario_hospitales(usuario_id: int):
     from app.extensions import db
 
     db.session.add(usuario)
+    bump_role_version(usuario.rol_id)
     db.session.commit()
 
     log_action(
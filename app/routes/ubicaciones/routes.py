@@ -60,7 +60,7 @@ def crear_hospital():
             estado=form.estado.data,
         )
         db.session.add(hospital)
-        db.session.commit()
+        db.session.flush()
         log_action(
             usuario_id=None,
             accion="crear",
@@ -68,6 +68,7 @@ def crear_hospital():
             tabla="instituciones",
             registro_id=hospital.id,
         )
+        db.session.commit()
         flash("Institución creada", "success")
         return redirect(url_for("ubicaciones.listar"))
     return render_template(
@@ -102,7 +102,7 @@ def crear_vlan():
             oficina_id=form.oficina_id.data or None,
         )
         db.session.add(vlan)
-        db.session.commit()
+        db.session.flush()
         log_action(
             usuario_id=current_user.id,
             accion="crear",
@@ -111,6 +111,7 @@ def crear_vlan():
             registro_id=vlan.id,
             hospital_id=vlan.hospital_id,
         )
+        db.session.commit()
         flash("VLAN creada correctamente.", "success")
         return redirect(url_for("vlans.detalle", vlan_id=vlan.id))
     return render_template("vlans/form_vlan.html", form=form, titulo="Nueva VLAN")
@@ -167,7 +168,6 @@ def editar_vlan(vlan_id: int):
         vlan.hospital_id = form.hospital_id.data
         vlan.servicio_id = form.servicio_id.data or None
         vlan.oficina_id = form.oficina_id.data or None
-        db.session.commit()
         log_action(
             usuario_id=current_user.id,
             accion="actualizar",
@@ -176,6 +176,7 @@ def editar_vlan(vlan_id: int):
             registro_id=vlan.id,
             hospital_id=vlan.hospital_id,
         )
+        db.session.commit()
         flash("VLAN actualizada correctamente.", "success")
         return redirect(url_for("vlans.detalle", vlan_id=vlan.id))
     return render_template(
@@ -194,7 +195,6 @@ def eliminar_vlan(vlan_id: int):
 
     vlan = Vlan.query.get_or_404(vlan_id)
     db.session.delete(vlan)
-    db.session.commit()
     log_action(
         usuario_id=current_user.id,
         accion="eliminar",
@@ -203,6 +203,7 @@ def eliminar_vlan(vlan_id: int):
         registro_id=vlan.id,
         hospital_id=vlan.hospital_id,
     )
+    db.session.commit()
     flash("VLAN eliminada.", "success")
     return redirect(url_for("vlans.listar"))
 
@@ -228,7 +229,7 @@ def crear_dispositivo(vlan_id: int):
             notas=(form.notas.data or "").strip() or None,
         )
         db.session.add(dispositivo)
-        db.session.commit()
+        db.session.flush()
         log_action(
             usuario_id=current_user.id,
             accion="crear",
@@ -237,6 +238,7 @@ def crear_dispositivo(vlan_id: int):
             registro_id=dispositivo.id,
             hospital_id=dispositivo.hospital_id,
         )
+        db.session.commit()
         flash("Dispositivo registrado correctamente.", "success")
         return redirect(url_for("vlans.detalle", vlan_id=dispositivo.vlan_id))
     return render_template(
@@ -269,7 +271,6 @@ def editar_dispositivo(dispositivo_id: int):
         dispositivo.servicio_id = form.servicio_id.data or None
         dispositivo.oficina_id = form.oficina_id.data or None
         dispositivo.notas = (form.notas.data or "").strip() or None
-        db.session.commit()
         log_action(
             usuario_id=current_user.id,
             accion="actualizar",
@@ -278,6 +279,7 @@ def editar_dispositivo(dispositivo_id: int):
             registro_id=dispositivo.id,
             hospital_id=dispositivo.hospital_id,
         )
+        db.session.commit()
         flash("Dispositivo actualizado correctamente.", "success")
         return redirect(url_for("vlans.detalle", vlan_id=dispositivo.vlan_id))
     return render_template(
@@ -298,7 +300,6 @@ def eliminar_dispositivo(dispositivo_id: int):
     dispositivo = VlanDispositivo.query.get_or_404(dispositivo_id)
     vlan_id = dispositivo.vlan_id
     db.session.delete(dispositivo)
-    db.session.commit()
     log_action(
         usuario_id=current_user.id,
         accion="eliminar",
@@ -307,6 +308,7 @@ def eliminar_dispositivo(dispositivo_id: int):
         registro_id=dispositivo.id,
         hospital_id=dispositivo.hospital_id,
     )
+    db.session.commit()
     flash("Dispositivo eliminado.", "success")
     return redirect(url_for("vlans.detalle", vlan_id=vlan_id))
 
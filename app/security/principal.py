@@ -0,0 +1,195 @@
+"""Compiled permission sets for the authenticated user."""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Mapping
+
+from flask import current_app, g, has_app_context
+from sqlalchemy import update
+
+from app.extensions import db
+from app.models import Rol
+
+if TYPE_CHECKING:  # pragma: no cover
+    from app.models import Usuario
+
+CACHE_EXTENSION_KEY = "principal_cache"
+_G_KEY = "principals"
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Immutable snapshot of a user's role permissions and hospitals.
+
+    Built from ``rol.permisos`` and ``hospitales_roles`` and tagged with the
+    ``permisos_version`` of the role it was compiled from. The user's own
+    ``hospital_id`` is read from the row at check time and not stored here.
+    """
+
+    usuario_id: int
+    rol_id: int | None
+    version: int
+    is_superadmin: bool = False
+    permissions: frozenset[str] = frozenset()
+    hospitals_by_module: Mapping[str, frozenset[int]] = field(default_factory=dict)
+    permiso_hospitals: frozenset[int] = frozenset()
+    assigned_hospitals: frozenset[int] = frozenset()
+
+    def has_permission(self, permiso: str) -> bool:
+        return permiso in self.permissions
+
+    def allowed_hospital_ids(self, modulo: str | None, hospital_id: int | None) -> set[int]:
+        """Return hospital IDs reachable for ``modulo`` (any module when ``None``)."""
+
+        if self.is_superadmin:
+            return set(self.permiso_hospitals or self.assigned_hospitals)
+        if modulo:
+            hospital_ids = set(self.hospitals_by_module.get(modulo, ()))
+        else:
+            hospital_ids = set(self.permiso_hospitals)
+        if hospital_id:
+            hospital_ids.add(hospital_id)
+        hospital_ids.update(self.assigned_hospitals)
+        return hospital_ids
+
+
+def _role_version(usuario: "Usuario") -> tuple[int | None, int]:
+    rol = usuario.rol
+    if rol is None:
+        return None, 0
+    return rol.id, rol.permisos_version or 0
+
+
+def compile_principal(usuario: "Usuario") -> Principal:
+    """Build the :class:`Principal` of ``usuario`` from its role and assignments."""
+
+    rol_id, version = _role_version(usuario)
+    assigned = frozenset(rel.hospital_id for rel in usuario.hospitales_roles)
+    if usuario.rol is None:
+        return Principal(usuario.id, None, version, assigned_hospitals=assigned)
+
+    permissions: set[str] = set()
+    by_module: dict[str, set[int]] = {}
+    for permiso in usuario.rol.permisos:
+        prefix = permiso.modulo.value
+        if permiso.can_read:
+            permissions.add(f"{prefix}:read")
+        if permiso.can_write:
+            permissions.add(f"{prefix}:write")
+        if permiso.hospital_id:
+            by_module.setdefault(prefix, set()).add(permiso.hospital_id)
+    return Principal(
+        usuario_id=usuario.id,
+        rol_id=rol_id,
+        version=version,
+        is_superadmin=(usuario.rol.nombre or "").lower() == "superadmin",
+        permissions=frozenset(permissions),
+        hospitals_by_module={modulo: frozenset(ids) for modulo, ids in by_module.items()},
+        permiso_hospitals=frozenset(hid for ids in by_module.values() for hid in ids),
+        assigned_hospitals=assigned,
+    )
+
+
+class PrincipalCache:
+    """Process-local principals keyed by user and checked against the role version.
+
+    The version lives in ``roles.permisos_version``, which is loaded together
+    with the user on every request, so a change committed by any worker makes
+    the cached entry stale without an extra query.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[int, Principal] = {}
+        self._lock = threading.Lock()
+
+    def get(self, usuario_id: int, rol_id: int | None, version: int) -> Principal | None:
+        with self._lock:
+            principal = self._entries.get(usuario_id)
+        if principal is None or principal.rol_id != rol_id or principal.version != version:
+            return None
+        return principal
+
+    def peek(self, usuario_id: int) -> Principal | None:
+        """Return the entry of ``usuario_id`` without checking its version."""
+
+        with self._lock:
+            return self._entries.get(usuario_id)
+
+    def set(self, principal: Principal) -> None:
+        with self._lock:
+            self._entries[principal.usuario_id] = principal
+
+    def discard_roles(self, rol_ids: set[int]) -> None:
+        with self._lock:
+            for usuario_id, principal in list(self._entries.items()):
+                if principal.rol_id in rol_ids:
+                    del self._entries[usuario_id]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def get_principal_cache(app=None) -> PrincipalCache:
+    """Return the principal cache bound to ``app`` (or the current app)."""
+
+    target = app or current_app
+    cache = target.extensions.get(CACHE_EXTENSION_KEY)
+    if cache is None:
+        cache = target.extensions.setdefault(CACHE_EXTENSION_KEY, PrincipalCache())
+    return cache
+
+
+def get_principal(usuario: "Usuario") -> Principal:
+    """Return the principal of ``usuario`` memoized on ``g`` and per process."""
+
+    if not has_app_context():
+        return compile_principal(usuario)
+
+    memo: dict[int, Principal] = g.setdefault(_G_KEY, {})
+    rol_id, version = _role_version(usuario)
+    principal = memo.get(usuario.id)
+    if principal is not None and principal.rol_id == rol_id and principal.version == version:
+        return principal
+
+    cache = get_principal_cache()
+    principal = cache.get(usuario.id, rol_id, version)
+    if principal is None:
+        principal = compile_principal(usuario)
+        cache.set(principal)
+    memo[usuario.id] = principal
+    return principal
+
+
+def bump_role_version(*rol_ids: int | None) -> None:
+    """Mark the permissions of ``rol_ids`` as changed.
+
+    The increment joins the caller's transaction; principals compiled from
+    the previous version stop matching once it is committed.
+    """
+
+    ids = {rol_id for rol_id in rol_ids if rol_id}
+    if not ids:
+        return
+    db.session.execute(
+        update(Rol)
+        .where(Rol.id.in_(ids))
+        .values(permisos_version=Rol.permisos_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    for rol in db.session.identity_map.values():
+        if isinstance(rol, Rol) and rol.id in ids:
+            db.session.expire(rol, ["permisos_version"])
+    get_principal_cache().discard_roles(ids)
+    g.pop(_G_KEY, None)
+
+
+__all__ = [
+    "Principal",
+    "PrincipalCache",
+    "bump_role_version",
+    "compile_principal",
+    "get_principal",
+    "get_principal_cache",
+]
@@ -0,0 +1,68 @@
+"""Queries over the actas that include a given equipo."""
+from __future__ import annotations
+
+from datetime import date, datetime, time
+
+from sqlalchemy import func, select
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.extensions import db
+from app.models import Acta, ActaItem, TipoActa
+from app.utils.search import KeysetPage, keyset_paginate
+
+
+def actas_de_equipo(
+    equipo_id: int,
+    *,
+    after: str | None = None,
+    per_page: int = 20,
+    tipo: TipoActa | None = None,
+    desde: date | None = None,
+    hasta: date | None = None,
+    with_total: bool = False,
+) -> KeysetPage:
+    """Return the actas including ``equipo_id``, newest first, by cursor.
+
+    The page of acta ids is read backwards from the ``acta_items(equipo_id,
+    acta_id)`` index, so neither the page nor the optional total joins and
+    de-duplicates every item of the equipo. The actas are then loaded by
+    primary key, each with its ``items_count`` from one grouped query.
+    ``Acta.fecha`` is the insertion time, so id order is date order.
+    Raises :class:`ValueError` for tampered cursors.
+    """
+
+    acta_ids = db.session.query(ActaItem.acta_id).filter(ActaItem.equipo_id == equipo_id)
+    if tipo is not None or desde or hasta:
+        acta_ids = acta_ids.join(Acta, Acta.id == ActaItem.acta_id)
+    if tipo is not None:
+        acta_ids = acta_ids.filter(Acta.tipo == tipo)
+    if desde:
+        acta_ids = acta_ids.filter(Acta.fecha >= datetime.combine(desde, time.min))
+    if hasta:
+        acta_ids = acta_ids.filter(Acta.fecha <= datetime.combine(hasta, time.max))
+    page = keyset_paginate(
+        acta_ids.distinct(),
+        [ActaItem.acta_id],
+        after=after,
+        per_page=per_page,
+        with_total=with_total,
+        descending=True,
+    )
+    if not page.items:
+        return page
+
+    actas = {acta.id: acta for acta in Acta.query.filter(Acta.id.in_(page.items))}
+    conteos = dict(
+        db.session.execute(
+            select(ActaItem.acta_id, func.count())
+            .where(ActaItem.acta_id.in_(page.items))
+            .group_by(ActaItem.acta_id)
+        ).all()
+    )
+    for acta in actas.values():
+        set_committed_value(acta, "items_count", conteos.get(acta.id, 0))
+    page.items = [actas[acta_id] for acta_id in page.items]
+    return page
+
+
+__all__ = ["actas_de_equipo"]
@@ -0,0 +1,265 @@
+"""Archiving of old audit entries to compressed JSON Lines files.
+
+On PostgreSQL ``auditorias`` is partitioned by month (migration 0009): whole
+months older than the cutoff are exported and their partitions detached or
+dropped. Rows that do not live in such a partition, and every row on other
+dialects, are exported and deleted in batches.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+from sqlalchemy import column, delete, select, table, text
+from sqlalchemy.orm import Session
+
+from app.models import Auditoria
+
+PARTITION_PATTERN = re.compile(r"^auditorias_(\d{4})_(\d{2})$")
+
+_AUDIT_TABLE = Auditoria.__table__
+
+
+def parse_month(value: str) -> date:
+    """Return the first day of a ``YYYY-MM`` month."""
+
+    try:
+        parsed = datetime.strptime(value.strip(), "%Y-%m")
+    except (AttributeError, ValueError) as exc:
+        raise ValueError(f"Mes inválido: {value!r}. Usá el formato AAAA-MM.") from exc
+    return date(parsed.year, parsed.month, 1)
+
+
+def next_month(value: date) -> date:
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"auditorias_{month:%Y_%m}"
+
+
+def _month_start_utc(month: date) -> datetime:
+    return datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+
+
+def is_partitioned(session: Session) -> bool:
+    """Whether ``auditorias`` is a partitioned PostgreSQL table."""
+
+    if session.get_bind().dialect.name != "postgresql":
+        return False
+    return bool(
+        session.scalar(
+            text(
+                "SELECT 1 FROM pg_partitioned_table pt "
+                "JOIN pg_class c ON c.oid = pt.partrelid "
+                "WHERE c.relname = 'auditorias' AND pg_table_is_visible(c.oid)"
+            )
+        )
+    )
+
+
+def monthly_partitions(session: Session) -> list[tuple[date, str]]:
+    """Return ``(month, name)`` of the monthly partitions, oldest first."""
+
+    names = session.scalars(
+        text(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "WHERE parent.relname = 'auditorias' AND pg_table_is_visible(parent.oid)"
+        )
+    )
+    partitions = []
+    for name in names:
+        match = PARTITION_PATTERN.match(name)
+        if match:
+            partitions.append((date(int(match.group(1)), int(match.group(2)), 1), name))
+    return sorted(partitions)
+
+
+def _create_partition(session: Session, month: date) -> int:
+    """Create the partition of ``month`` and return how many rows it took over.
+
+    PostgreSQL refuses a partition whose range already has rows in the
+    default partition, so those rows are moved into a plain table that is
+    then attached, all in the caller's transaction.
+    """
+
+    name = partition_name(month)
+    bounds = (
+        f"FROM ('{month:%Y-%m-%d} 00:00:00+00') "
+        f"TO ('{next_month(month):%Y-%m-%d} 00:00:00+00')"
+    )
+    params = {"desde": _month_start_utc(month), "hasta": _month_start_utc(next_month(month))}
+    # Without a partition for the month, its rows can only be in the default one.
+    in_range = "created_at >= :desde AND created_at < :hasta"
+    if not session.scalar(text(f"SELECT EXISTS (SELECT 1 FROM auditorias WHERE {in_range})"), params):
+        session.execute(text(f"CREATE TABLE {name} PARTITION OF auditorias FOR VALUES {bounds}"))
+        return 0
+
+    columns = ", ".join(col.name for col in _AUDIT_TABLE.columns)
+    session.execute(
+        text(f"CREATE TABLE {name} (LIKE auditorias INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    )
+    moved = session.execute(
+        text(
+            f"WITH moved AS (DELETE FROM auditorias WHERE {in_range} RETURNING {columns}) "
+            f"INSERT INTO {name} ({columns}) SELECT {columns} FROM moved"
+        ),
+        params,
+    ).rowcount
+    session.execute(text(f"ALTER TABLE auditorias ATTACH PARTITION {name} FOR VALUES {bounds}"))
+    return moved
+
+
+def ensure_partitions(
+    session: Session,
+    months_ahead: int = 3,
+    today: date | None = None,
+    echo: Callable[[str], None] | None = None,
+) -> list[str]:
+    """Create the partitions of the current and next ``months_ahead`` months.
+
+    Rows of those months already stored in the default partition are moved
+    into the new ones. Returns the names of the created partitions and
+    commits them.
+    """
+
+    if not is_partitioned(session):
+        return []
+    existing = {name for _month, name in monthly_partitions(session)}
+    today = today or datetime.now(timezone.utc).date()
+    month = date(today.year, today.month, 1)
+    created = []
+    for _ in range(months_ahead + 1):
+        name = partition_name(month)
+        if name not in existing:
+            moved = _create_partition(session, month)
+            if moved and echo:
+                echo(f"{name}: {moved} registros movidos desde la partición por defecto")
+            created.append(name)
+        month = next_month(month)
+    session.commit()
+    return created
+
+
+def _serialize(row: dict[str, Any]) -> str:
+    values = {
+        key: value.isoformat() if isinstance(value, (date, datetime)) else value
+        for key, value in row.items()
+    }
+    return json.dumps(values, ensure_ascii=False, default=str)
+
+
+@dataclass
+class ArchiveResult:
+    rows: int = 0
+    files: list[Path] = field(default_factory=list)
+    partitions: list[str] = field(default_factory=list)
+
+
+def _archive_partition(
+    session: Session, name: str, path: Path, *, batch_size: int, detach_only: bool
+) -> int:
+    partition = table(name, *[column(col.name) for col in _AUDIT_TABLE.columns])
+    count = 0
+    connection = session.connection()
+    result = connection.execution_options(stream_results=True, max_row_buffer=batch_size).execute(
+        select(partition).order_by(partition.c.id)
+    )
+    with gzip.open(path, "wt", encoding="utf-8") as handle:
+        for row in result.mappings():
+            handle.write(_serialize(dict(row)) + "\n")
+            count += 1
+    session.execute(text(f"ALTER TABLE auditorias DETACH PARTITION {name}"))
+    if not detach_only:
+        session.execute(text(f"DROP TABLE {name}"))
+    session.commit()
+    return count
+
+
+def _archive_rows(session: Session, cutoff: datetime, path: Path, *, batch_size: int) -> int:
+    count = 0
+    handle = None
+    try:
+        while True:
+            rows = (
+                session.execute(
+                    select(_AUDIT_TABLE)
+                    .where(_AUDIT_TABLE.c.created_at < cutoff)
+                    .order_by(_AUDIT_TABLE.c.id)
+                    .limit(batch_size)
+                )
+                .mappings()
+                .all()
+            )
+            if not rows:
+                break
+            if handle is None:
+                # Appending keeps the rows of an interrupted previous run.
+                handle = gzip.open(path, "at", encoding="utf-8")
+            handle.writelines(_serialize(dict(row)) + "\n" for row in rows)
+            handle.flush()
+            session.execute(
+                delete(_AUDIT_TABLE).where(_AUDIT_TABLE.c.id.in_([row["id"] for row in rows]))
+            )
+            session.commit()
+            count += len(rows)
+    finally:
+        if handle is not None:
+            handle.close()
+    return count
+
+
+def archive_before(
+    session: Session,
+    before: date,
+    output_dir: str | Path,
+    *,
+    batch_size: int = 1000,
+    detach_only: bool = False,
+    echo: Callable[[str], None] | None = None,
+) -> ArchiveResult:
+    """Export and remove the audit entries created before the month ``before``."""
+
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    result = ArchiveResult()
+
+    if is_partitioned(session):
+        for month, name in monthly_partitions(session):
+            if month >= before:
+                continue
+            path = output / f"{name}.jsonl.gz"
+            rows = _archive_partition(
+                session, name, path, batch_size=batch_size, detach_only=detach_only
+            )
+            result.rows += rows
+            result.files.append(path)
+            result.partitions.append(name)
+            if echo:
+                echo(f"{name}: {rows} registros")
+
+    path = output / f"auditorias_antes_{before:%Y_%m}.jsonl.gz"
+    rows = _archive_rows(session, _month_start_utc(before), path, batch_size=batch_size)
+    if rows:
+        result.rows += rows
+        result.files.append(path)
+        if echo:
+            echo(f"{path.name}: {rows} registros")
+    return result
+
+
+__all__ = [
+    "ArchiveResult",
+    "archive_before",
+    "ensure_partitions",
+    "is_partitioned",
+    "monthly_partitions",
+    "parse_month",
+]
@@ -1,13 +1,137 @@
-"""Audit service writing records to the database."""
+"""Audit service writing records to the database.
+
+``AUDIT_MODE`` selects how :func:`log_action` persists entries:
+
+``commit``
+    The entry is added to the session and committed right away (default).
+``transaction``
+    The entry joins the caller's unit of work and is stored by the caller's
+    next commit. Entries still pending when the response is built are
+    stored by an ``after_request`` hook, so views that log after their own
+    commit keep working. The hook commits the request session only when the
+    entries are all it holds; otherwise they are written through their own
+    session and the view's uncommitted changes are left alone.
+``async``
+    The entry is queued in memory and bulk inserted by a background thread
+    every ``AUDIT_FLUSH_INTERVAL`` seconds or once ``AUDIT_BATCH_SIZE``
+    entries are waiting. The queue is drained when the worker exits.
+"""
 from __future__ import annotations
 
+import atexit
+import queue
+import threading
+from datetime import datetime, timezone
 from typing import Any
 
-from flask import request
+from flask import Flask, current_app, g, request
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
 
 from app.extensions import db
 from app.models import Auditoria
 
+AUDIT_MODES = ("commit", "transaction", "async")
+BUFFER_EXTENSION_KEY = "audit_buffer"
+# ``Session.info`` flag: rows other than audit entries were flushed in the
+# current transaction.
+_OTHER_WRITES_KEY = "audit_other_writes"
+
+
+class AuditBuffer:
+    """In-memory queue of audit rows flushed in batches by a daemon thread."""
+
+    def __init__(self, app: Flask, *, batch_size: int, interval: float) -> None:
+        self.app = app
+        self.batch_size = max(1, int(batch_size))
+        self.interval = max(0.1, float(interval))
+        self._queue: queue.SimpleQueue[dict[str, Any]] = queue.SimpleQueue()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def put(self, row: dict[str, Any]) -> None:
+        self._ensure_started()
+        self._queue.put(row)
+        if self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self.run, name="audit-flusher", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:  # pragma: no cover - keep the flusher alive
+                self.app.logger.exception("No se pudieron guardar los registros de auditoría")
+
+    def _drain(self) -> list[dict[str, Any]]:
+        rows: list[dict[str, Any]] = []
+        while len(rows) < self.batch_size:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def flush(self) -> int:
+        """Write every queued row in batches and return how many were stored."""
+
+        written = 0
+        with self._flush_lock:
+            while rows := self._drain():
+                with self.app.app_context(), Session(db.engine) as session:
+                    session.execute(insert(Auditoria), rows)
+                    session.commit()
+                written += len(rows)
+        return written
+
+    def close(self) -> None:
+        """Stop the flusher thread and write whatever is still queued."""
+
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.interval + 5)
+        self.flush()
+
+
+def get_audit_buffer(app: Flask | None = None) -> AuditBuffer:
+    """Return the audit buffer bound to ``app`` (or the current app)."""
+
+    target = app or current_app._get_current_object()  # type: ignore[attr-defined]
+    buffer = target.extensions.get(BUFFER_EXTENSION_KEY)
+    if buffer is None:
+        buffer = target.extensions.setdefault(
+            BUFFER_EXTENSION_KEY,
+            AuditBuffer(
+                target,
+                batch_size=target.config.get("AUDIT_BATCH_SIZE", 100),
+                interval=target.config.get("AUDIT_FLUSH_INTERVAL", 2.0),
+            ),
+        )
+    return buffer
+
+
+def _audit_mode() -> str:
+    mode = current_app.config.get("AUDIT_MODE", "commit")
+    return mode if mode in AUDIT_MODES else "commit"
+
 
 def log_action(
     *,
@@ -23,24 +147,89 @@ def log_action(
     entidad_id: int | None = None,
     cambios: dict[str, Any] | None = None,
 ) -> Auditoria:
-    """Persist an audit entry."""
-
-    entry = Auditoria(
-        usuario_id=usuario_id,
-        accion=accion,
-        modulo=modulo,
-        hospital_id=hospital_id,
-        entidad=entidad or tabla,
-        entidad_id=entidad_id or registro_id,
-        descripcion=descripcion,
-        cambios=cambios or datos,
-        ip_address=request.remote_addr if request else None,
-    )
+    """Record an audit entry according to ``AUDIT_MODE``.
+
+    Only in ``commit`` mode is the returned entry guaranteed to be stored.
+    """
+
+    values = {
+        "usuario_id": usuario_id,
+        "accion": accion,
+        "modulo": modulo,
+        "hospital_id": hospital_id,
+        "entidad": entidad or tabla,
+        "entidad_id": entidad_id or registro_id,
+        "descripcion": descripcion,
+        "cambios": cambios or datos,
+        "ip_address": request.remote_addr if request else None,
+    }
+    mode = _audit_mode()
+    if mode == "async":
+        values["created_at"] = datetime.now(timezone.utc)
+        get_audit_buffer().put(dict(values))
+        return Auditoria(**values)
+
+    entry = Auditoria(**values)
     db.session.add(entry)
-    db.session.commit()
+    if mode == "commit":
+        db.session.commit()
+    elif request:
+        g.setdefault("audit_pending", []).append(entry)
     return entry
 
 
+def _track_other_writes(session: Session, _flush_context) -> None:
+    # ``new``/``dirty``/``deleted`` still hold the pre-flush state here.
+    if any(
+        not isinstance(obj, Auditoria)
+        for obj in (*session.new, *session.dirty, *session.deleted)
+    ):
+        session.info[_OTHER_WRITES_KEY] = True
+
+
+def _reset_other_writes(session: Session) -> None:
+    session.info.pop(_OTHER_WRITES_KEY, None)
+
+
+def _holds_only_audit_entries(session: Session) -> bool:
+    return (
+        not session.info.get(_OTHER_WRITES_KEY)
+        and not session.deleted
+        and all(isinstance(obj, Auditoria) for obj in session.new)
+        and not any(session.is_modified(obj) for obj in session.dirty)
+    )
+
+
+def commit_pending_entries(response):
+    """Store audit entries logged in ``transaction`` mode after the caller's
+    last commit of the request."""
+
+    pending = g.pop("audit_pending", None)
+    entries = [entry for entry in pending or () if entry in db.session.new]
+    if not entries:
+        return response
+    if _holds_only_audit_entries(db.session):
+        db.session.commit()
+        return response
+    for entry in entries:
+        db.session.expunge(entry)
+    with Session(db.engine) as session:
+        session.add_all(entries)
+        session.commit()
+    return response
+
+
+def init_app(app: Flask) -> None:
+    for name, listener in (
+        ("after_flush", _track_other_writes),
+        ("after_commit", _reset_other_writes),
+        ("after_rollback", _reset_other_writes),
+    ):
+        if not event.contains(db.session, name, listener):
+            event.listen(db.session, name, listener)
+    app.after_request(commit_pending_entries)
+
+
 def get_logs(limit: int = 100) -> list[Auditoria]:
     """Return the most recent audit entries."""
 
@@ -49,4 +238,11 @@ def get_logs(limit: int = 100) -> list[Auditoria]:
     )
 
 
-__all__ = ["log_action", "get_logs"]
+__all__ = [
+    "AUDIT_MODES",
+    "AuditBuffer",
+    "get_audit_buffer",
+    "get_logs",
+    "init_app",
+    "log_action",
+]
@@ -1,9 +1,15 @@
 """Helpers to build dashboard metrics payloads."""
 from __future__ import annotations
 
+import copy
+import threading
+import time
 from datetime import date, datetime, timedelta
+from typing import Hashable
 
-from sqlalchemy import and_, func, or_, select
+from flask import current_app, has_app_context
+from sqlalchemy import and_, case, event, func, or_, select
+from sqlalchemy.orm import Session
 from sqlalchemy.sql import false
 
 from app.extensions import db
@@ -14,13 +20,113 @@ from app.models import (
     Equipo,
     Hospital,
     Insumo,
+    InsumoHospital,
     Licencia,
     TipoEquipo,
     Usuario,
 )
+from app.models.insumo import INSUMO_COBERTURA, INSUMO_CRITICO, INSUMO_FALTANTE
+from app.services.insumo_service import filtro_alcance_insumos
+from app.services.metricas_service import ensure_daily_snapshot, snapshot_columns
 from app.utils.scope import ScopeValue, get_user_hospital_scope
 
 
+CACHE_EXTENSION_KEY = "dashboard_metrics_cache"
+
+# Models whose writes change any figure shown on the dashboard.
+_CACHE_INVALIDATING_MODELS = (Equipo, EquipoInsumo, Hospital, Insumo, InsumoHospital, Licencia)
+
+
+class MetricsCache:
+    """Process-local TTL cache for dashboard payloads keyed by hospital scope.
+
+    Each gunicorn worker keeps its own copy; entries are dropped as soon as a
+    flush in this process touches one of the tracked models and otherwise
+    expire after ``DASHBOARD_CACHE_TIMEOUT`` seconds, which bounds how stale a
+    worker can be after a write handled by another worker.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[Hashable, tuple[float, dict[str, object]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, timeout: float) -> dict[str, object] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, payload = entry
+            if time.monotonic() - stored_at >= timeout:
+                self._entries.pop(key, None)
+                return None
+            return payload
+
+    def set(self, key: Hashable, payload: dict[str, object]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), payload)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+def get_metrics_cache(app=None) -> MetricsCache:
+    """Return the metrics cache bound to ``app`` (or the current app)."""
+
+    target = app or current_app
+    cache = target.extensions.get(CACHE_EXTENSION_KEY)
+    if cache is None:
+        cache = target.extensions.setdefault(CACHE_EXTENSION_KEY, MetricsCache())
+    return cache
+
+
+def invalidate_dashboard_cache() -> None:
+    """Drop every cached dashboard payload for the current app."""
+
+    if not has_app_context():
+        return
+    cache = current_app.extensions.get(CACHE_EXTENSION_KEY)
+    if cache is not None:
+        cache.clear()
+
+
+def invalidate_dashboard_cache_on_commit(session: Session) -> None:
+    """Drop the cached dashboard payloads again once ``session`` commits."""
+
+    session.info["dashboard_dirty"] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_on_flush(session, flush_context) -> None:
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, _CACHE_INVALIDATING_MODELS):
+            invalidate_dashboard_cache_on_commit(session)
+            invalidate_dashboard_cache()
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session) -> None:
+    # A concurrent request may have refilled the cache between our flush and
+    # the commit while still reading the previous snapshot.
+    if session.info.pop("dashboard_dirty", False):
+        invalidate_dashboard_cache()
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_dirty_flag(session) -> None:
+    session.info.pop("dashboard_dirty", None)
+
+
+def _scope_cache_key(scope: ScopeValue, top_supplies: int) -> Hashable:
+    scope_key = scope if scope == "todos" else tuple(scope)
+    return (scope_key, top_supplies)
+
+
 def _to_title(value: str) -> str:
     return value.replace("_", " ").title()
 
@@ -38,27 +144,7 @@ def _insumo_scope_filter(scope: ScopeValue):
         return None
     if not scope:
         return false()
-    associated = (
-        select(1)
-        .select_from(EquipoInsumo)
-        .join(Equipo, EquipoInsumo.equipo_id == Equipo.id)
-        .where(
-            EquipoInsumo.insumo_id == Insumo.id,
-            EquipoInsumo.fecha_desasociacion.is_(None),
-            Equipo.hospital_id.in_(scope),
-        )
-        .exists()
-    )
-    any_association = (
-        select(1)
-        .select_from(EquipoInsumo)
-        .where(
-            EquipoInsumo.insumo_id == Insumo.id,
-            EquipoInsumo.fecha_desasociacion.is_(None),
-        )
-        .exists()
-    )
-    return or_(associated, ~any_association)
+    return filtro_alcance_insumos(scope)
 
 
 def _apply_license_scope(query, scope: ScopeValue, *, joined: bool = False):
@@ -79,23 +165,181 @@ def _apply_license_scope(query, scope: ScopeValue, *, joined: bool = False):
     )
 
 
-def _build_scope_info(scope: ScopeValue) -> dict[str, object]:
+def _is_postgres() -> bool:
+    bind = db.session.get_bind()
+    return bool(bind) and bind.dialect.name == "postgresql"
+
+
+def _count_where(condition, *, postgres: bool):
+    """Return ``COUNT(*) FILTER (WHERE …)`` or its ``SUM(CASE …)`` fallback."""
+
+    if postgres:
+        return func.count().filter(condition)
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def _hospital_summary(scope: ScopeValue, since: datetime, *, postgres: bool):
+    """Return ``(scope_info, total, delta)`` for institutions in one statement."""
+
     if scope == "todos":
-        return {"type": "todos", "hospitales": [], "summary": "Todos los hospitales"}
+        total, delta = db.session.query(
+            func.count(Hospital.id),
+            _count_where(Hospital.created_at >= since, postgres=postgres),
+        ).one()
+        scope_info = {"type": "todos", "hospitales": [], "summary": "Todos los hospitales"}
+        return scope_info, int(total or 0), int(delta or 0)
+
     if not scope:
-        return {"type": "limitado", "hospitales": [], "summary": "Sin hospitales asignados"}
-    hospitales = (
-        db.session.query(Hospital.id, Hospital.nombre)
+        scope_info = {"type": "limitado", "hospitales": [], "summary": "Sin hospitales asignados"}
+        return scope_info, 0, 0
+
+    rows = (
+        db.session.query(
+            Hospital.id,
+            Hospital.nombre,
+            case((Hospital.created_at >= since, 1), else_=0),
+        )
         .filter(Hospital.id.in_(scope))
         .order_by(Hospital.nombre)
         .all()
     )
-    data = [
-        {"id": hospital_id, "nombre": nombre}
-        for hospital_id, nombre in hospitales
-    ]
+    data = [{"id": hospital_id, "nombre": nombre} for hospital_id, nombre, _ in rows]
     summary = ", ".join(item["nombre"] for item in data) if data else "Sin hospitales asignados"
-    return {"type": "limitado", "hospitales": data, "summary": summary}
+    scope_info = {"type": "limitado", "hospitales": data, "summary": summary}
+    return scope_info, len(rows), sum(int(is_new) for _, _, is_new in rows)
+
+
+def _equipment_summary(scope: ScopeValue, since: datetime, *, postgres: bool):
+    """Return totals plus state and type breakdowns from one grouped scan."""
+
+    query = (
+        db.session.query(
+            Equipo.estado,
+            TipoEquipo.id,
+            TipoEquipo.nombre,
+            func.count(Equipo.id),
+            _count_where(Equipo.created_at >= since, postgres=postgres),
+        )
+        .join(TipoEquipo, TipoEquipo.id == Equipo.tipo_id)
+        .group_by(Equipo.estado, TipoEquipo.id, TipoEquipo.nombre)
+        .order_by(Equipo.estado)
+    )
+    rows = _apply_scope(query, Equipo.hospital_id, scope).all()
+
+    total = 0
+    delta = 0
+    by_state: dict[str, int] = {}
+    by_type: dict[int, list] = {}
+    for estado, tipo_id, tipo_nombre, count, new_count in rows:
+        count = int(count or 0)
+        total += count
+        delta += int(new_count or 0)
+        label = _to_title(estado.value if isinstance(estado, EstadoEquipo) else str(estado))
+        by_state[label] = by_state.get(label, 0) + count
+        by_type.setdefault(tipo_id, [tipo_nombre, 0])[1] += count
+
+    top_types = sorted(by_type.values(), key=lambda item: (-item[1], item[0]))[:7]
+    equipment_state = {"labels": list(by_state), "values": list(by_state.values())}
+    equipment_type = {
+        "labels": [nombre for nombre, _ in top_types],
+        "values": [count for _, count in top_types],
+    }
+    return total, delta, equipment_state, equipment_type
+
+
+def _insumo_summary(insumo_filter, since: datetime, *, postgres: bool):
+    """Return insumo totals, critical count and stock per unit from one grouped scan."""
+
+    query = db.session.query(
+        Insumo.unidad_medida,
+        func.count(Insumo.id),
+        _count_where(Insumo.created_at >= since, postgres=postgres),
+        func.sum(Insumo.stock),
+        _count_where(INSUMO_CRITICO, postgres=postgres),
+    )
+    if insumo_filter is not None:
+        query = query.filter(insumo_filter)
+    rows = query.group_by(Insumo.unidad_medida).all()
+
+    total = sum(int(count or 0) for _, count, _, _, _ in rows)
+    delta = sum(int(new_count or 0) for _, _, new_count, _, _ in rows)
+    critical_total = sum(int(critical or 0) for _, _, _, _, critical in rows)
+    stock_rows = sorted(rows, key=lambda row: -int(row[3] or 0))[:7]
+    insumo_stock = {
+        "labels": [unidad or "Sin unidad" for unidad, _, _, _, _ in stock_rows],
+        "values": [int(stock or 0) for _, _, _, stock, _ in stock_rows],
+    }
+    return total, delta, critical_total, insumo_stock
+
+
+def _critical_supplies(insumo_filter, limit: int) -> list[dict[str, object]]:
+    """Return the ``limit`` insumos with the lowest stock coverage.
+
+    Ordering matches ``ix_insumos_criticos`` so the database can walk the
+    partial index instead of sorting every critical insumo.
+    """
+
+    if limit <= 0:
+        return []
+    query = db.session.query(
+        Insumo.id,
+        Insumo.nombre,
+        Insumo.stock,
+        Insumo.stock_minimo,
+        INSUMO_FALTANTE,
+        INSUMO_COBERTURA,
+    ).filter(INSUMO_CRITICO)
+    if insumo_filter is not None:
+        query = query.filter(insumo_filter)
+    rows = query.order_by(INSUMO_COBERTURA, INSUMO_FALTANTE.desc(), Insumo.nombre).limit(limit)
+    return [
+        {
+            "id": insumo_id,
+            "nombre": nombre,
+            "stock": int(stock or 0),
+            "stock_minimo": int(stock_minimo or 0),
+            "faltante": max(int(faltante or 0), 0),
+            "coverage_percent": max(min(int(coverage or 0), 100), 0),
+        }
+        for insumo_id, nombre, stock, stock_minimo, faltante, coverage in rows
+    ]
+
+
+def _license_counts(
+    scope: ScopeValue, since: datetime, yesterday: date, snapshot: dict, *, postgres: bool
+):
+    """Return ``(pendientes, pendientes_delta, activas_ayer, snapshot_values)``.
+
+    The ``snapshot`` scalar subqueries ride along in the same statement;
+    ``snapshot_values`` maps their keys to the values found.
+    """
+
+    pendiente = Licencia.estado == EstadoLicencia.SOLICITADA
+    activa_ayer = and_(
+        Licencia.estado == EstadoLicencia.APROBADA,
+        Licencia.fecha_inicio <= yesterday,
+        Licencia.fecha_fin >= yesterday,
+    )
+    query = db.session.query(
+        _count_where(pendiente, postgres=postgres),
+        _count_where(and_(pendiente, Licencia.created_at >= since), postgres=postgres),
+        _count_where(activa_ayer, postgres=postgres),
+        *snapshot.values(),
+    ).filter(Licencia.estado.in_([EstadoLicencia.SOLICITADA, EstadoLicencia.APROBADA]))
+    query = _apply_license_scope(query, scope)
+    pendientes, delta, ayer, *valores = query.one()
+    snapshot_values = {
+        key: int(valor) for key, valor in zip(snapshot, valores) if valor is not None
+    }
+    return int(pendientes or 0), int(delta or 0), int(ayer or 0), snapshot_values
+
+
+def _snapshot_delta(current: int, baseline: dict[str, int], metrica: str, fallback: int) -> int:
+    """Net change against the snapshot baseline, or ``fallback`` without one."""
+
+    if metrica in baseline:
+        return current - baseline[metrica]
+    return fallback
 
 
 def _format_date(value: date | None) -> str:
@@ -105,67 +349,80 @@ def _format_date(value: date | None) -> str:
 
 
 def collect_dashboard_metrics(user, top_supplies: int = 5) -> dict[str, object]:
-    """Assemble counts and chart payloads for the dashboard respecting scope."""
+    """Assemble counts and chart payloads for the dashboard respecting scope.
+
+    Deltas are the net change against the ``metricas_diarias`` snapshot taken
+    at least seven days ago, falling back to records created in the last
+    seven days while no such snapshot exists. Users sharing the same
+    hospital scope share one cached payload for up to
+    ``DASHBOARD_CACHE_TIMEOUT`` seconds (``0`` disables caching).
+    """
+
+    return collect_scope_metrics(get_user_hospital_scope(user), top_supplies)
+
+
+def collect_scope_metrics(scope: ScopeValue, top_supplies: int = 5) -> dict[str, object]:
+    """Return the (possibly cached) dashboard payload for a hospital ``scope``."""
 
+    timeout = int(current_app.config.get("DASHBOARD_CACHE_TIMEOUT", 0) or 0)
+    if timeout <= 0:
+        return _compute_dashboard_metrics(scope, top_supplies)
+
+    cache = get_metrics_cache()
+    key = _scope_cache_key(scope, top_supplies)
+    payload = cache.get(key, timeout)
+    if payload is None:
+        payload = _compute_dashboard_metrics(scope, top_supplies)
+        cache.set(key, payload)
+    return copy.deepcopy(payload)
+
+
+def _compute_dashboard_metrics(scope: ScopeValue, top_supplies: int) -> dict[str, object]:
     now = datetime.utcnow()
     since = now - timedelta(days=7)
     today = now.date()
     yesterday = today - timedelta(days=1)
+    postgres = _is_postgres()
 
-    scope = get_user_hospital_scope(user)
-    scope_info = _build_scope_info(scope)
-
-    equipos_total_query = _apply_scope(db.session.query(func.count(Equipo.id)), Equipo.hospital_id, scope)
-    equipos_total = equipos_total_query.scalar() or 0
-
-    equipos_delta_query = _apply_scope(
-        db.session.query(func.count(Equipo.id)).filter(Equipo.created_at >= since),
-        Equipo.hospital_id,
+    ensure_daily_snapshot(today)
+    snapshot = snapshot_columns(
         scope,
+        since.date(),
+        yesterday,
+        [
+            ("baseline", "hospitales"),
+            ("baseline", "equipos"),
+            ("baseline", "insumos"),
+            ("baseline", "licencias_pendientes"),
+            ("previous", "licencias_activas"),
+        ],
     )
-    equipos_delta = equipos_delta_query.scalar() or 0
 
+    scope_info, hospitales_total, hospitales_delta = _hospital_summary(
+        scope, since, postgres=postgres
+    )
+    equipos_total, equipos_delta, equipment_state, equipment_type = _equipment_summary(
+        scope, since, postgres=postgres
+    )
     insumo_filter = _insumo_scope_filter(scope)
-    insumo_base = db.session.query(func.count(func.distinct(Insumo.id)))
-    if insumo_filter is not None:
-        insumo_base = insumo_base.filter(insumo_filter)
-    insumos_total = insumo_base.scalar() or 0
-
-    insumo_delta = db.session.query(func.count(func.distinct(Insumo.id))).filter(Insumo.created_at >= since)
-    if insumo_filter is not None:
-        insumo_delta = insumo_delta.filter(insumo_filter)
-    insumos_delta_value = insumo_delta.scalar() or 0
-
-    hospitales_query = db.session.query(func.count(Hospital.id))
-    if scope != "todos":
-        if not scope:
-            hospitales_total = 0
-        else:
-            hospitales_total = hospitales_query.filter(Hospital.id.in_(scope)).scalar() or 0
-    else:
-        hospitales_total = hospitales_query.scalar() or 0
-
-    hospitales_delta_query = db.session.query(func.count(Hospital.id)).filter(Hospital.created_at >= since)
-    if scope != "todos":
-        if not scope:
-            hospitales_delta = 0
-        else:
-            hospitales_delta = hospitales_delta_query.filter(Hospital.id.in_(scope)).scalar() or 0
-    else:
-        hospitales_delta = hospitales_delta_query.scalar() or 0
-
-    licencias_pendientes_query = db.session.query(func.count(Licencia.id)).filter(
-        Licencia.estado == EstadoLicencia.SOLICITADA
+    insumos_total, insumos_delta_value, critical_total, insumo_stock = _insumo_summary(
+        insumo_filter, since, postgres=postgres
     )
-    licencias_pendientes_query = _apply_license_scope(licencias_pendientes_query, scope)
-    licencias_pendientes = licencias_pendientes_query.scalar() or 0
-
-    licencias_delta_query = db.session.query(func.count(Licencia.id)).filter(
-        Licencia.estado == EstadoLicencia.SOLICITADA,
-        Licencia.created_at >= since,
+    licencias_pendientes, licencias_delta, licencias_ayer_total, snapshot_values = _license_counts(
+        scope, since, yesterday, snapshot, postgres=postgres
+    )
+    baseline = {
+        metrica: valor for (momento, metrica), valor in snapshot_values.items() if momento == "baseline"
+    }
+    licencias_ayer_total = snapshot_values.get(("previous", "licencias_activas"), licencias_ayer_total)
+    hospitales_delta = _snapshot_delta(hospitales_total, baseline, "hospitales", hospitales_delta)
+    equipos_delta = _snapshot_delta(equipos_total, baseline, "equipos", equipos_delta)
+    insumos_delta_value = _snapshot_delta(
+        insumos_total, baseline, "insumos", insumos_delta_value
+    )
+    licencias_delta = _snapshot_delta(
+        licencias_pendientes, baseline, "licencias_pendientes", licencias_delta
     )
-    licencias_delta_query = _apply_license_scope(licencias_delta_query, scope)
-    licencias_delta = licencias_delta_query.scalar() or 0
 
     # Licencias activas hoy
     licencias_hoy_query = db.session.query(
@@ -196,109 +453,13 @@ def collect_dashboard_metrics(user, top_supplies: int = 5) -> dict[str, object]:
     ]
 
     licencias_hoy_total = len(licencias_hoy)
-    licencias_ayer_query = db.session.query(func.count(Licencia.id)).filter(
-        Licencia.estado == EstadoLicencia.APROBADA,
-        Licencia.fecha_inicio <= yesterday,
-        Licencia.fecha_fin >= yesterday,
-    )
-    licencias_ayer_query = _apply_license_scope(licencias_ayer_query, scope)
-    licencias_ayer_total = licencias_ayer_query.scalar() or 0
-
     licenses_today_payload = {
         "total": licencias_hoy_total,
         "delta": licencias_hoy_total - int(licencias_ayer_total),
         "items": licencias_hoy,
     }
 
-    # Equipos por estado
-    equipment_state_query = db.session.query(Equipo.estado, func.count(Equipo.id)).group_by(Equipo.estado)
-    equipment_state_query = _apply_scope(equipment_state_query, Equipo.hospital_id, scope)
-    equipment_state_rows = equipment_state_query.all()
-    equipment_state = {
-        "labels": [
-            _to_title(row[0].value if isinstance(row[0], EstadoEquipo) else str(row[0]))
-            for row in equipment_state_rows
-        ],
-        "values": [row[1] for row in equipment_state_rows],
-    }
-
-    # Equipos por tipo (top 7)
-    equipment_type_total = func.count(Equipo.id).label("total")
-    equipment_type_query = (
-        db.session.query(TipoEquipo.nombre, equipment_type_total)
-        .join(TipoEquipo, TipoEquipo.id == Equipo.tipo_id)
-        .group_by(TipoEquipo.id, TipoEquipo.nombre)
-    )
-    equipment_type_query = _apply_scope(equipment_type_query, Equipo.hospital_id, scope)
-    equipment_type_rows = (
-        equipment_type_query.order_by(equipment_type_total.desc()).limit(7).all()
-    )
-    equipment_type = {
-        "labels": [row[0] for row in equipment_type_rows],
-        "values": [row[1] for row in equipment_type_rows],
-    }
-
-    # Stock de insumos por unidad/categoría
-    insumo_stock_query = db.session.query(
-        func.coalesce(Insumo.unidad_medida, "Sin unidad"),
-        func.sum(Insumo.stock),
-    )
-    if insumo_filter is not None:
-        insumo_stock_query = insumo_stock_query.filter(insumo_filter)
-    insumo_stock_rows = (
-        insumo_stock_query.group_by(Insumo.unidad_medida)
-        .order_by(func.sum(Insumo.stock).desc())
-        .limit(7)
-        .all()
-    )
-    insumo_stock = {
-        "labels": [row[0] or "Sin unidad" for row in insumo_stock_rows],
-        "values": [int(row[1] or 0) for row in insumo_stock_rows],
-    }
-
-    critical_query = db.session.query(Insumo)
-    if insumo_filter is not None:
-        critical_query = critical_query.filter(insumo_filter)
-    critical_rows: list[dict[str, object]] = []
-    for insumo in critical_query.filter(
-        Insumo.stock_minimo > 0,
-        Insumo.stock <= Insumo.stock_minimo,
-    ).all():
-        stock_minimo = int(insumo.stock_minimo or 0)
-        stock_actual = int(insumo.stock or 0)
-        faltante = max(stock_minimo - stock_actual, 0)
-        coverage = 0
-        if stock_minimo > 0:
-            coverage = max(min(round((stock_actual / stock_minimo) * 100), 100), 0)
-        critical_rows.append(
-            {
-                "insumo": insumo,
-                "faltante": faltante,
-                "stock": stock_actual,
-                "stock_minimo": stock_minimo,
-                "coverage": coverage,
-            }
-        )
-
-    critical_rows.sort(
-        key=lambda item: (
-            item["coverage"],
-            -int(item["faltante"]),
-            item["insumo"].nombre,
-        )
-    )
-    critical_total = len(critical_rows)
-    critical_supplies = [
-        {
-            "id": row["insumo"].id,
-            "nombre": row["insumo"].nombre,
-            "stock": row["stock"],
-            "stock_minimo": row["stock_minimo"],
-            "faltante": row["faltante"],
-            "coverage_percent": int(row["coverage"]),
-        }
-        for row in critical_rows[:top_supplies]
-    ]
+    critical_supplies = _critical_supplies(insumo_filter, top_supplies)
 
     return {
         "generated_at": now.isoformat(),
@@ -346,4 +507,11 @@ def collect_dashboard_metrics(user, top_supplies: int = 5) -> dict[str, object]:
         "scope": scope_info,
     }
 
-__all__ = ["collect_dashboard_metrics"]
+__all__ = [
+    "MetricsCache",
+    "collect_dashboard_metrics",
+    "collect_scope_metrics",
+    "get_metrics_cache",
+    "invalidate_dashboard_cache",
+    "invalidate_dashboard_cache_on_commit",
+]
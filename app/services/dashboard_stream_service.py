@@ -0,0 +1,201 @@
+"""Shared producers fanning dashboard metrics out to SSE subscribers."""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from typing import Hashable, Iterator
+
+from flask import Flask, current_app
+
+from app.extensions import db
+from app.services.dashboard_service import collect_scope_metrics
+from app.utils.scope import ScopeValue
+
+BROADCASTER_EXTENSION_KEY = "dashboard_broadcaster"
+
+# Keys that change on every computation and must not trigger a push.
+_VOLATILE_KEYS = ("generated_at", "generated_at_display")
+
+
+def payload_fingerprint(payload: dict[str, object]) -> str:
+    """Return a stable hash of ``payload`` ignoring generation timestamps."""
+
+    stable = {key: value for key, value in payload.items() if key not in _VOLATILE_KEYS}
+    encoded = json.dumps(stable, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()
+
+
+class ScopeProducer:
+    """Compute the payload of one hospital scope and broadcast it.
+
+    A single background thread refreshes the metrics every ``interval``
+    seconds. Subscribers block on :meth:`wait` and only wake up when the
+    fingerprint of the payload changes, so idle dashboards cost one
+    computation per interval regardless of how many tabs are open.
+    """
+
+    def __init__(self, app: Flask, scope: ScopeValue, *, interval: float) -> None:
+        self.app = app
+        self.scope = scope
+        self.interval = max(1.0, float(interval))
+        self.subscribers = 0
+        self.version = 0
+        self.message: str | None = None
+        self._fingerprint: str | None = None
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self.run, name=f"dashboard-producer-{self.scope}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        with self._condition:
+            self._condition.notify_all()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped.is_set()
+
+    def publish(self, payload: dict[str, object]) -> bool:
+        """Store ``payload`` and wake subscribers if its content changed."""
+
+        fingerprint = payload_fingerprint(payload)
+        with self._condition:
+            if fingerprint == self._fingerprint:
+                return False
+            self._fingerprint = fingerprint
+            self.message = json.dumps(payload)
+            self.version += 1
+            self._condition.notify_all()
+        return True
+
+    def refresh(self) -> bool:
+        """Recompute the scope metrics and publish them."""
+
+        with self.app.app_context():
+            try:
+                payload = collect_scope_metrics(self.scope)
+            finally:
+                db.session.remove()
+        return self.publish(payload)
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.refresh()
+            except Exception:  # pragma: no cover - keep the producer alive
+                self.app.logger.exception(
+                    "No se pudieron calcular las métricas del dashboard para %s", self.scope
+                )
+            self._stopped.wait(self.interval)
+
+    def wait(self, last_version: int, timeout: float) -> tuple[int, str | None]:
+        """Block until a version newer than ``last_version`` or ``timeout``."""
+
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self.version != last_version or self._stopped.is_set(),
+                timeout=timeout,
+            )
+            return self.version, self.message
+
+
+class DashboardBroadcaster:
+    """Registry of one :class:`ScopeProducer` per distinct hospital scope."""
+
+    def __init__(self, app: Flask) -> None:
+        self.app = app
+        self._producers: dict[Hashable, ScopeProducer] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(scope: ScopeValue) -> Hashable:
+        return scope if scope == "todos" else tuple(scope)
+
+    def subscribe(self, scope: ScopeValue, *, interval: float, start: bool = True) -> ScopeProducer:
+        key = self._key(scope)
+        with self._lock:
+            producer = self._producers.get(key)
+            if producer is None or producer.stopped:
+                producer = ScopeProducer(self.app, scope, interval=interval)
+                self._producers[key] = producer
+                if start:
+                    producer.start()
+            producer.subscribers += 1
+            return producer
+
+    def unsubscribe(self, producer: ScopeProducer) -> None:
+        key = self._key(producer.scope)
+        with self._lock:
+            producer.subscribers -= 1
+            if producer.subscribers > 0:
+                return
+            if self._producers.get(key) is producer:
+                del self._producers[key]
+        producer.stop()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._producers)
+
+
+def get_broadcaster(app: Flask | None = None) -> DashboardBroadcaster:
+    """Return the broadcaster bound to ``app`` (or the current app)."""
+
+    target = app or current_app._get_current_object()  # type: ignore[attr-defined]
+    broadcaster = target.extensions.get(BROADCASTER_EXTENSION_KEY)
+    if broadcaster is None:
+        broadcaster = target.extensions.setdefault(
+            BROADCASTER_EXTENSION_KEY, DashboardBroadcaster(target)
+        )
+    return broadcaster
+
+
+def stream_scope_events(
+    broadcaster: DashboardBroadcaster,
+    scope: ScopeValue,
+    *,
+    interval: float,
+    heartbeat: float,
+    retry: int,
+    max_age: float,
+) -> Iterator[str]:
+    """Yield SSE frames for ``scope`` until ``max_age`` seconds elapse.
+
+    Closing the stream periodically makes browsers reconnect, which re-runs
+    the authentication and license guards of the regular request cycle.
+    """
+
+    producer = broadcaster.subscribe(scope, interval=interval)
+    try:
+        yield f"retry: {retry}\n\n"
+        last_version = 0
+        deadline = time.monotonic() + max_age
+        while not producer.stopped:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            version, message = producer.wait(last_version, timeout=min(heartbeat, remaining))
+            if version != last_version and message is not None:
+                last_version = version
+                yield f"data: {message}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+    finally:
+        broadcaster.unsubscribe(producer)
+
+
+__all__ = [
+    "DashboardBroadcaster",
+    "ScopeProducer",
+    "get_broadcaster",
+    "payload_fingerprint",
+    "stream_scope_events",
+]
@@ -0,0 +1,186 @@
+"""Set-based state and location changes over a selection of equipos.
+
+One ``UPDATE`` changes every selected row and one multi-row ``INSERT`` adds
+their history entries, inside the caller's transaction (the caller logs the
+audit entry and commits).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterable
+
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy.orm import Query, Session
+
+from app.models import Equipo, EquipoHistorial, EquipoInsumo, EstadoEquipo, Hospital, Oficina, Servicio
+from app.services.dashboard_service import (
+    invalidate_dashboard_cache,
+    invalidate_dashboard_cache_on_commit,
+)
+from app.services.equipo_service import invalidate_count_cache, invalidate_count_cache_on_commit
+from app.services.insumo_service import actualizar_insumo_hospital
+from app.services.search_index_service import index_equipos
+
+
+@dataclass
+class CambioMasivo:
+    """Target values; ``None`` leaves the attribute unchanged.
+
+    A location is given by any of hospital, servicio or oficina; the missing
+    levels are derived from the most specific one and cleared otherwise.
+    """
+
+    estado: EstadoEquipo | None = None
+    hospital_id: int | None = None
+    servicio_id: int | None = None
+    oficina_id: int | None = None
+
+    @property
+    def cambia_ubicacion(self) -> bool:
+        return any((self.hospital_id, self.servicio_id, self.oficina_id))
+
+
+@dataclass
+class _Ubicacion:
+    hospital: Hospital
+    servicio: Servicio | None
+    oficina: Oficina | None
+
+    @property
+    def valores(self) -> dict[str, int | None]:
+        return {
+            "hospital_id": self.hospital.id,
+            "servicio_id": self.servicio.id if self.servicio else None,
+            "oficina_id": self.oficina.id if self.oficina else None,
+        }
+
+    @property
+    def descripcion(self) -> str:
+        partes = [self.hospital.nombre]
+        if self.servicio:
+            partes.append(self.servicio.nombre)
+        if self.oficina:
+            partes.append(self.oficina.nombre)
+        return " / ".join(partes)
+
+
+def _resolver_ubicacion(session: Session, cambio: CambioMasivo) -> _Ubicacion:
+    oficina = session.get(Oficina, cambio.oficina_id) if cambio.oficina_id else None
+    if cambio.oficina_id and oficina is None:
+        raise ValueError("La oficina seleccionada no existe.")
+    servicio_id = cambio.servicio_id or (oficina.servicio_id if oficina else None)
+    servicio = session.get(Servicio, servicio_id) if servicio_id else None
+    if servicio_id and servicio is None:
+        raise ValueError("El servicio seleccionado no existe.")
+    if oficina and servicio and oficina.servicio_id != servicio.id:
+        raise ValueError("La oficina seleccionada no pertenece al servicio indicado.")
+
+    hospital_id = cambio.hospital_id or (servicio.hospital_id if servicio else None)
+    hospital = session.get(Hospital, hospital_id) if hospital_id else None
+    if hospital is None:
+        raise ValueError("El hospital seleccionado no existe.")
+    if servicio and servicio.hospital_id != hospital.id:
+        raise ValueError("El servicio seleccionado no pertenece al hospital indicado.")
+    return _Ubicacion(hospital, servicio, oficina)
+
+
+def _estado_label(estado: EstadoEquipo) -> str:
+    return estado.name.replace("_", " ").title()
+
+
+def aplicar_cambio_masivo(
+    session: Session,
+    seleccion: Query,
+    cambio: CambioMasivo,
+    *,
+    usuario_id: int | None,
+    motivo: str | None = None,
+    hospital_ids: Iterable[int] | None = None,
+) -> list[int]:
+    """Apply ``cambio`` to the equipos of ``seleccion`` and return their ids.
+
+    Rows already matching the target values are left untouched.
+    ``hospital_ids`` restricts the destination hospital (``None`` allows all).
+    Raises ``ValueError`` for inconsistent locations or empty changes.
+    The equipos count and dashboard caches are cleared again on commit.
+    """
+
+    if cambio.estado is None and not cambio.cambia_ubicacion:
+        raise ValueError("Indicá un estado o una ubicación nueva.")
+
+    valores: dict[str, object] = {}
+    detalles: list[str] = []
+    if cambio.cambia_ubicacion:
+        ubicacion = _resolver_ubicacion(session, cambio)
+        if hospital_ids is not None and ubicacion.hospital.id not in set(hospital_ids):
+            raise ValueError("No tiene acceso al hospital de destino.")
+        valores.update(ubicacion.valores)
+        detalles.append(f"Traslado a {ubicacion.descripcion}")
+    if cambio.estado is not None:
+        valores["estado"] = cambio.estado
+        detalles.append(f"Estado: {_estado_label(cambio.estado)}")
+    if motivo:
+        detalles.append(f"Motivo: {motivo}")
+
+    distinto = or_(
+        *(getattr(Equipo, nombre).is_distinct_from(valor) for nombre, valor in valores.items())
+    )
+    filas = session.execute(
+        seleccion.with_entities(Equipo.id, Equipo.hospital_id).order_by(None).filter(distinto).statement
+    ).all()
+    ids = [equipo_id for equipo_id, _hospital_id in filas]
+    if not ids:
+        return []
+
+    trasladados = [
+        equipo_id
+        for equipo_id, hospital_id in filas
+        if "hospital_id" in valores and hospital_id != valores["hospital_id"]
+    ]
+    insumo_ids = (
+        session.scalars(
+            select(EquipoInsumo.insumo_id)
+            .where(
+                EquipoInsumo.equipo_id.in_(trasladados),
+                EquipoInsumo.fecha_desasociacion.is_(None),
+            )
+            .distinct()
+        ).all()
+        if trasladados
+        else []
+    )
+
+    session.execute(
+        update(Equipo)
+        .where(Equipo.id.in_(ids))
+        .values(**valores)
+        .execution_options(synchronize_session="fetch")
+    )
+    accion = "Traslado" if cambio.cambia_ubicacion else "Cambio de estado"
+    descripcion = "; ".join(detalles)
+    session.execute(
+        insert(EquipoHistorial),
+        [
+            {
+                "equipo_id": equipo_id,
+                "usuario_id": usuario_id,
+                "accion": accion,
+                "descripcion": descripcion,
+            }
+            for equipo_id in ids
+        ],
+    )
+    if trasladados:
+        # Core statements skip the mapper events that keep these in sync.
+        actualizar_insumo_hospital(insumo_ids)
+        index_equipos(session.connection(), trasladados)
+    # The Core UPDATE never reaches the flush listeners, and requests served
+    # before the caller commits would cache the old rows again.
+    invalidate_count_cache()
+    invalidate_dashboard_cache()
+    invalidate_count_cache_on_commit(session)
+    invalidate_dashboard_cache_on_commit(session)
+    return ids
+
+
+__all__ = ["CambioMasivo", "aplicar_cambio_masivo"]
@@ -0,0 +1,499 @@
+"""Bulk import of equipos from CSV or XLSX files.
+
+Rows are parsed as a stream, validated against catalogues loaded once per
+import and written in batches: one multi-row ``INSERT`` for the equipos and
+one for their "Alta" history entries, committed together. Core inserts skip
+mapper events, so the normalised serial columns, the search index and the
+process-local caches are maintained here.
+"""
+from __future__ import annotations
+
+import codecs
+import csv
+import io
+import itertools
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import IO, Any, Iterable, Iterator
+from unicodedata import normalize
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import Equipo, EquipoHistorial, EstadoEquipo, Hospital, Oficina, Servicio, TipoEquipo
+from app.services.dashboard_service import invalidate_dashboard_cache
+from app.services.equipo_service import invalidate_count_cache, reserve_internal_serials
+from app.services.search_index_service import index_equipos
+from app.utils.search import normalize_serial
+from app.utils.xlsx import iter_xlsx_rows
+
+IMPORT_EXTENSIONS = ("csv", "xlsx")
+REQUIRED_COLUMNS = ("hospital", "tipo")
+
+# Accepted spellings of each column, after lowercasing and stripping accents.
+HEADER_ALIASES = {
+    "institucion": "hospital",
+    "hospital_id": "hospital",
+    "tipo_equipo": "tipo",
+    "tipo_id": "tipo",
+    "codigo_patrimonial": "codigo",
+    "serie": "numero_serie",
+    "nro_serie": "numero_serie",
+    "n_serie": "numero_serie",
+    "numero_de_serie": "numero_serie",
+    "fecha_compra": "fecha_ingreso",
+    "nuevo": "es_nuevo",
+    "ano_expediente": "anio_expediente",
+}
+
+_TEXT_COLUMNS = (
+    "codigo",
+    "descripcion",
+    "marca",
+    "modelo",
+    "numero_serie",
+    "responsable",
+    "observaciones",
+    "expediente",
+    "orden_compra",
+    "tipo_adquisicion",
+)
+_DATE_COLUMNS = ("fecha_ingreso", "fecha_instalacion", "garantia_hasta")
+_TRUE_VALUES = {"1", "si", "s", "true", "verdadero", "x", "yes"}
+_FALSE_VALUES = {"", "0", "no", "n", "false", "falso"}
+# Day zero of the serial dates stored by spreadsheet applications, and the
+# largest serial they accept (9999-12-31).
+_SPREADSHEET_EPOCH = date(1899, 12, 30)
+_SPREADSHEET_MAX_SERIAL = 2958465
+# Bytes read to tell UTF-8 CSV files from Windows-1252 ones.
+_ENCODING_SAMPLE_BYTES = 64 * 1024
+
+
+@dataclass
+class ImportRowError:
+    fila: int
+    mensaje: str
+
+
+@dataclass
+class ImportResult:
+    filas: int = 0
+    creados: int = 0
+    errores: list[ImportRowError] = field(default_factory=list)
+    segundos: float = 0.0
+
+    @property
+    def filas_por_segundo(self) -> float:
+        return self.filas / self.segundos if self.segundos > 0 else float(self.filas)
+
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _key(value: Any) -> str:
+    return _text(value).lower()
+
+
+def _normalize_header(value: Any) -> str:
+    ascii_value = normalize("NFKD", _text(value)).encode("ascii", "ignore").decode("ascii")
+    name = re.sub(r"[^a-z0-9]+", "_", ascii_value.lower()).strip("_")
+    return HEADER_ALIASES.get(name, name)
+
+
+def _csv_encoding(stream: IO[bytes]) -> str:
+    """Return UTF-8 or, when the first chunk is not valid UTF-8, Windows-1252.
+
+    Excel in a Spanish locale saves "CSV" files as Windows-1252. The stream
+    is rewound to where it was.
+    """
+
+    start = stream.tell()
+    head = stream.read(_ENCODING_SAMPLE_BYTES)
+    stream.seek(start)
+    try:
+        # ``final=False`` tolerates a character cut at the end of the sample.
+        codecs.getincrementaldecoder("utf-8-sig")().decode(head, final=False)
+    except UnicodeDecodeError:
+        return "cp1252"
+    return "utf-8-sig"
+
+
+def _iter_csv(stream: IO[bytes]) -> Iterator[tuple[int, list[str]]]:
+    if not stream.seekable():
+        stream = io.BytesIO(stream.read())
+    text = io.TextIOWrapper(stream, encoding=_csv_encoding(stream), newline="")
+    try:
+        first = text.readline()
+        try:
+            dialect = csv.Sniffer().sniff(first, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(itertools.chain([first], text), dialect)
+        # Quoted fields may span lines: a record starts on the line after the
+        # previous one ended.
+        line = 1
+        for row in reader:
+            yield line, row
+            line = reader.line_num + 1
+    except UnicodeDecodeError as exc:
+        raise ValueError(
+            "El archivo CSV mezcla codificaciones de texto; guardalo como CSV UTF-8."
+        ) from exc
+
+
+def iter_import_rows(stream: IO[bytes], filename: str) -> Iterator[tuple[int, dict[str, Any]]]:
+    """Yield ``(row number, values by column)`` of a CSV or XLSX file.
+
+    The number is the sheet row for XLSX files and the line a record starts
+    on for CSV files. Raises ``ValueError`` when the format is unsupported
+    or required columns are missing. Blank rows are skipped.
+    """
+
+    extension = Path(filename or "").suffix.lower().lstrip(".")
+    if extension == "csv":
+        rows: Iterator[tuple[int, list[Any]]] = _iter_csv(stream)
+    elif extension == "xlsx":
+        rows = iter_xlsx_rows(stream)
+    else:
+        raise ValueError("Formato no soportado. Usá un archivo CSV o XLSX.")
+
+    _number, header = next(rows, (0, None))
+    if not header:
+        raise ValueError("El archivo está vacío.")
+    columns = [_normalize_header(value) for value in header]
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise ValueError(f"Faltan columnas obligatorias: {', '.join(missing)}.")
+
+    for number, values in rows:
+        if all(_text(value) == "" for value in values):
+            continue
+        yield number, {name: value for name, value in zip(columns, values) if name}
+
+
+def _parse_date(value: Any, campo: str) -> date | None:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, bool):
+        raise ValueError(f"Fecha inválida en {campo}: {value}")
+    if isinstance(value, (int, float)):
+        if not 1 <= value <= _SPREADSHEET_MAX_SERIAL:
+            raise ValueError(f"Fecha inválida en {campo}: {_text(value)}")
+        return _SPREADSHEET_EPOCH + timedelta(days=int(value))
+    raw = _text(value)
+    if not raw:
+        return None
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(raw, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Fecha inválida en {campo}: {raw}")
+
+
+def _parse_bool(value: Any, campo: str) -> bool:
+    if isinstance(value, bool):
+        return value
+    raw = normalize("NFKD", _key(value)).encode("ascii", "ignore").decode("ascii")
+    if raw in _TRUE_VALUES:
+        return True
+    if raw in _FALSE_VALUES:
+        return False
+    raise ValueError(f"Valor inválido en {campo}: {_text(value)}")
+
+
+def _parse_estado(value: Any) -> EstadoEquipo:
+    raw = re.sub(r"[\s-]+", "_", _key(value))
+    if not raw:
+        return EstadoEquipo.OPERATIVO
+    for estado in EstadoEquipo:
+        if raw in (estado.value, estado.name.lower()):
+            return estado
+    raise ValueError(f"Estado desconocido: {_text(value)}")
+
+
+class _Catalogos:
+    """Hospitals, services, offices and types in scope, keyed for lookups."""
+
+    def __init__(self, session: Session, hospital_ids: Iterable[int] | None) -> None:
+        query = select(Hospital.id, Hospital.nombre, Hospital.codigo)
+        if hospital_ids is not None:
+            query = query.where(Hospital.id.in_(list(hospital_ids)))
+        self.hospitales: dict[str, int] = {}
+        for hospital_id, nombre, codigo in session.execute(query):
+            self.hospitales[str(hospital_id)] = hospital_id
+            self.hospitales.setdefault(_key(nombre), hospital_id)
+            if codigo:
+                self.hospitales.setdefault(_key(codigo), hospital_id)
+        ids = set(self.hospitales.values())
+
+        self.servicios: dict[tuple[int, str], int] = {}
+        for servicio_id, hospital_id, nombre in session.execute(
+            select(Servicio.id, Servicio.institucion_id, Servicio.nombre).where(
+                Servicio.institucion_id.in_(ids)
+            )
+        ):
+            self.servicios[(hospital_id, _key(nombre))] = servicio_id
+            self.servicios[(hospital_id, str(servicio_id))] = servicio_id
+
+        self.oficinas: dict[tuple[int, str], list[tuple[int, int]]] = {}
+        for oficina_id, hospital_id, servicio_id, nombre in session.execute(
+            select(Oficina.id, Oficina.institucion_id, Oficina.servicio_id, Oficina.nombre).where(
+                Oficina.institucion_id.in_(ids)
+            )
+        ):
+            for key in (_key(nombre), str(oficina_id)):
+                self.oficinas.setdefault((hospital_id, key), []).append((oficina_id, servicio_id))
+
+        self.tipos: dict[str, int] = {}
+        for tipo_id, nombre, slug in session.execute(
+            select(TipoEquipo.id, TipoEquipo.nombre, TipoEquipo.slug).where(TipoEquipo.activo.is_(True))
+        ):
+            self.tipos[str(tipo_id)] = tipo_id
+            self.tipos[_key(nombre)] = tipo_id
+            self.tipos[_key(slug)] = tipo_id
+
+    def hospital(self, value: Any) -> int:
+        if not _text(value):
+            raise ValueError("Falta el hospital.")
+        hospital_id = self.hospitales.get(_key(value))
+        if hospital_id is None:
+            raise ValueError(f"Hospital desconocido o fuera de tu alcance: {_text(value)}")
+        return hospital_id
+
+    def tipo(self, value: Any) -> int:
+        if not _text(value):
+            raise ValueError("Falta el tipo de equipo.")
+        tipo_id = self.tipos.get(_key(value))
+        if tipo_id is None:
+            raise ValueError(f"Tipo de equipo desconocido: {_text(value)}")
+        return tipo_id
+
+    def servicio(self, hospital_id: int, value: Any) -> int | None:
+        if not _text(value):
+            return None
+        servicio_id = self.servicios.get((hospital_id, _key(value)))
+        if servicio_id is None:
+            raise ValueError(f"El servicio {_text(value)} no pertenece al hospital indicado.")
+        return servicio_id
+
+    def oficina(self, hospital_id: int, servicio_id: int | None, value: Any) -> tuple[int, int] | None:
+        if not _text(value):
+            return None
+        candidatos = self.oficinas.get((hospital_id, _key(value)), [])
+        if servicio_id is not None:
+            candidatos = [item for item in candidatos if item[1] == servicio_id]
+        if not candidatos:
+            raise ValueError(f"La oficina {_text(value)} no pertenece al hospital o servicio indicado.")
+        if len(candidatos) > 1:
+            raise ValueError(f"La oficina {_text(value)} existe en varios servicios; indicá el servicio.")
+        return candidatos[0]
+
+
+class _RowBuilder:
+    """Turn raw rows into ``Equipo`` insert parameters or raise ``ValueError``."""
+
+    def __init__(self, catalogos: _Catalogos) -> None:
+        self.catalogos = catalogos
+        self.codigos: set[str] = set()
+
+    def build(self, raw: dict[str, Any]) -> dict[str, Any]:
+        hospital_id = self.catalogos.hospital(raw.get("hospital"))
+        tipo_id = self.catalogos.tipo(raw.get("tipo"))
+        servicio_id = self.catalogos.servicio(hospital_id, raw.get("servicio"))
+        oficina = self.catalogos.oficina(hospital_id, servicio_id, raw.get("oficina"))
+        if oficina and servicio_id is None:
+            servicio_id = oficina[1]
+
+        values: dict[str, Any] = {}
+        for name in _TEXT_COLUMNS:
+            text = _text(raw.get(name))
+            length = Equipo.__table__.c[name].type.length
+            if length and len(text) > length:
+                raise ValueError(f"{name} supera los {length} caracteres.")
+            values[name] = text or None
+
+        codigo = values["codigo"]
+        if codigo:
+            if codigo.lower() in self.codigos:
+                raise ValueError(f"Código patrimonial repetido en el archivo: {codigo}")
+            self.codigos.add(codigo.lower())
+
+        anio = _text(raw.get("anio_expediente"))
+        if anio and not anio.isdigit():
+            raise ValueError(f"Año de expediente inválido: {anio}")
+
+        # Rows without a serial get an internal one per batch, see _insert_batch.
+        sin_numero_serie = not values["numero_serie"]
+
+        values.update(
+            hospital_id=hospital_id,
+            tipo_id=tipo_id,
+            servicio_id=servicio_id,
+            oficina_id=oficina[0] if oficina else None,
+            estado=_parse_estado(raw.get("estado")),
+            sin_numero_serie=sin_numero_serie,
+            es_nuevo=_parse_bool(raw.get("es_nuevo"), "es_nuevo"),
+            anio_expediente=int(anio) if anio else None,
+            # Maintained by a before_insert listener for ORM inserts.
+            numero_serie_norm=normalize_serial(values["numero_serie"]),
+            codigo_norm=normalize_serial(codigo),
+        )
+        for name in _DATE_COLUMNS:
+            values[name] = _parse_date(raw.get(name), name)
+        return values
+
+
+def _codigos_existentes(session: Session, codigos: list[str]) -> set[str]:
+    if not codigos:
+        return set()
+    return set(session.scalars(select(Equipo.codigo).where(Equipo.codigo.in_(codigos))))
+
+
+def _insert_batch(
+    session: Session,
+    batch: list[tuple[int, dict[str, Any]]],
+    usuario_id: int | None,
+    result: ImportResult,
+) -> None:
+    existentes = _codigos_existentes(
+        session, [values["codigo"] for _fila, values in batch if values["codigo"]]
+    )
+    pendientes: list[tuple[int, dict[str, Any]]] = []
+    for fila, values in batch:
+        if values["codigo"] in existentes:
+            result.errores.append(
+                ImportRowError(fila, f"Ya existe un equipo con el código {values['codigo']}.")
+            )
+            continue
+        pendientes.append((fila, values))
+    if pendientes:
+        _insert_rows(session, pendientes, usuario_id, result)
+
+
+def _insert_rows(
+    session: Session,
+    batch: list[tuple[int, dict[str, Any]]],
+    usuario_id: int | None,
+    result: ImportResult,
+) -> None:
+    """Insert ``batch`` in one transaction, bisecting it when a row conflicts.
+
+    A conflict (e.g. a code saved by someone else after the existence check)
+    rolls back the whole statement; retrying each half narrows it down to
+    the rows that caused it, which are reported one by one.
+    """
+
+    rows = [values for _fila, values in batch]
+    # Reserved again on a retry: the rollback also undoes the reservation.
+    sin_serie = [values for values in rows if values["sin_numero_serie"]]
+    if sin_serie:
+        for values, serial in zip(sin_serie, reserve_internal_serials(session, len(sin_serie))):
+            values["numero_serie"] = serial
+            values["numero_serie_norm"] = normalize_serial(serial)
+
+    try:
+        # ``render_nulls`` keeps every row in the same multi-row statement; the
+        # ORM otherwise groups rows by which of their values are NULL. Rows
+        # are not matched back to their parameters (that costs one statement
+        # per row on SQLite): the history entries only need ``es_nuevo``.
+        insertados = session.execute(
+            insert(Equipo)
+            .returning(Equipo.id, Equipo.es_nuevo)
+            .execution_options(render_nulls=True),
+            rows,
+        ).all()
+        ids = [equipo_id for equipo_id, _es_nuevo in insertados]
+        session.execute(
+            insert(EquipoHistorial),
+            [
+                {
+                    "equipo_id": equipo_id,
+                    "usuario_id": usuario_id,
+                    "accion": "Alta",
+                    "descripcion": (
+                        "Alta de equipo nuevo (importación)"
+                        if es_nuevo
+                        else "Alta de equipo usado (importación)"
+                    ),
+                }
+                for equipo_id, es_nuevo in insertados
+            ],
+        )
+        index_equipos(session.connection(), ids)
+        session.commit()
+    except IntegrityError as exc:
+        session.rollback()
+        if len(batch) == 1:
+            detalle = str(exc.orig).splitlines()[0] if exc.orig is not None else ""
+            mensaje = "No se pudo guardar la fila por un conflicto de datos"
+            result.errores.append(
+                ImportRowError(batch[0][0], f"{mensaje}: {detalle}" if detalle else f"{mensaje}.")
+            )
+            return
+        mitad = len(batch) // 2
+        _insert_rows(session, batch[:mitad], usuario_id, result)
+        _insert_rows(session, batch[mitad:], usuario_id, result)
+        return
+    result.creados += len(ids)
+
+
+def importar_equipos(
+    session: Session,
+    stream: IO[bytes],
+    filename: str,
+    *,
+    usuario_id: int | None = None,
+    hospital_ids: Iterable[int] | None = None,
+    batch_size: int = 500,
+) -> ImportResult:
+    """Import the equipos of a CSV or XLSX file, committing every batch.
+
+    ``hospital_ids`` limits the hospitals rows may reference (``None`` allows
+    all). Invalid rows are reported in the result and skipped; file-level
+    problems raise ``ValueError``.
+    """
+
+    started = time.perf_counter()
+    result = ImportResult()
+    builder = _RowBuilder(_Catalogos(session, hospital_ids))
+    batch: list[tuple[int, dict[str, Any]]] = []
+    try:
+        for fila, raw in iter_import_rows(stream, filename):
+            result.filas += 1
+            try:
+                batch.append((fila, builder.build(raw)))
+            except ValueError as exc:
+                result.errores.append(ImportRowError(fila, str(exc)))
+            if len(batch) >= batch_size:
+                _insert_batch(session, batch, usuario_id, result)
+                batch = []
+        if batch:
+            _insert_batch(session, batch, usuario_id, result)
+    finally:
+        result.errores.sort(key=lambda error: error.fila)
+        if result.creados:
+            invalidate_count_cache()
+            invalidate_dashboard_cache()
+        result.segundos = time.perf_counter() - started
+    return result
+
+
+__all__ = [
+    "IMPORT_EXTENSIONS",
+    "ImportResult",
+    "ImportRowError",
+    "importar_equipos",
+    "iter_import_rows",
+]
@@ -1,34 +1,62 @@
 """Utility helpers for equipment domain logic."""
 from __future__ import annotations
 
+import threading
+import time
 from datetime import datetime
-from typing import Sequence
+from typing import Hashable, Sequence
 
-from sqlalchemy.orm import Session, joinedload
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Query, Session, joinedload
 
 from app.extensions import db
-from app.models import Equipo
+from app.models import ActaItem, Equipo, EquipoAdjunto, EquipoHistorial, EquipoInsumo
+from app.services import secuencia_service
 
+COUNT_CACHE_EXTENSION_KEY = "equipos_count_cache"
 
-def generate_internal_serial(session: Session, moment: datetime | None = None) -> str:
-    """Return a unique serial number for equipment without a visible serial."""
 
-    timestamp = moment or datetime.utcnow()
-    prefix = f"EQ-{timestamp:%Y%m%d}"
-    like_expression = f"{prefix}-%"
+def _last_used_serial(session: Session, prefix: str) -> int:
+    """Highest sequence among existing ``prefix-NNNN`` serials.
+
+    Only seeds the ``secuencias`` counter of a day the first time it is used.
+    """
+
     last_value = (
         session.query(Equipo.numero_serie)
-        .filter(Equipo.numero_serie.ilike(like_expression))
+        .filter(Equipo.numero_serie.ilike(f"{prefix}-%"))
         .order_by(Equipo.numero_serie.desc())
         .first()
     )
-    sequence = 1
     if last_value and last_value[0]:
         try:
-            sequence = int(str(last_value[0]).rsplit("-", maxsplit=1)[-1]) + 1
+            return int(str(last_value[0]).rsplit("-", maxsplit=1)[-1])
         except (ValueError, IndexError):  # pragma: no cover - defensive
-            sequence = 1
-    return f"{prefix}-{sequence:04d}"
+            return 0
+    return 0
+
+
+def reserve_internal_serials(
+    session: Session, count: int, moment: datetime | None = None
+) -> list[str]:
+    """Reserve ``count`` consecutive internal serials of ``moment``'s day.
+
+    The whole block costs one atomic increment of the day's counter.
+    """
+
+    timestamp = moment or datetime.utcnow()
+    prefix = f"EQ-{timestamp:%Y%m%d}"
+    numbers = secuencia_service.reservar(
+        session, prefix, count, inicial=lambda: _last_used_serial(session, prefix)
+    )
+    return [f"{prefix}-{number:04d}" for number in numbers]
+
+
+def generate_internal_serial(session: Session, moment: datetime | None = None) -> str:
+    """Return a unique serial number for equipment without a visible serial."""
+
+    return reserve_internal_serials(session, 1, moment)[0]
 
 
 def format_equipo_option(equipo: Equipo) -> dict[str, str]:
@@ -74,4 +102,132 @@ def equipment_options_for_ids(ids: Sequence[int | str | None]) -> list[dict[str,
     return [mapping[item] for item in ordered if item in mapping]
 
 
-__all__ = ["generate_internal_serial", "format_equipo_option", "equipment_options_for_ids"]
+def equipo_tab_counts(session: Session, equipo_id: int) -> dict[str, int]:
+    """Return the row counts of the ``equipos.detalle`` tabs in one query."""
+
+    insumos = select(func.count()).where(
+        EquipoInsumo.equipo_id == equipo_id, EquipoInsumo.fecha_desasociacion.is_(None)
+    )
+    historial = select(func.count()).where(EquipoHistorial.equipo_id == equipo_id)
+    actas = select(func.count(ActaItem.acta_id.distinct())).where(ActaItem.equipo_id == equipo_id)
+    evidencias = select(func.count()).where(EquipoAdjunto.equipo_id == equipo_id)
+    row = session.execute(
+        select(
+            insumos.scalar_subquery().label("insumos"),
+            historial.scalar_subquery().label("historial"),
+            actas.scalar_subquery().label("actas"),
+            evidencias.scalar_subquery().label("evidencias"),
+        )
+    ).one()
+    return dict(row._mapping)
+
+
+class EquipoCountCache:
+    """Process-local TTL cache of ``equipos.listar`` totals by filter signature.
+
+    Entries are dropped when a flush in this process writes an equipo and
+    otherwise expire after ``EQUIPOS_COUNT_CACHE_TIMEOUT`` seconds, which
+    bounds how stale the page numbers get after writes in other workers.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[Hashable, tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, timeout: float) -> int | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, total = entry
+            if time.monotonic() - stored_at >= timeout:
+                self._entries.pop(key, None)
+                return None
+            return total
+
+    def set(self, key: Hashable, total: int) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), total)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+def get_count_cache(app=None) -> EquipoCountCache:
+    """Return the equipos count cache bound to ``app`` (or the current app)."""
+
+    target = app or current_app
+    cache = target.extensions.get(COUNT_CACHE_EXTENSION_KEY)
+    if cache is None:
+        cache = target.extensions.setdefault(COUNT_CACHE_EXTENSION_KEY, EquipoCountCache())
+    return cache
+
+
+def cached_equipo_count(query: Query, signature: Hashable) -> int:
+    """Return ``query``'s row count, reusing it for identical filters."""
+
+    timeout = current_app.config.get("EQUIPOS_COUNT_CACHE_TIMEOUT", 60)
+    if timeout <= 0:
+        return query.order_by(None).count()
+    cache = get_count_cache()
+    total = cache.get(signature, timeout)
+    if total is None:
+        total = query.order_by(None).count()
+        cache.set(signature, total)
+    return total
+
+
+def invalidate_count_cache() -> None:
+    """Drop the cached equipos totals; needed after writes bypassing the ORM."""
+
+    if not has_app_context():
+        return
+    cache = current_app.extensions.get(COUNT_CACHE_EXTENSION_KEY)
+    if cache is not None:
+        cache.clear()
+
+
+def invalidate_count_cache_on_commit(session: Session) -> None:
+    """Drop the cached equipos totals again once ``session`` commits."""
+
+    session.info["equipos_counts_dirty"] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_counts_on_flush(session, flush_context) -> None:
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, Equipo):
+            invalidate_count_cache_on_commit(session)
+            invalidate_count_cache()
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_counts_on_commit(session) -> None:
+    # Counts cached by other requests before the commit saw the old rows.
+    if session.info.pop("equipos_counts_dirty", False):
+        invalidate_count_cache()
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_counts_dirty_flag(session) -> None:
+    session.info.pop("equipos_counts_dirty", None)
+
+
+__all__ = [
+    "EquipoCountCache",
+    "cached_equipo_count",
+    "equipment_options_for_ids",
+    "equipo_tab_counts",
+    "format_equipo_option",
+    "generate_internal_serial",
+    "get_count_cache",
+    "invalidate_count_cache",
+    "invalidate_count_cache_on_commit",
+    "reserve_internal_serials",
+]
@@ -0,0 +1,136 @@
+"""Printable QR label sheets for a selection of equipos."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable
+
+from flask import current_app, has_request_context, url_for
+from sqlalchemy.orm import Query, joinedload
+
+from app.models import Equipo
+from app.services.pdf_service import render_pdf
+from app.services.qr_service import qr_digest, render_qr_batch
+
+
+@dataclass
+class Etiqueta:
+    """Text and QR image of one label."""
+
+    equipo_id: int
+    codigo: str
+    titulo: str
+    numero_serie: str | None
+    ubicacion: str
+    url: str
+    qr_path: Path
+
+    @property
+    def digest(self) -> str:
+        return qr_digest(self.url)
+
+
+def equipo_urls(equipo_ids: Iterable[int], base_url: str | None = None) -> dict[int, str]:
+    """Return the absolute detail URL encoded in each equipo's QR.
+
+    ``base_url`` (or ``QR_BASE_URL``) fixes the host so labels printed from
+    the CLI or behind different proxies encode the same URL; otherwise the
+    current request or ``SERVER_NAME`` is used. Raises :class:`RuntimeError`
+    when none of them is available.
+    """
+
+    base_url = base_url or current_app.config.get("QR_BASE_URL")
+    if base_url:
+        with current_app.test_request_context():
+            return {
+                equipo_id: base_url.rstrip("/") + url_for("equipos.detalle", equipo_id=equipo_id)
+                for equipo_id in equipo_ids
+            }
+    if not (has_request_context() or current_app.config.get("SERVER_NAME")):
+        raise RuntimeError("Configure QR_BASE_URL para generar las URL de los QR.")
+    return {
+        equipo_id: url_for("equipos.detalle", equipo_id=equipo_id, _external=True)
+        for equipo_id in equipo_ids
+    }
+
+
+def _ubicacion(equipo: Equipo) -> str:
+    partes = [equipo.hospital.nombre if equipo.hospital else ""]
+    if equipo.servicio:
+        partes.append(equipo.servicio.nombre)
+    if equipo.oficina:
+        partes.append(equipo.oficina.nombre)
+    return " / ".join(filter(None, partes))
+
+
+def _titulo(equipo: Equipo) -> str:
+    partes = [equipo.tipo.nombre if equipo.tipo else "", equipo.marca or "", equipo.modelo or ""]
+    return " ".join(filter(None, partes)) or (equipo.descripcion or "")
+
+
+def preparar_etiquetas(
+    seleccion: Query,
+    *,
+    cache_dir: Path | str | None = None,
+    base_url: str | None = None,
+    processes: int = 1,
+) -> list[Etiqueta]:
+    """Return the labels of ``seleccion`` ordered by location, with their QR images.
+
+    Images come from the ``QR_CACHE_FOLDER`` disk cache; only the missing
+    ones are rendered, inline unless ``processes`` > 1 (see
+    :func:`render_qr_batch`). Raises :class:`RuntimeError` when they cannot
+    be rendered.
+    """
+
+    equipos = (
+        seleccion.options(
+            joinedload(Equipo.tipo),
+            joinedload(Equipo.hospital),
+            joinedload(Equipo.servicio),
+            joinedload(Equipo.oficina),
+        )
+        .order_by(None)
+        .order_by(Equipo.hospital_id, Equipo.servicio_id, Equipo.oficina_id, Equipo.id)
+        .all()
+    )
+    urls = equipo_urls((equipo.id for equipo in equipos), base_url)
+    paths = render_qr_batch(
+        urls.values(),
+        cache_dir or current_app.config["QR_CACHE_FOLDER"],
+        processes=processes,
+    )
+    return [
+        Etiqueta(
+            equipo_id=equipo.id,
+            codigo=equipo.codigo or f"#{equipo.id}",
+            titulo=_titulo(equipo),
+            numero_serie=equipo.numero_serie,
+            ubicacion=_ubicacion(equipo),
+            url=urls[equipo.id],
+            qr_path=paths[urls[equipo.id]],
+        )
+        for equipo in equipos
+    ]
+
+
+def render_hoja(
+    etiquetas: list[Etiqueta],
+    output_path: Path,
+    qr_src: Callable[[Etiqueta], str] | None = None,
+) -> Path:
+    """Write the label sheet to ``output_path`` (PDF, or HTML without WeasyPrint).
+
+    Images are referenced by ``file://`` URI by default so WeasyPrint reads
+    them straight from the cache instead of decoding inline data.
+    """
+
+    context = {
+        "etiquetas": etiquetas,
+        "qr_src": qr_src or (lambda etiqueta: etiqueta.qr_path.resolve().as_uri()),
+        "imprimir": False,
+    }
+    return render_pdf("equipos/etiquetas.html", context, output_path)
+
+
+__all__ = ["Etiqueta", "equipo_urls", "preparar_etiquetas", "render_hoja"]
@@ -0,0 +1,148 @@
+"""Report foreign keys and relationship orderings without a covering index."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterable
+
+from sqlalchemy import Column, MetaData, Table, UniqueConstraint
+from sqlalchemy.orm import RelationshipDirection, registry as orm_registry
+
+
+_AUTHOR_COLUMNS = "autor del registro: solo se recorre al borrar el usuario"
+_LOCATION_COLUMNS = "ubicación secundaria: los listados filtran por hospital"
+_SMALL_TABLES = "tabla de configuración chica, se lee completa por rol o usuario"
+
+# Foreign keys left without an index on purpose; ``flask db index-audit``
+# skips them so ``--strict`` only fails on new ones.
+ALLOWED_UNINDEXED: dict[tuple[str, tuple[str, ...]], str] = {
+    ("actas", ("usuario_id",)): _AUTHOR_COLUMNS,
+    ("adjuntos", ("uploaded_by_id",)): _AUTHOR_COLUMNS,
+    ("docscan", ("usuario_id",)): _AUTHOR_COLUMNS,
+    ("equipos_adjuntos", ("uploaded_by_id",)): _AUTHOR_COLUMNS,
+    ("equipos_historial", ("usuario_id",)): _AUTHOR_COLUMNS,
+    ("equipos_insumos", ("asociado_por_id",)): _AUTHOR_COLUMNS,
+    ("insumo_movimientos", ("usuario_id",)): _AUTHOR_COLUMNS,
+    ("licencias", ("decidido_por",)): _AUTHOR_COLUMNS,
+    ("actas", ("oficina_id",)): _LOCATION_COLUMNS,
+    ("actas", ("servicio_id",)): _LOCATION_COLUMNS,
+    ("docscan", ("oficina_id",)): _LOCATION_COLUMNS,
+    ("docscan", ("servicio_id",)): _LOCATION_COLUMNS,
+    ("usuarios", ("oficina_id",)): _LOCATION_COLUMNS,
+    ("usuarios", ("servicio_id",)): _LOCATION_COLUMNS,
+    ("vlan_dispositivos", ("oficina_id",)): _LOCATION_COLUMNS,
+    ("vlan_dispositivos", ("servicio_id",)): _LOCATION_COLUMNS,
+    ("vlans", ("oficina_id",)): _LOCATION_COLUMNS,
+    ("vlans", ("servicio_id",)): _LOCATION_COLUMNS,
+    ("hospital_usuario_rol", ("hospital_id",)): _SMALL_TABLES,
+    ("hospital_usuario_rol", ("rol_id",)): _SMALL_TABLES,
+    ("permisos", ("hospital_id",)): _SMALL_TABLES,
+    ("usuarios", ("rol_id",)): _SMALL_TABLES,
+    ("metricas_diarias", ("hospital_id",)): (
+        "las consultas filtran primero por fecha (uq_metrica_diaria)"
+    ),
+    ("insumo_movimientos", ("equipo_id",)): (
+        "no se consulta por equipo; solo se recorre al borrarlo"
+    ),
+}
+
+
+@dataclass(frozen=True)
+class IndexFinding:
+    table: str
+    columns: tuple[str, ...]
+    motivo: str
+
+    def __str__(self) -> str:
+        return f"{self.table}({', '.join(self.columns)}): {self.motivo}"
+
+
+def _index_column_lists(table: Table) -> list[list[str]]:
+    """Column names of every index, primary key and unique constraint."""
+
+    lists = [[column.name for column in table.primary_key.columns]]
+    for index in table.indexes:
+        # Expression indexes (partial or functional) expose no plain columns.
+        names = [column.name for column in index.columns]
+        if names and len(names) == len(index.expressions):
+            lists.append(names)
+    for constraint in table.constraints:
+        if isinstance(constraint, UniqueConstraint):
+            lists.append([column.name for column in constraint.columns])
+    return [names for names in lists if names]
+
+
+def is_covered(table: Table, leading: Iterable[str], following: Iterable[str] = ()) -> bool:
+    """Whether an index starts with ``leading`` (any order) then ``following``."""
+
+    leading = set(leading)
+    following = list(following)
+    width = len(leading)
+    for names in _index_column_lists(table):
+        if set(names[:width]) != leading:
+            continue
+        if names[width : width + len(following)] == following:
+            return True
+    return False
+
+
+def _foreign_key_findings(metadata: MetaData) -> list[IndexFinding]:
+    findings = []
+    for table in metadata.sorted_tables:
+        for constraint in table.foreign_key_constraints:
+            columns = tuple(column.name for column in constraint.columns)
+            if not is_covered(table, columns):
+                target = constraint.referred_table.name
+                findings.append(IndexFinding(table.name, columns, f"clave foránea a {target} sin índice"))
+    return findings
+
+
+def _ordering_findings(registry: orm_registry) -> list[IndexFinding]:
+    findings = []
+    for mapper in registry.mappers:
+        for relationship in mapper.relationships:
+            if not relationship.order_by or relationship.direction is not RelationshipDirection.ONETOMANY:
+                continue
+            # ``desc()``/``asc()`` wrap the column; the index serves both directions.
+            order_columns = [
+                getattr(clause, "element", clause) for clause in relationship.order_by
+            ]
+            order_columns = [column for column in order_columns if isinstance(column, Column)]
+            if not order_columns:
+                continue
+            table = order_columns[0].table
+            leading = [column.name for column in relationship.remote_side if column.table is table]
+            following = [column.name for column in order_columns]
+            if not is_covered(table, leading, following):
+                findings.append(
+                    IndexFinding(
+                        table.name,
+                        (*leading, *following),
+                        f"ORDER BY de {mapper.class_.__name__}.{relationship.key} sin índice",
+                    )
+                )
+    return findings
+
+
+def audit_indexes(
+    metadata: MetaData,
+    registry: orm_registry | None = None,
+    allowed: Iterable[tuple[str, tuple[str, ...]]] = (),
+) -> list[IndexFinding]:
+    """Return the foreign keys and ``relationship(order_by=...)`` column lists
+    of ``metadata`` that no index, primary key or unique constraint covers.
+
+    ``(table, columns)`` pairs in ``allowed`` (see :data:`ALLOWED_UNINDEXED`)
+    are not reported.
+    """
+
+    allowed = set(allowed)
+    findings = _foreign_key_findings(metadata)
+    if registry is not None:
+        findings.extend(_ordering_findings(registry))
+    findings = [
+        finding for finding in set(findings) if (finding.table, finding.columns) not in allowed
+    ]
+    return sorted(findings, key=lambda finding: (finding.table, finding.columns))
+
+
+__all__ = ["ALLOWED_UNINDEXED", "IndexFinding", "audit_indexes", "is_covered"]
@@ -1,12 +1,21 @@
 """Utility helpers for insumo stock movements."""
 from __future__ import annotations
 
-from typing import Optional
+from typing import Iterable, Optional
 
 from app.extensions import db
-from sqlalchemy import select
+from sqlalchemy import delete, exists, func, insert, or_, select
 
-from app.models import Insumo, InsumoMovimiento, InsumoSerie, MovimientoTipo, Usuario
+from app.models import (
+    Equipo,
+    EquipoInsumo,
+    Insumo,
+    InsumoHospital,
+    InsumoMovimiento,
+    InsumoSerie,
+    MovimientoTipo,
+    Usuario,
+)
 
 
 def registrar_movimiento(
@@ -86,4 +95,67 @@ def agregar_series(
     return series_creadas
 
 
-__all__ = ["registrar_movimiento", "agregar_series"]
+def _asociaciones_activas_por_hospital():
+    return (
+        select(EquipoInsumo.insumo_id, Equipo.hospital_id, func.count(EquipoInsumo.id))
+        .join(Equipo, Equipo.id == EquipoInsumo.equipo_id)
+        .where(EquipoInsumo.fecha_desasociacion.is_(None))
+        .group_by(EquipoInsumo.insumo_id, Equipo.hospital_id)
+    )
+
+
+def actualizar_insumo_hospital(insumo_ids: Iterable[int]) -> None:
+    """Recalcular las filas de ``insumo_hospital`` de los insumos indicados.
+
+    Se ejecuta dentro de la transacción del llamador, que es quien confirma.
+    """
+
+    ids = {insumo_id for insumo_id in insumo_ids if insumo_id is not None}
+    if not ids:
+        return
+    db.session.flush()
+    db.session.execute(delete(InsumoHospital).where(InsumoHospital.insumo_id.in_(ids)))
+    db.session.execute(
+        insert(InsumoHospital).from_select(
+            ["insumo_id", "hospital_id", "asociaciones"],
+            _asociaciones_activas_por_hospital().where(EquipoInsumo.insumo_id.in_(ids)),
+        )
+    )
+
+
+def reconstruir_insumo_hospital() -> int:
+    """Regenerar por completo ``insumo_hospital`` y devolver la cantidad de filas."""
+
+    db.session.execute(delete(InsumoHospital))
+    db.session.execute(
+        insert(InsumoHospital).from_select(
+            ["insumo_id", "hospital_id", "asociaciones"],
+            _asociaciones_activas_por_hospital(),
+        )
+    )
+    total = db.session.scalar(select(func.count()).select_from(InsumoHospital)) or 0
+    db.session.commit()
+    return int(total)
+
+
+def filtro_alcance_insumos(hospital_ids: Iterable[int]):
+    """Condición para insumos visibles desde ``hospital_ids``.
+
+    Incluye los insumos asociados a equipos de esos hospitales y los que no
+    están asociados a ningún equipo.
+    """
+
+    en_alcance = Insumo.id.in_(
+        select(InsumoHospital.insumo_id).where(InsumoHospital.hospital_id.in_(list(hospital_ids)))
+    )
+    asociado = exists().where(InsumoHospital.insumo_id == Insumo.id)
+    return or_(en_alcance, ~asociado)
+
+
+__all__ = [
+    "registrar_movimiento",
+    "agregar_series",
+    "actualizar_insumo_hospital",
+    "reconstruir_insumo_hospital",
+    "filtro_alcance_insumos",
+]
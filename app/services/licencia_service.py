@@ -1,13 +1,18 @@
 """Business logic helpers for license workflow."""
 from __future__ import annotations
 
-from datetime import date
+import threading
+import time
+from datetime import date, timedelta
 
+from flask import current_app, has_app_context
 from sqlalchemy import select
 
 from app.extensions import db
 from app.models import EstadoLicencia, Licencia, Usuario
 
+STATUS_CACHE_EXTENSION_KEY = "licencia_status_cache"
+
 
 def crear_licencia(
     *,
@@ -62,6 +67,104 @@ def usuario_con_licencia_activa(usuario_id: int, fecha: date | None = None) -> b
     return db.session.execute(query).first() is not None
 
 
+def estado_licencia_usuario(usuario_id: int, fecha: date | None = None) -> tuple[bool, date | None]:
+    """Return whether ``usuario_id`` is on license at ``fecha`` and until when
+    that answer holds.
+
+    The second value is the next ``fecha_inicio`` or the day after the current
+    ``fecha_fin`` among approved licenses, or ``None`` when nothing is
+    scheduled.
+    """
+
+    fecha = fecha or date.today()
+    rows = db.session.execute(
+        select(Licencia.fecha_inicio, Licencia.fecha_fin)
+        .where(Licencia.user_id == usuario_id)
+        .where(Licencia.estado == EstadoLicencia.APROBADA)
+        .where(Licencia.fecha_fin >= fecha)
+    )
+    activa = False
+    limites: list[date] = []
+    for fecha_inicio, fecha_fin in rows:
+        if fecha_inicio <= fecha:
+            activa = True
+            limites.append(fecha_fin + timedelta(days=1))
+        else:
+            limites.append(fecha_inicio)
+    return activa, min(limites, default=None)
+
+
+class LicenciaStatusCache:
+    """Process-local cache of :func:`estado_licencia_usuario` per user.
+
+    Entries expire on the date the status can change and, at the latest,
+    after ``LICENCIA_STATUS_CACHE_TIMEOUT`` seconds, which bounds how long a
+    worker misses approvals handled by another worker.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[int, tuple[float, bool, date | None]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, usuario_id: int, fecha: date, timeout: float) -> bool | None:
+        with self._lock:
+            entry = self._entries.get(usuario_id)
+            if entry is None:
+                return None
+            stored_at, activa, vigente_hasta = entry
+            if time.monotonic() - stored_at >= timeout or (
+                vigente_hasta is not None and fecha >= vigente_hasta
+            ):
+                self._entries.pop(usuario_id, None)
+                return None
+            return activa
+
+    def set(self, usuario_id: int, activa: bool, vigente_hasta: date | None) -> None:
+        with self._lock:
+            self._entries[usuario_id] = (time.monotonic(), activa, vigente_hasta)
+
+    def discard(self, usuario_id: int) -> None:
+        with self._lock:
+            self._entries.pop(usuario_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def get_status_cache(app=None) -> LicenciaStatusCache:
+    """Return the license status cache bound to ``app`` (or the current app)."""
+
+    target = app or current_app
+    cache = target.extensions.get(STATUS_CACHE_EXTENSION_KEY)
+    if cache is None:
+        cache = target.extensions.setdefault(STATUS_CACHE_EXTENSION_KEY, LicenciaStatusCache())
+    return cache
+
+
+def usuario_con_licencia_activa_cacheada(usuario_id: int, fecha: date | None = None) -> bool:
+    """Cached variant of :func:`usuario_con_licencia_activa` for request guards."""
+
+    fecha = fecha or date.today()
+    cache = get_status_cache()
+    timeout = current_app.config.get("LICENCIA_STATUS_CACHE_TIMEOUT", 300)
+    activa = cache.get(usuario_id, fecha, timeout)
+    if activa is None:
+        activa, vigente_hasta = estado_licencia_usuario(usuario_id, fecha)
+        cache.set(usuario_id, activa, vigente_hasta)
+    return activa
+
+
+def invalidar_estado_licencia(usuario_id: int) -> None:
+    """Forget the cached license status of ``usuario_id``."""
+
+    if not has_app_context():
+        return
+    cache = current_app.extensions.get(STATUS_CACHE_EXTENSION_KEY)
+    if cache is not None:
+        cache.discard(usuario_id)
+
+
 def aprobar_licencia(licencia: Licencia, aprobador: Usuario) -> Licencia:
     """Approve ``licencia`` ensuring no overlaps."""
 
@@ -69,6 +172,7 @@ def aprobar_licencia(licencia: Licencia, aprobador: Usuario) -> Licencia:
         raise ValueError("Ya existe una licencia aprobada que se superpone")
     licencia.aprobar(aprobador)
     db.session.commit()
+    invalidar_estado_licencia(licencia.user_id)
     return licencia
 
 
@@ -83,6 +187,7 @@ def rechazar_licencia(
 def cancelar_licencia(licencia: Licencia, usuario: Usuario) -> Licencia:
     licencia.cancelar(usuario)
     db.session.commit()
+    invalidar_estado_licencia(licencia.user_id)
     return licencia
 
 
@@ -94,9 +199,14 @@ def enviar_licencia(licencia: Licencia) -> Licencia:
 
 
 __all__ = [
+    "LicenciaStatusCache",
     "crear_licencia",
+    "estado_licencia_usuario",
+    "get_status_cache",
+    "invalidar_estado_licencia",
     "licencias_superpuestas",
     "usuario_con_licencia_activa",
+    "usuario_con_licencia_activa_cacheada",
     "aprobar_licencia",
     "rechazar_licencia",
     "cancelar_licencia",
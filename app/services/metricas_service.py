@@ -0,0 +1,276 @@
+"""Daily KPI snapshots feeding dashboard deltas and trend charts."""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Iterable
+
+from flask import current_app
+from sqlalchemy import ColumnElement, and_, case, delete, exists, func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models import (
+    EstadoEquipo,
+    EstadoLicencia,
+    Equipo,
+    Hospital,
+    Insumo,
+    InsumoHospital,
+    Licencia,
+    MetricaDiaria,
+    TipoEquipo,
+    Usuario,
+)
+from app.models.insumo import INSUMO_CRITICO
+from app.utils.scope import ScopeValue
+
+SNAPSHOT_EXTENSION_KEY = "metricas_snapshot_fecha"
+
+# Metrics stored with an empty ``clave``; these are the series exposed as trends.
+TREND_METRICS = (
+    "equipos",
+    "insumos",
+    "insumos_criticos",
+    "hospitales",
+    "licencias_activas",
+    "licencias_pendientes",
+)
+
+# Insumos shared by several hospitals make per-hospital rows non additive.
+_NON_ADDITIVE_METRICS = ("insumos", "insumos_criticos")
+
+SnapshotKey = tuple[int | None, str, str]
+
+
+def _today() -> date:
+    # Same calendar as the dashboard, which works in UTC.
+    return datetime.utcnow().date()
+
+
+def _count_if(condition):
+    return func.count(case((condition, 1)))
+
+
+def compute_snapshot(session: Session, fecha: date) -> dict[SnapshotKey, int]:
+    """Return metric values keyed by ``(hospital_id, metrica, clave)``.
+
+    ``hospital_id`` ``None`` holds the totals across every institution.
+    """
+
+    values: dict[SnapshotKey, int] = defaultdict(int)
+    hospital_ids = list(session.scalars(select(Hospital.id)))
+    for hospital_id in (*hospital_ids, None):
+        for metrica in TREND_METRICS:
+            values[(hospital_id, metrica, "")] = 0
+
+    def add(hospital_id: int | None, metrica: str, valor, clave: str = "") -> None:
+        values[(hospital_id, metrica, clave)] += int(valor or 0)
+        if hospital_id is not None:
+            values[(None, metrica, clave)] += int(valor or 0)
+
+    for hospital_id in hospital_ids:
+        add(hospital_id, "hospitales", 1)
+
+    equipos_rows = session.execute(
+        select(Equipo.hospital_id, Equipo.estado, TipoEquipo.nombre, func.count(Equipo.id))
+        .join(TipoEquipo, TipoEquipo.id == Equipo.tipo_id)
+        .group_by(Equipo.hospital_id, Equipo.estado, TipoEquipo.nombre)
+    )
+    for hospital_id, estado, tipo_nombre, count in equipos_rows:
+        estado_key = estado.value if isinstance(estado, EstadoEquipo) else str(estado)
+        add(hospital_id, "equipos", count)
+        add(hospital_id, "equipos_estado", count, estado_key)
+        add(hospital_id, "equipos_tipo", count, tipo_nombre)
+
+    # Insumos follow the dashboard scope rule: those associated with the
+    # hospital's equipment plus those not associated with any equipment.
+    critical = INSUMO_CRITICO
+    associated = exists().where(InsumoHospital.insumo_id == Insumo.id)
+    total, criticos, libres, libres_criticos = session.execute(
+        select(
+            func.count(Insumo.id),
+            _count_if(critical),
+            _count_if(~associated),
+            _count_if(and_(critical, ~associated)),
+        )
+    ).one()
+    values[(None, "insumos", "")] = int(total or 0)
+    values[(None, "insumos_criticos", "")] = int(criticos or 0)
+
+    asociados = {
+        hospital_id: (int(count or 0), int(count_criticos or 0))
+        for hospital_id, count, count_criticos in session.execute(
+            select(InsumoHospital.hospital_id, func.count(), _count_if(critical))
+            .join(Insumo, Insumo.id == InsumoHospital.insumo_id)
+            .group_by(InsumoHospital.hospital_id)
+        )
+    }
+    for hospital_id in hospital_ids:
+        count, count_criticos = asociados.get(hospital_id, (0, 0))
+        values[(hospital_id, "insumos", "")] = int(libres or 0) + count
+        values[(hospital_id, "insumos_criticos", "")] = int(libres_criticos or 0) + count_criticos
+
+    licencia_hospital = func.coalesce(Licencia.hospital_id, Usuario.hospital_id)
+    licencias_rows = session.execute(
+        select(
+            licencia_hospital,
+            _count_if(
+                and_(
+                    Licencia.estado == EstadoLicencia.APROBADA,
+                    Licencia.fecha_inicio <= fecha,
+                    Licencia.fecha_fin >= fecha,
+                )
+            ),
+            _count_if(Licencia.estado == EstadoLicencia.SOLICITADA),
+        )
+        .join(Usuario, Usuario.id == Licencia.user_id)
+        .where(Licencia.estado.in_([EstadoLicencia.SOLICITADA, EstadoLicencia.APROBADA]))
+        .group_by(licencia_hospital)
+    )
+    for hospital_id, activas, pendientes in licencias_rows:
+        add(hospital_id, "licencias_activas", activas)
+        add(hospital_id, "licencias_pendientes", pendientes)
+
+    return dict(values)
+
+
+def take_snapshot(session: Session, fecha: date | None = None) -> int:
+    """Replace the snapshot of ``fecha`` (default today) and commit it.
+
+    Returns the number of stored rows.
+    """
+
+    fecha = fecha or _today()
+    values = compute_snapshot(session, fecha)
+    session.execute(delete(MetricaDiaria).where(MetricaDiaria.fecha == fecha))
+    session.execute(
+        insert(MetricaDiaria),
+        [
+            {
+                "fecha": fecha,
+                "hospital_id": hospital_id,
+                "metrica": metrica,
+                "clave": clave,
+                "valor": valor,
+            }
+            for (hospital_id, metrica, clave), valor in values.items()
+        ],
+    )
+    session.commit()
+    return len(values)
+
+
+def ensure_daily_snapshot(today: date | None = None) -> bool:
+    """Take today's snapshot on the first dashboard access of the day.
+
+    The snapshot is written through its own session so the caller's pending
+    changes are never committed. Returns ``True`` when a snapshot was stored.
+    """
+
+    if not current_app.config.get("DASHBOARD_SNAPSHOT_ON_ACCESS", True):
+        return False
+    today = today or _today()
+    if current_app.extensions.get(SNAPSHOT_EXTENSION_KEY) == today:
+        return False
+
+    taken = False
+    already_taken = db.session.scalar(
+        select(MetricaDiaria.id).where(MetricaDiaria.fecha == today).limit(1)
+    )
+    if already_taken is None:
+        with Session(db.engine) as session:
+            try:
+                take_snapshot(session, today)
+                taken = True
+            except IntegrityError:
+                # Another worker stored the same day concurrently.
+                session.rollback()
+    current_app.extensions[SNAPSHOT_EXTENSION_KEY] = today
+    return taken
+
+
+def _apply_snapshot_scope(stmt, scope: ScopeValue):
+    if scope == "todos":
+        return stmt.where(MetricaDiaria.hospital_id.is_(None))
+    return stmt.where(MetricaDiaria.hospital_id.in_(scope))
+
+
+def snapshot_columns(
+    scope: ScopeValue,
+    baseline: date,
+    previous: date,
+    metricas: Iterable[tuple[str, str]],
+) -> dict[tuple[str, str], ColumnElement]:
+    """Return scalar subqueries with the scope total of each requested metric.
+
+    ``metricas`` holds ``("baseline", metrica)`` pairs, read from the latest
+    snapshot on or before ``baseline``, and ``("previous", metrica)`` pairs,
+    read from the snapshot of ``previous``. The columns are meant to be added
+    to another statement, so reading the snapshot costs no extra round trip;
+    ``NULL`` means the metric is missing from that snapshot. Non-additive
+    metrics are left out for scopes of several hospitals.
+    """
+
+    if scope != "todos" and not scope:
+        return {}
+
+    baseline_fecha = (
+        select(func.max(MetricaDiaria.fecha))
+        .where(MetricaDiaria.fecha <= baseline)
+        .scalar_subquery()
+    )
+    columns: dict[tuple[str, str], ColumnElement] = {}
+    for momento, metrica in metricas:
+        if scope != "todos" and len(scope) > 1 and metrica in _NON_ADDITIVE_METRICS:
+            continue
+        fecha = baseline_fecha if momento == "baseline" else previous
+        stmt = select(func.sum(MetricaDiaria.valor)).where(
+            MetricaDiaria.clave == "",
+            MetricaDiaria.metrica == metrica,
+            MetricaDiaria.fecha == fecha,
+        )
+        columns[(momento, metrica)] = _apply_snapshot_scope(stmt, scope).scalar_subquery()
+    return columns
+
+
+def scope_trends(scope: ScopeValue, days: int) -> dict[str, object]:
+    """Return daily series of :data:`TREND_METRICS` for the last ``days`` days."""
+
+    since = _today() - timedelta(days=days - 1)
+    labels: list[str] = []
+    series: dict[str, list[int | None]] = {metrica: [] for metrica in TREND_METRICS}
+    if scope == "todos" or scope:
+        stmt = (
+            select(MetricaDiaria.fecha, MetricaDiaria.metrica, func.sum(MetricaDiaria.valor))
+            .where(
+                MetricaDiaria.clave == "",
+                MetricaDiaria.fecha >= since,
+                MetricaDiaria.metrica.in_(TREND_METRICS),
+            )
+            .group_by(MetricaDiaria.fecha, MetricaDiaria.metrica)
+            .order_by(MetricaDiaria.fecha)
+        )
+        by_date: dict[date, dict[str, int]] = {}
+        for fecha, metrica, valor in db.session.execute(_apply_snapshot_scope(stmt, scope)):
+            by_date.setdefault(fecha, {})[metrica] = int(valor or 0)
+        for fecha, valores in by_date.items():
+            labels.append(fecha.isoformat())
+            for metrica in TREND_METRICS:
+                series[metrica].append(valores.get(metrica))
+    if scope != "todos" and len(scope) > 1:
+        # Per-hospital insumo counts overlap and cannot be summed.
+        for metrica in _NON_ADDITIVE_METRICS:
+            series.pop(metrica)
+    return {"days": days, "labels": labels, "series": series}
+
+
+__all__ = [
+    "TREND_METRICS",
+    "compute_snapshot",
+    "ensure_daily_snapshot",
+    "scope_trends",
+    "snapshot_columns",
+    "take_snapshot",
+]
@@ -2,13 +2,23 @@
 
 from __future__ import annotations
 
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
+from pathlib import Path
+from typing import Iterable
 
 try:  # pragma: no cover - optional dependency
     import qrcode  # type: ignore
 except Exception:  # pragma: no cover - qrcode not installed
     qrcode = None  # type: ignore
 
+# Below this many missing images starting the worker processes costs more
+# than rendering them in the calling process.
+POOL_THRESHOLD = 64
+
 
 def create_qr(data: str) -> bytes:
     """Return a PNG image containing a QR code for ``data``.
@@ -24,3 +34,76 @@ def create_qr(data: str) -> bytes:
     buffer = BytesIO()
     img.save(buffer, format="PNG")
     return buffer.getvalue()
+
+
+def qr_digest(data: str) -> str:
+    """Return the cache key of the QR image for ``data``."""
+
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def qr_cache_path(cache_dir: Path | str, digest: str) -> Path:
+    """Return where the cached PNG with key ``digest`` lives inside ``cache_dir``."""
+
+    return Path(cache_dir) / digest[:2] / f"{digest}.png"
+
+
+def _render_label_png(data: str) -> bytes:
+    # Any mask gives a valid code; fixing it skips the search over the eight
+    # patterns, which takes most of qrcode's time (about 3x faster overall).
+    qr = qrcode.QRCode(mask_pattern=0)
+    qr.add_data(data)
+    qr.make(fit=True)
+    buffer = BytesIO()
+    qr.make_image().save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _render_to_cache(item: tuple[str, str]) -> None:
+    data, destination = item
+    path = Path(destination)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write then rename so concurrent jobs never read a partial image.
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    temporary.write_bytes(_render_label_png(data))
+    os.replace(temporary, path)
+
+
+def render_qr_batch(
+    payloads: Iterable[str],
+    cache_dir: Path | str,
+    *,
+    processes: int = 1,
+) -> dict[str, Path]:
+    """Return the cached PNG path of every payload, rendering the missing ones.
+
+    Images are keyed by the SHA-256 of the payload, so re-printing the same
+    labels only reads the cache. Misses are rendered inline unless
+    ``processes`` asks for a pool, which only the CLI should do: its workers
+    are spawned rather than forked, since forking a threaded web worker can
+    deadlock on inherited locks. Raises :class:`RuntimeError` when
+    :mod:`qrcode` is not installed.
+    """
+
+    paths = {data: qr_cache_path(cache_dir, qr_digest(data)) for data in payloads}
+    missing = [(data, str(path)) for data, path in paths.items() if not path.exists()]
+    if not missing:
+        return paths
+    if qrcode is None:
+        raise RuntimeError("El paquete qrcode no está instalado.")
+
+    workers = min(processes, len(missing))
+    if workers <= 1 or len(missing) < POOL_THRESHOLD:
+        for item in missing:
+            _render_to_cache(item)
+        return paths
+    chunksize = max(1, len(missing) // (workers * 4))
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        # ``list`` surfaces the first worker exception, if any.
+        list(pool.map(_render_to_cache, missing, chunksize=chunksize))
+    return paths
+
+
+__all__ = ["create_qr", "qr_cache_path", "qr_digest", "render_qr_batch"]
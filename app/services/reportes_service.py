@@ -13,10 +13,10 @@ from sqlalchemy.orm import selectinload
 from app.extensions import db
 from app.models import (
     Equipo,
-    EquipoInsumo,
     Hospital,
     HospitalUsuarioRol,
     Insumo,
+    InsumoHospital,
     Usuario,
     Vlan,
     VlanDispositivo,
@@ -137,45 +137,35 @@ def generar_reporte_excel(hospital_id: int | None = None) -> tuple[BytesIO, str]
         ],
     )
 
-    insumos_query = (
+    hospitales_por_insumo: dict[int, set[str]] = {}
+    relaciones = (
+        db.session.query(InsumoHospital.insumo_id, Hospital.nombre)
+        .join(Hospital, Hospital.id == InsumoHospital.hospital_id)
+        .filter(InsumoHospital.hospital_id.in_(hospitales_ids))
+    )
+    for insumo_id, hospital_nombre in relaciones:
+        hospitales_por_insumo.setdefault(insumo_id, set()).add(hospital_nombre)
+
+    insumos = (
         db.session.query(Insumo)
-        .options(
-            selectinload(Insumo.asignaciones)
-            .selectinload(EquipoInsumo.equipo)
-            .selectinload(Equipo.hospital)
-        )
+        .filter(Insumo.id.in_(list(hospitales_por_insumo)))
         .order_by(Insumo.nombre.asc())
+        .all()
+        if hospitales_por_insumo
+        else []
     )
-    insumos = insumos_query.all()
-    filas_insumos: list[list[object]] = []
-    for insumo in insumos:
-        hospitales_relacionados: dict[int, str] = {}
-        for asignacion in insumo.asignaciones:
-            equipo = getattr(asignacion, "equipo", None)
-            if equipo and equipo.hospital:
-                hospitales_relacionados[equipo.hospital.id] = equipo.hospital.nombre
-        if hospitales_ids:
-            filtrados = {
-                hid: nombre
-                for hid, nombre in hospitales_relacionados.items()
-                if hid in hospitales_ids
-            }
-            if not filtrados:
-                continue
-            nombres_hospital = sorted(set(filtrados.values()))
-        else:
-            nombres_hospital = sorted(set(hospitales_relacionados.values()))
-        filas_insumos.append(
-            [
-                ", ".join(nombres_hospital),
-                insumo.nombre,
-                insumo.numero_serie or "",
-                insumo.unidad_medida or "",
-                insumo.stock,
-                insumo.stock_minimo,
-                _format_decimal(insumo.costo_unitario),
-            ]
-        )
+    filas_insumos: list[list[object]] = [
+        [
+            ", ".join(sorted(hospitales_por_insumo[insumo.id])),
+            insumo.nombre,
+            insumo.numero_serie or "",
+            insumo.unidad_medida or "",
+            insumo.stock,
+            insumo.stock_minimo,
+            _format_decimal(insumo.costo_unitario),
+        ]
+        for insumo in insumos
+    ]
     libro.add_sheet(
         "Insumos",
         [
@@ -0,0 +1,376 @@
+"""Maintenance of the ``search_documents`` full-text index."""
+from __future__ import annotations
+
+import re
+from typing import Callable
+
+from sqlalchemy import and_, column, delete, event, func, inspect, or_, select, table, text, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.extensions import db
+from app.models import Docscan, Equipo, Insumo, Licencia, SearchDocument, Usuario
+from app.models.search_document import FTS_TABLE
+from app.utils.scope import ScopeValue
+
+# Labels shown in the results page, in display order.
+ENTITY_LABELS = {
+    "equipo": "Equipo",
+    "insumo": "Insumo",
+    "usuario": "Usuario",
+    "docscan": "Documento",
+    "licencia": "Licencia",
+}
+
+# Attributes whose changes require re-indexing the entity. Relationships are
+# listed too because assigning them does not record history on the FK column.
+_INDEXED_ATTRIBUTES: dict[type, tuple[str, ...]] = {
+    Equipo: ("descripcion", "codigo", "numero_serie", "marca", "modelo", "hospital_id", "hospital"),
+    Insumo: ("nombre", "numero_serie", "stock"),
+    Usuario: ("nombre", "apellido", "email", "username", "hospital_id", "hospital"),
+    Docscan: ("titulo", "comentario", "tipo", "hospital_id", "hospital"),
+    Licencia: (
+        "motivo",
+        "fecha_inicio",
+        "fecha_fin",
+        "hospital_id",
+        "hospital",
+        "user_id",
+        "usuario",
+    ),
+}
+
+_UPSERT_COLUMNS = ("hospital_id", "titulo", "detalle", "url", "contenido")
+_MAX_LABEL = 255
+
+
+def _join(*values) -> str:
+    return " ".join(str(value) for value in values if value)
+
+
+def _document(entidad: str, entidad_id: int, hospital_id: int | None, *, titulo, detalle, url, contenido) -> dict:
+    return {
+        "entidad": entidad,
+        "entidad_id": entidad_id,
+        "hospital_id": hospital_id,
+        "titulo": (titulo or "")[:_MAX_LABEL],
+        "detalle": (detalle or "")[:_MAX_LABEL],
+        "url": url,
+        "contenido": contenido,
+    }
+
+
+def _equipo_document(equipo: Equipo) -> dict:
+    return _document(
+        "equipo",
+        equipo.id,
+        equipo.hospital_id,
+        titulo=equipo.descripcion or equipo.codigo or "Equipo",
+        detalle=equipo.numero_serie or "",
+        url=f"/equipos/{equipo.id}",
+        contenido=_join(equipo.descripcion, equipo.codigo, equipo.numero_serie, equipo.marca, equipo.modelo),
+    )
+
+
+def _insumo_document(insumo: Insumo) -> dict:
+    return _document(
+        "insumo",
+        insumo.id,
+        None,
+        titulo=insumo.nombre,
+        detalle=f"Stock: {insumo.stock}",
+        url=f"/insumos/{insumo.id}",
+        contenido=_join(insumo.nombre, insumo.numero_serie),
+    )
+
+
+def _usuario_document(usuario: Usuario) -> dict:
+    return _document(
+        "usuario",
+        usuario.id,
+        usuario.hospital_id,
+        titulo=usuario.nombre,
+        detalle=usuario.email,
+        url="#",
+        contenido=_join(usuario.nombre, usuario.apellido, usuario.email, usuario.username),
+    )
+
+
+def _docscan_document(doc: Docscan) -> dict:
+    tipo = doc.tipo.value if hasattr(doc.tipo, "value") else str(doc.tipo or "")
+    return _document(
+        "docscan",
+        doc.id,
+        doc.hospital_id,
+        titulo=doc.titulo,
+        detalle=tipo,
+        url=f"/docscan/{doc.id}",
+        contenido=_join(doc.titulo, doc.comentario),
+    )
+
+
+def _licencia_document(licencia, usuario_nombre: str | None, usuario_hospital_id: int | None) -> dict:
+    return _document(
+        "licencia",
+        licencia.id,
+        licencia.hospital_id or usuario_hospital_id,
+        titulo=usuario_nombre or "",
+        detalle=f"{licencia.fecha_inicio:%d/%m/%Y} - {licencia.fecha_fin:%d/%m/%Y}",
+        url=f"/licencias/{licencia.id}/detalle",
+        contenido=licencia.motivo or "",
+    )
+
+
+def upsert_documents(connection, documents: list[dict]) -> None:
+    """Insert or refresh ``documents`` keyed by ``(entidad, entidad_id)``."""
+
+    if not documents:
+        return
+    search_table = SearchDocument.__table__
+    dialect_insert = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}.get(
+        connection.dialect.name
+    )
+    if dialect_insert is None:
+        connection.execute(
+            delete(search_table).where(
+                tuple_(search_table.c.entidad, search_table.c.entidad_id).in_(
+                    [(doc["entidad"], doc["entidad_id"]) for doc in documents]
+                )
+            )
+        )
+        connection.execute(search_table.insert(), documents)
+        return
+
+    stmt = dialect_insert(search_table).values(documents)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["entidad", "entidad_id"],
+        set_={
+            **{name: stmt.excluded[name] for name in _UPSERT_COLUMNS},
+            "updated_at": func.current_timestamp(),
+        },
+    )
+    connection.execute(stmt)
+
+
+def _remove_document(connection, entidad: str, entidad_id: int) -> None:
+    search_table = SearchDocument.__table__
+    connection.execute(
+        delete(search_table).where(
+            search_table.c.entidad == entidad, search_table.c.entidad_id == entidad_id
+        )
+    )
+
+
+def _licencia_documents_for(connection, licencias) -> list[dict]:
+    user_ids = {licencia.user_id for licencia in licencias}
+    usuarios = {
+        row.id: row
+        for row in connection.execute(
+            select(Usuario.id, Usuario.nombre, Usuario.hospital_id).where(Usuario.id.in_(user_ids))
+        )
+    }
+    documents = []
+    for licencia in licencias:
+        usuario = usuarios.get(licencia.user_id)
+        documents.append(
+            _licencia_document(
+                licencia,
+                usuario.nombre if usuario else None,
+                usuario.hospital_id if usuario else None,
+            )
+        )
+    return documents
+
+
+def _documents_on_flush(connection, target) -> list[dict]:
+    if isinstance(target, Licencia):
+        return _licencia_documents_for(connection, [target])
+    builder = _BUILDERS[type(target)]
+    return [builder(target)]
+
+
+def _has_indexed_changes(target) -> bool:
+    state = inspect(target)
+    return any(
+        state.attrs[name].history.has_changes() for name in _INDEXED_ATTRIBUTES[type(target)]
+    )
+
+
+def _after_save(mapper, connection, target) -> None:
+    upsert_documents(connection, _documents_on_flush(connection, target))
+
+
+def _after_update(mapper, connection, target) -> None:
+    if not _has_indexed_changes(target):
+        return
+    upsert_documents(connection, _documents_on_flush(connection, target))
+    if isinstance(target, Usuario):
+        # Licencia documents show the user's name and inherit their hospital.
+        licencias = connection.execute(
+            select(
+                Licencia.id,
+                Licencia.user_id,
+                Licencia.hospital_id,
+                Licencia.fecha_inicio,
+                Licencia.fecha_fin,
+                Licencia.motivo,
+            ).where(Licencia.user_id == target.id)
+        ).all()
+        upsert_documents(connection, _licencia_documents_for(connection, licencias))
+
+
+def _after_delete(mapper, connection, target) -> None:
+    _remove_document(connection, _ENTITY_BY_MODEL[type(target)], target.id)
+
+
+_BUILDERS: dict[type, Callable[..., dict]] = {
+    Equipo: _equipo_document,
+    Insumo: _insumo_document,
+    Usuario: _usuario_document,
+    Docscan: _docscan_document,
+}
+_ENTITY_BY_MODEL = {
+    Equipo: "equipo",
+    Insumo: "insumo",
+    Usuario: "usuario",
+    Docscan: "docscan",
+    Licencia: "licencia",
+}
+
+for _model in _ENTITY_BY_MODEL:
+    event.listen(_model, "after_insert", _after_save)
+    event.listen(_model, "after_update", _after_update)
+    event.listen(_model, "after_delete", _after_delete)
+
+
+# Columns read by ``reindex_all``; rows are built from tuples, not ORM objects.
+_REINDEX_COLUMNS: dict[type, tuple] = {
+    Equipo: (
+        Equipo.id,
+        Equipo.hospital_id,
+        Equipo.descripcion,
+        Equipo.codigo,
+        Equipo.numero_serie,
+        Equipo.marca,
+        Equipo.modelo,
+    ),
+    Insumo: (Insumo.id, Insumo.nombre, Insumo.numero_serie, Insumo.stock),
+    Usuario: (
+        Usuario.id,
+        Usuario.hospital_id,
+        Usuario.nombre,
+        Usuario.apellido,
+        Usuario.email,
+        Usuario.username,
+    ),
+    Docscan: (Docscan.id, Docscan.hospital_id, Docscan.titulo, Docscan.comentario, Docscan.tipo),
+    Licencia: (
+        Licencia.id,
+        Licencia.user_id,
+        Licencia.hospital_id,
+        Licencia.fecha_inicio,
+        Licencia.fecha_fin,
+        Licencia.motivo,
+    ),
+}
+
+
+def _batches(model, batch_size: int):
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(*_REINDEX_COLUMNS[model])
+            .where(model.id > last_id)
+            .order_by(model.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+
+def reindex_all(batch_size: int = 500, echo: Callable[[str], None] | None = None) -> int:
+    """Rebuild ``search_documents`` from scratch committing every batch."""
+
+    db.session.execute(delete(SearchDocument))
+    db.session.commit()
+    total = 0
+    for model, entidad in _ENTITY_BY_MODEL.items():
+        count = 0
+        for rows in _batches(model, batch_size):
+            connection = db.session.connection()
+            if model is Licencia:
+                documents = _licencia_documents_for(connection, rows)
+            else:
+                documents = [_BUILDERS[model](row) for row in rows]
+            upsert_documents(connection, documents)
+            db.session.commit()
+            count += len(documents)
+        if echo:
+            echo(f"{ENTITY_LABELS[entidad]}: {count} documentos")
+        total += count
+    return total
+
+
+def index_equipos(connection, equipo_ids: list[int]) -> None:
+    """Index equipos inserted with Core statements, which skip mapper events."""
+
+    if not equipo_ids:
+        return
+    rows = connection.execute(
+        select(*_REINDEX_COLUMNS[Equipo]).where(Equipo.id.in_(equipo_ids))
+    ).all()
+    upsert_documents(connection, [_equipo_document(row) for row in rows])
+
+
+def search_tokens(term: str) -> list[str]:
+    """Split ``term`` into word tokens safe to embed in full-text queries."""
+
+    return re.findall(r"\w+", (term or "").lower())
+
+
+def _full_text_condition(tokens: list[str]):
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        tsquery = " & ".join(f"{token}:*" for token in tokens)
+        return text("search_documents.busqueda @@ to_tsquery('spanish', :tsquery)").bindparams(
+            tsquery=tsquery
+        )
+    if dialect == "sqlite":
+        fts = table(FTS_TABLE, column("rowid"))
+        match = " ".join(f'"{token}"*' for token in tokens)
+        return SearchDocument.id.in_(
+            select(fts.c.rowid).where(text(f"{FTS_TABLE} MATCH :match").bindparams(match=match))
+        )
+    return and_(*[SearchDocument.contenido.ilike(f"%{token}%") for token in tokens])
+
+
+def _scope_condition(scope: ScopeValue):
+    if scope == "todos":
+        return None
+    if not scope:
+        return SearchDocument.hospital_id.is_(None)
+    return or_(SearchDocument.hospital_id.in_(scope), SearchDocument.hospital_id.is_(None))
+
+
+def search_condition(term: str, scope: ScopeValue = "todos"):
+    """Return the WHERE clause matching ``term`` within ``scope`` or ``None``."""
+
+    tokens = search_tokens(term)
+    if not tokens:
+        return None
+    condition = _full_text_condition(tokens)
+    scope_condition = _scope_condition(scope)
+    if scope_condition is not None:
+        condition = and_(condition, scope_condition)
+    return condition
+
+
+__all__ = [
+    "ENTITY_LABELS",
+    "index_equipos",
+    "reindex_all",
+    "search_condition",
+    "search_tokens",
+    "upsert_documents",
+]
@@ -1,97 +1,161 @@
 """Helper functions to perform global search across models."""
 from __future__ import annotations
 
-from sqlalchemy import or_, select
+from dataclasses import dataclass, field
+
+from sqlalchemy import case, func, literal_column, null, select, union_all
 
 from app.extensions import db
-from app.models import Docscan, Equipo, Insumo, Licencia, Usuario
+from app.models import SearchDocument
+from app.services.search_index_service import ENTITY_LABELS, search_condition
+from app.utils.scope import ScopeValue
 
+_ENTITY_ORDER = case(
+    {entidad: position for position, entidad in enumerate(ENTITY_LABELS)},
+    value=SearchDocument.entidad,
+)
 
-def global_search(query: str) -> list[dict[str, str]]:
-    """Search across key models returning unified dictionaries."""
 
-    if not query:
-        return []
-    like = f"%{query.lower()}%"
+def global_search(query: str, scope: ScopeValue = "todos") -> list[dict[str, str]]:
+    """Search the ``search_documents`` index returning unified dictionaries.
 
-    resultados: list[dict[str, str]] = []
+    Only documents of hospitals within ``scope`` (or not tied to a hospital)
+    are returned.
+    """
 
-    equipos = db.session.execute(
-        select(Equipo).where(
-            or_(
-                Equipo.descripcion.ilike(like),
-                Equipo.codigo.ilike(like),
-                Equipo.numero_serie.ilike(like),
-            )
-        )
-    ).scalars()
-    for equipo in equipos:
-        resultados.append(
-            {
-                "tipo": "Equipo",
-                "titulo": equipo.descripcion or equipo.codigo or "Equipo",
-                "detalle": equipo.numero_serie or "",
-                "url": f"/equipos/{equipo.id}",
-            }
-        )
+    condition = search_condition(query, scope)
+    if condition is None:
+        return []
 
-    insumos = db.session.execute(
-        select(Insumo).where(
-            or_(Insumo.nombre.ilike(like), Insumo.numero_serie.ilike(like))
-        )
-    ).scalars()
-    for insumo in insumos:
-        resultados.append(
-            {
-                "tipo": "Insumo",
-                "titulo": insumo.nombre,
-                "detalle": f"Stock: {insumo.stock}",
-                "url": f"/insumos/{insumo.id}",
-            }
+    rows = db.session.execute(
+        select(
+            SearchDocument.entidad,
+            SearchDocument.titulo,
+            SearchDocument.detalle,
+            SearchDocument.url,
         )
+        .where(condition)
+        .order_by(_ENTITY_ORDER, SearchDocument.titulo, SearchDocument.id)
+    )
+    return [
+        {
+            "tipo": ENTITY_LABELS.get(entidad, entidad),
+            "titulo": titulo,
+            "detalle": detalle,
+            "url": url,
+        }
+        for entidad, titulo, detalle, url in rows
+    ]
 
-    usuarios = db.session.execute(
-        select(Usuario).where(
-            or_(Usuario.nombre.ilike(like), Usuario.email.ilike(like), Usuario.username.ilike(like))
-        )
-    ).scalars()
-    for usuario in usuarios:
-        resultados.append(
-            {
-                "tipo": "Usuario",
-                "titulo": usuario.nombre,
-                "detalle": usuario.email,
-                "url": "#",
-            }
-        )
 
-    docscan = db.session.execute(
-        select(Docscan).where(or_(Docscan.titulo.ilike(like), Docscan.comentario.ilike(like)))
-    ).scalars()
-    for doc in docscan:
-        resultados.append(
-            {
-                "tipo": "Documento",
-                "titulo": doc.titulo,
-                "detalle": doc.tipo.value,
-                "url": f"/docscan/{doc.id}",
-            }
-        )
+@dataclass
+class SearchPage:
+    """One page of global search results plus per-type counts."""
 
-    licencias = db.session.execute(
-        select(Licencia).where(Licencia.motivo.ilike(like))
-    ).scalars()
-    for lic in licencias:
-        resultados.append(
-            {
-                "tipo": "Licencia",
-                "titulo": lic.usuario.nombre,
-                "detalle": f"{lic.fecha_inicio:%d/%m/%Y} - {lic.fecha_fin:%d/%m/%Y}",
-                "url": f"/licencias/{lic.id}/detalle",
-            }
+    items: list[dict[str, str]]
+    counts: dict[str, int]
+    tipo: str | None
+    page: int
+    per_page: int
+    total: int = field(init=False)
+
+    def __post_init__(self) -> None:
+        if self.tipo:
+            self.total = self.counts.get(self.tipo, 0)
+        else:
+            self.total = sum(self.counts.values())
+
+    @property
+    def has_prev(self) -> bool:
+        return self.page > 1
+
+    @property
+    def has_next(self) -> bool:
+        return self.page * self.per_page < self.total
+
+
+def search_page(
+    query: str,
+    scope: ScopeValue = "todos",
+    *,
+    page: int = 1,
+    per_page: int = 10,
+    tipo: str | None = None,
+) -> SearchPage:
+    """Return one page of results and the count per entity type.
+
+    Facet counts and the requested page come back in a single ``UNION ALL``
+    statement; only ``per_page`` rows are read from the index.
+    """
+
+    page = max(page, 1)
+    tipo = tipo if tipo in ENTITY_LABELS else None
+    condition = search_condition(query, scope)
+    if condition is None:
+        return SearchPage(items=[], counts={}, tipo=tipo, page=page, per_page=per_page)
+
+    facets = (
+        select(
+            literal_column("0").label("kind"),
+            SearchDocument.entidad,
+            func.count().label("total"),
+            null().label("titulo"),
+            null().label("detalle"),
+            null().label("url"),
+            literal_column("0").label("pos"),
         )
+        .where(condition)
+        .group_by(SearchDocument.entidad)
+    )
+    rows_query = select(
+        SearchDocument.entidad,
+        SearchDocument.titulo,
+        SearchDocument.detalle,
+        SearchDocument.url,
+    ).where(condition)
+    if tipo:
+        rows_query = rows_query.where(SearchDocument.entidad == tipo)
+    rows = (
+        rows_query.add_columns(
+            func.row_number()
+            .over(order_by=(_ENTITY_ORDER, SearchDocument.titulo, SearchDocument.id))
+            .label("pos")
+        )
+        .order_by(_ENTITY_ORDER, SearchDocument.titulo, SearchDocument.id)
+        .limit(per_page)
+        .offset((page - 1) * per_page)
+        .subquery()
+    )
+    page_rows = select(
+        literal_column("1").label("kind"),
+        rows.c.entidad,
+        literal_column("0").label("total"),
+        rows.c.titulo,
+        rows.c.detalle,
+        rows.c.url,
+        rows.c.pos,
+    )
+    combined = union_all(facets, page_rows).subquery()
+    result = db.session.execute(
+        select(combined).order_by(combined.c.kind, combined.c.pos)
+    )
 
-    return resultados
+    counts: dict[str, int] = {}
+    items: list[dict[str, str]] = []
+    for kind, entidad, total, titulo, detalle, url, _ in result:
+        if kind == 0:
+            counts[entidad] = int(total or 0)
+        else:
+            items.append(
+                {
+                    "tipo": ENTITY_LABELS.get(entidad, entidad),
+                    "titulo": titulo,
+                    "detalle": detalle,
+                    "url": url,
+                }
+            )
+    ordered_counts = {entidad: counts[entidad] for entidad in ENTITY_LABELS if entidad in counts}
+    return SearchPage(items=items, counts=ordered_counts, tipo=tipo, page=page, per_page=per_page)
 
 
-__all__ = ["global_search"]
+__all__ = ["SearchPage", "global_search", "search_page"]
@@ -0,0 +1,72 @@
+"""Atomic reservation of consecutive numbers from the ``secuencias`` table."""
+from __future__ import annotations
+
+from typing import Callable
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import Secuencia
+
+
+def _crear(session: Session, clave: str, inicial: int) -> None:
+    """Insert the counter unless a concurrent transaction already did."""
+
+    table = Secuencia.__table__
+    dialect_insert = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}.get(
+        session.get_bind().dialect.name
+    )
+    if dialect_insert is not None:
+        session.execute(
+            dialect_insert(table)
+            .values(clave=clave, valor=inicial)
+            .on_conflict_do_nothing(index_elements=["clave"])
+        )
+        return
+    try:
+        with session.begin_nested():
+            session.execute(table.insert().values(clave=clave, valor=inicial))
+    except IntegrityError:
+        pass
+
+
+def _incrementar(session: Session, clave: str, cantidad: int) -> int | None:
+    table = Secuencia.__table__
+    statement = (
+        update(table).where(table.c.clave == clave).values(valor=table.c.valor + cantidad)
+    )
+    if session.get_bind().dialect.update_returning:
+        return session.execute(statement.returning(table.c.valor)).scalar_one_or_none()
+    if not session.execute(statement).rowcount:
+        return None
+    return session.scalar(select(table.c.valor).where(table.c.clave == clave))
+
+
+def reservar(
+    session: Session,
+    clave: str,
+    cantidad: int = 1,
+    *,
+    inicial: Callable[[], int] | None = None,
+) -> range:
+    """Reserve ``cantidad`` consecutive numbers of ``clave`` and return them.
+
+    The increment is a single ``UPDATE ... RETURNING`` in the caller's
+    transaction: the row stays locked until the caller commits, so
+    concurrent reservations never overlap and a rollback releases the
+    numbers. ``inicial`` returns the last number already used when the
+    counter does not exist yet; it runs once per ``clave``.
+    """
+
+    if cantidad < 1:
+        raise ValueError("La cantidad a reservar debe ser mayor a cero")
+    ultimo = _incrementar(session, clave, cantidad)
+    if ultimo is None:
+        _crear(session, clave, inicial() if inicial else 0)
+        ultimo = _incrementar(session, clave, cantidad)
+    return range(ultimo - cantidad + 1, ultimo + 1)
+
+
+__all__ = ["reservar"]
@@ -141,7 +141,7 @@
             return;
           }
         }
-        const params = { q: query, page: 1 };
+        const params = { q: query };
         if (dependsField) {
           params[dependencyParam] = getDependencyValue(dependencyElement);
         }
@@ -153,7 +153,10 @@
             }
           });
         }
-        fetch(buildUrl(endpoint, params), { credentials: 'include' })
+        const url = buildUrl(endpoint, params);
+        // Only the first page is shown, so use cursor mode and skip the count.
+        url.searchParams.set('after', '');
+        fetch(url, { credentials: 'include' })
           .then((response) => {
             return response.json().then((data) => {
               if (!response.ok) {
@@ -165,7 +168,9 @@
             });
           })
           .then((data) => {
-            callback(data.items || data.results || []);
+            const items = data.items || data.results || [];
+            // The /api/search/<resource> live search labels items with ``label``.
+            callback(items.map((item) => (item.text === undefined ? { ...item, text: item.label } : item)));
           })
           .catch(() => {
             callback();
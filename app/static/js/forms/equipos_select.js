@@ -137,6 +137,11 @@
           ? dependencyMessage
           : placeholder;
 
+      // Select2 asks for page numbers; the API seeks with the cursor returned
+      // by the previous page of the same term.
+      const cursors = {};
+      const cursorKey = (params) => `${params.term || ''}|${params.page || 1}`;
+
       const ajaxConfig = {
         url: endpoint,
         dataType: 'json',
@@ -148,7 +153,7 @@
           }
           return {
             q: params.term || '',
-            page: params.page || 1,
+            after: (params.page || 1) > 1 ? cursors[cursorKey(params)] || '' : '',
             per_page: Number.isFinite(perPage) && perPage > 0 ? perPage : undefined,
             ...(dependencyElement
               ? { [dependencyParam]: getDependencyValue(dependencyElement) }
@@ -162,16 +167,22 @@
             }, {}),
           };
         },
-        processResults(data) {
+        processResults(data, params) {
           const payload = data && typeof data === 'object' ? data : {};
           const results = Array.isArray(payload)
             ? payload
             : payload.results || payload.items || [];
           const mapped = results.map((item) => normaliseOption(item));
           const pagination = payload.pagination || {};
+          const more = Boolean(payload.more ?? pagination.more);
+          if (more && payload.next_cursor) {
+            const current = params || {};
+            cursors[cursorKey({ term: current.term, page: (current.page || 1) + 1 })] =
+              payload.next_cursor;
+          }
           return {
             results: mapped,
-            pagination: { more: Boolean(pagination.more) },
+            pagination: { more },
           };
         },
       };
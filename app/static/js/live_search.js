@@ -103,7 +103,8 @@
         }
         return;
       }
-      const params = new URLSearchParams({ q: value });
+      // Empty cursor: first page without counting the matches.
+      const params = new URLSearchParams({ q: value, after: "" });
       if (typeof config.extraParamsFn === "function") {
         const extra = config.extraParamsFn() || {};
         Object.entries(extra).forEach(([key, val]) => {
@@ -120,7 +121,7 @@
       })
         .then((response) => response.json())
         .then((data) => {
-          lastItems = data.items || [];
+          lastItems = data.results || data.items || [];
           activeIndex = -1;
           if (target) {
             renderResults(target, lastItems, (item) => {
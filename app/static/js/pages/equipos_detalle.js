@@ -101,14 +101,7 @@
     tbody.appendChild(emptyRow);
   }
 
-  function appendAssociationRow(table, data, canRemove) {
-    if (!table || !data || !data.serie) {
-      return;
-    }
-    const tbody = table.tBodies[0] || table.querySelector('tbody');
-    if (!tbody) {
-      return;
-    }
+  function buildAssociationRow(data, canRemove) {
     const row = document.createElement('tr');
     row.setAttribute('data-insumo-row', '');
     row.dataset.serieId = data.serie.id;
@@ -141,7 +134,27 @@
       accionesCell.appendChild(button);
       row.appendChild(accionesCell);
     }
+    return row;
+  }
 
+  function updateTabCount(key, delta) {
+    const badge = document.querySelector(`[data-tab-count="${key}"]`);
+    if (!badge) {
+      return;
+    }
+    const current = parseInt(badge.textContent || '0', 10) || 0;
+    badge.textContent = Math.max(current + delta, 0);
+  }
+
+  function appendAssociationRow(table, data, canRemove) {
+    if (!table || !data || !data.serie) {
+      return;
+    }
+    const tbody = table.tBodies[0] || table.querySelector('tbody');
+    if (!tbody) {
+      return;
+    }
+    const row = buildAssociationRow(data, canRemove);
     const emptyRow = table.querySelector('[data-empty-row]');
     if (emptyRow) {
       emptyRow.remove();
@@ -165,6 +178,12 @@
       this.filters = Array.from(root.querySelectorAll("[data-filter]"));
       this.paginationContainer = root.querySelector("[data-panel-pagination]") || null;
 
+      // Cursor panels page with ``next_cursor`` and keep the cursor of every
+      // visited page to go back; the others page by offset and total.
+      this.cursorMode = root.dataset.pagination === "cursor";
+      this.pageCursors = [null];
+      this.nextCursor = null;
+
       this.offset = 0;
       this.total = 0;
       this.loaded = false;
@@ -180,7 +199,15 @@
     }
 
     registerEvents() {
-      if (typeof bootstrap !== "undefined" && this.root.id) {
+      const tabTrigger = this.root.id
+        ? document.querySelector(`[data-bs-toggle="tab"][data-bs-target="#${this.root.id}"]`)
+        : null;
+      if (tabTrigger) {
+        tabTrigger.addEventListener("shown.bs.tab", this.handleShown);
+        if (this.root.classList.contains("active")) {
+          this.handleShown();
+        }
+      } else if (typeof bootstrap !== "undefined" && this.root.id) {
         this.root.addEventListener("shown.bs.collapse", this.handleShown);
       } else {
         // Fallback if Bootstrap events are not available (non-collapsible scenario)
@@ -207,10 +234,19 @@
 
     handleSubmit(event) {
       event.preventDefault();
+      this.pageCursors = [null];
       this.fetchData(0);
     }
 
     handlePrev() {
+      if (this.cursorMode) {
+        if (this.loading || this.pageCursors.length <= 1) {
+          return;
+        }
+        this.pageCursors.pop();
+        this.fetchData(0);
+        return;
+      }
       if (this.loading || this.offset <= 0) {
         return;
       }
@@ -219,6 +255,14 @@
     }
 
     handleNext() {
+      if (this.cursorMode) {
+        if (this.loading || !this.nextCursor) {
+          return;
+        }
+        this.pageCursors.push(this.nextCursor);
+        this.fetchData(0);
+        return;
+      }
       if (this.loading || this.offset + this.limit >= this.total) {
         return;
       }
@@ -234,11 +278,17 @@
           field.value = "";
         }
       });
+      this.pageCursors = [null];
       this.fetchData(0);
     }
 
     collectParams(offset) {
-      const params = { limit: this.limit, offset };
+      const params = { limit: this.limit };
+      if (this.cursorMode) {
+        params.cursor = this.pageCursors[this.pageCursors.length - 1];
+      } else {
+        params.offset = offset;
+      }
       this.filters.forEach((field) => {
         const key = field.dataset.filter;
         if (!key) {
@@ -253,13 +303,25 @@
       return params;
     }
 
+    renderMessage(className, text) {
+      this.results.innerHTML = "";
+      if (this.results.matches("tbody")) {
+        const row = createElement("tr", "");
+        row.setAttribute("data-empty-row", "");
+        const cell = createElement("td", `${className} text-center py-3`, text);
+        cell.colSpan = parseInt(this.results.closest("table").dataset.emptyColspan || "1", 10) || 1;
+        row.appendChild(cell);
+        this.results.appendChild(row);
+        return;
+      }
+      this.results.appendChild(createElement("div", `${className} p-3`, text));
+    }
+
     showLoadingState() {
       if (!this.results) {
         return;
       }
-      this.results.innerHTML = "";
-      const message = createElement("div", "text-muted small", "Cargando…");
-      this.results.appendChild(message);
+      this.renderMessage("text-muted small", "Cargando…");
       if (this.summary) {
         this.summary.textContent = "Cargando…";
       }
@@ -285,8 +347,14 @@
           throw new Error((data && data.message) || "No se pudo obtener la información");
         }
         this.limit = data.limit || this.limit;
-        this.offset = data.offset || 0;
-        this.total = data.total || 0;
+        if (this.cursorMode) {
+          this.nextCursor = data.next_cursor || null;
+          this.offset = (this.pageCursors.length - 1) * this.limit;
+          this.total = data.total === undefined ? null : data.total;
+        } else {
+          this.offset = data.offset || 0;
+          this.total = data.total || 0;
+        }
         const items = Array.isArray(data.items) ? data.items : [];
         this.renderItems(items);
         this.updateSummary(items);
@@ -303,8 +371,7 @@
       if (!this.results) {
         return;
       }
-      this.results.innerHTML = "";
-      this.results.appendChild(createElement("div", "text-danger small", message));
+      this.renderMessage("text-danger small", message);
       if (this.summary) {
         this.summary.textContent = message;
       }
@@ -314,12 +381,22 @@
       if (!this.results) {
         return;
       }
-      this.results.innerHTML = "";
+      if (this.type === "insumos") {
+        this.renderInsumos(items);
+        return;
+      }
       if (!items.length) {
-        this.results.appendChild(createElement("div", "text-muted small", "Sin resultados para el período seleccionado."));
+        this.renderMessage("text-muted small", "Sin resultados para el período seleccionado.");
         return;
       }
-      const list = createElement("div", "list-group");
+      this.results.innerHTML = "";
+      if (this.type === "evidencias") {
+        const grid = createElement("div", "evidencias-grid");
+        items.forEach((item) => grid.appendChild(this.renderEvidenciaItem(item)));
+        this.results.appendChild(grid);
+        return;
+      }
+      const list = createElement("div", "list-group list-group-flush");
       items.forEach((item) => {
         if (this.type === "actas") {
           list.appendChild(this.renderActaItem(item));
@@ -330,6 +407,78 @@
       this.results.appendChild(list);
     }
 
+    renderInsumos(items) {
+      const table = this.results.closest("table");
+      const canRemove = table && table.dataset.canRemove === "1";
+      this.results.innerHTML = "";
+      items.forEach((item) => {
+        this.results.appendChild(buildAssociationRow(item, canRemove));
+      });
+      ensureEmptyRow(table);
+    }
+
+    renderEvidenciaItem(item) {
+      const card = createElement("article", "evidencia-card");
+      const wrapper = createElement("div", "evidencia-thumb-wrapper");
+      if (item.thumbnail_url) {
+        const image = createElement("img", "evidencia-thumb");
+        image.src = item.thumbnail_url;
+        image.alt = item.filename || "";
+        image.loading = "lazy";
+        wrapper.appendChild(image);
+      } else {
+        const placeholder = createElement("div", "evidencia-placeholder");
+        const extension = (item.mime_type || "").split("/").pop().toUpperCase() || "FILE";
+        placeholder.appendChild(createElement("span", "fw-semibold", extension));
+        wrapper.appendChild(placeholder);
+      }
+      card.appendChild(wrapper);
+
+      const body = createElement("div", "evidencia-body");
+      const name = createElement("div", "evidencia-name", item.filename || "");
+      name.title = item.filename || "";
+      body.appendChild(name);
+      const meta = [item.size_display, item.mime_type, item.fecha_display].filter(Boolean);
+      body.appendChild(createElement("div", "text-muted small", meta.join(" · ")));
+
+      const actions = createElement("div", "d-flex flex-wrap gap-2");
+      const view = createElement("a", "btn btn-sm btn-outline-secondary", "Ver");
+      view.href = item.view_url;
+      view.target = "_blank";
+      view.rel = "noopener";
+      actions.appendChild(view);
+      const download = createElement("a", "btn btn-sm btn-outline-primary", "Descargar");
+      download.href = item.download_url;
+      actions.appendChild(download);
+
+      const form = createElement("form", "");
+      form.method = "post";
+      form.action = item.delete_url;
+      form.addEventListener("submit", (event) => {
+        if (!window.confirm("¿Eliminar adjunto?")) {
+          event.preventDefault();
+        }
+      });
+      [
+        ["csrf_token", getCsrfToken()],
+        ["next", window.location.pathname + window.location.search],
+      ].forEach(([fieldName, value]) => {
+        const input = document.createElement("input");
+        input.type = "hidden";
+        input.name = fieldName;
+        input.value = value;
+        form.appendChild(input);
+      });
+      const remove = createElement("button", "btn btn-sm btn-outline-danger", "Eliminar");
+      remove.type = "submit";
+      form.appendChild(remove);
+      actions.appendChild(form);
+
+      body.appendChild(actions);
+      card.appendChild(body);
+      return card;
+    }
+
     renderHistorialItem(item) {
       const container = createElement("div", "list-group-item");
       const title = createElement("div", "fw-semibold", item.accion || "Registro");
@@ -359,6 +508,10 @@
         labelParts.push(item.fecha_display);
       }
       info.textContent = labelParts.join(" - ") || "Acta";
+      if (item.items_count) {
+        const count = item.items_count === 1 ? "1 ítem" : `${item.items_count} ítems`;
+        info.appendChild(createElement("span", "text-muted small fw-normal ms-2", count));
+      }
       container.appendChild(info);
       if (item.url) {
         const link = createElement("a", "btn btn-sm btn-outline-secondary", "Ver");
@@ -374,6 +527,12 @@
       if (!this.summary) {
         return;
       }
+      if (this.total === null) {
+        this.summary.textContent = items.length
+          ? `Mostrando ${this.offset + 1}–${this.offset + items.length}`
+          : "Sin resultados.";
+        return;
+      }
       if (!this.total) {
         this.summary.textContent = "Sin resultados.";
         return;
@@ -384,8 +543,8 @@
     }
 
     updatePagination() {
-      const hasPrev = this.offset > 0;
-      const hasNext = this.offset + this.limit < this.total;
+      const hasPrev = this.cursorMode ? this.pageCursors.length > 1 : this.offset > 0;
+      const hasNext = this.cursorMode ? Boolean(this.nextCursor) : this.offset + this.limit < this.total;
       if (this.prevButton) {
         this.prevButton.disabled = !hasPrev;
       }
@@ -393,7 +552,7 @@
         this.nextButton.disabled = !hasNext;
       }
       if (this.paginationContainer) {
-        this.paginationContainer.classList.toggle("d-none", !this.total);
+        this.paginationContainer.classList.toggle("d-none", !(this.total || hasPrev || hasNext));
       }
     }
   }
@@ -405,7 +564,6 @@
 
     const table = document.querySelector('[data-insumos-table]');
     if (table) {
-      ensureEmptyRow(table);
       const canRemove = table.dataset.canRemove === '1';
       const removeUrl = table.dataset.removeUrl;
       if (canRemove && removeUrl) {
@@ -438,6 +596,7 @@
             }
             row.remove();
             ensureEmptyRow(table);
+            updateTabCount('insumos', -1);
             showToast((data && data.message) || 'Insumo removido', 'success');
           } catch (error) {
             showToast(error && error.message ? error.message : 'No se pudo remover el insumo', 'danger');
@@ -501,6 +660,7 @@
               throw new Error((data && data.message) || 'No se pudo asociar el insumo');
             }
             appendAssociationRow(table, data.asociacion || {}, table.dataset.canRemove === '1');
+            updateTabCount('insumos', 1);
             showToast((data && data.message) || 'Insumo asociado', 'success');
             if (select.tomselect) {
               select.tomselect.clear();
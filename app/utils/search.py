@@ -1,9 +1,28 @@
 """Helpers for building adaptive text search queries."""
 from __future__ import annotations
 
-from typing import Iterable, Sequence
+import base64
+import binascii
+import json
+import re
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Iterable, Sequence
+from unicodedata import normalize
 
-from sqlalchemy import ColumnElement, func, literal, or_, select
+from sqlalchemy import (
+    ColumnElement,
+    DateTime,
+    String,
+    and_,
+    func,
+    literal,
+    literal_column,
+    or_,
+    select,
+    text,
+    tuple_,
+)
 from sqlalchemy.orm import Query
 
 from app.extensions import db
@@ -50,6 +69,68 @@ def apply_text_search(query: Query, columns: Sequence[ColumnElement[str]], term:
     return query.filter(condition)
 
 
+def normalize_serial(value: str | None) -> str | None:
+    """Return ``value`` lowercased and stripped of accents and separators.
+
+    Used to fill the ``*_norm`` shadow columns so ``"SN-001"`` and
+    ``"sn 001"`` share the same key.
+    """
+
+    if value is None:
+        return None
+    ascii_value = normalize("NFKD", value).encode("ascii", "ignore").decode("ascii")
+    normalized = re.sub(r"[^0-9a-z]+", "", ascii_value.lower())
+    return normalized or None
+
+
+def looks_like_serial(term: str | None) -> bool:
+    """Return ``True`` for single-word terms with digits such as ``HP-0042``."""
+
+    sanitized = (term or "").strip()
+    if len(sanitized) < 3 or any(char.isspace() for char in sanitized):
+        return False
+    return any(char.isdigit() for char in sanitized)
+
+
+def serial_prefix_condition(column: ColumnElement[str], term: str) -> ColumnElement[bool]:
+    """Match normalized ``column`` values starting with ``term``.
+
+    Written as a range instead of ``LIKE 'x%'`` so the btree index on the
+    shadow column is used regardless of the database collation.
+    """
+
+    prefix = normalize_serial(term)
+    if not prefix:
+        raise ValueError("term must contain letters or digits")
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return and_(column >= prefix, column < upper)
+
+
+def build_substring_search(
+    columns: Sequence[ColumnElement[str]],
+    term: str,
+    *,
+    serial_columns: Sequence[ColumnElement[str]] = (),
+) -> ColumnElement[bool]:
+    """Return a ``%term%`` filter over ``columns``.
+
+    PostgreSQL answers the ``ILIKE`` through the ``pg_trgm`` GIN indexes. On
+    other databases serial-like terms also match a prefix of the normalized
+    ``serial_columns``, so ``sn00`` finds ``SN-001``; the substring matches on
+    ``columns`` are kept (models such as ``T480`` live there too).
+    """
+
+    sanitized = (term or "").strip()
+    if not sanitized:
+        raise ValueError("term must be a non-empty string")
+
+    like = f"%{sanitized}%"
+    conditions = [col.ilike(like) for col in columns]
+    if serial_columns and not _is_postgres() and looks_like_serial(sanitized):
+        conditions.extend(serial_prefix_condition(col, sanitized) for col in serial_columns)
+    return or_(*conditions)
+
+
 def paginate_query(query: Query, *, page: int, per_page: int):
     """Paginate ``query`` enforcing sane defaults."""
 
@@ -58,6 +139,290 @@ def paginate_query(query: Query, *, page: int, per_page: int):
     return query.paginate(page=page, per_page=per_page, error_out=False)
 
 
+@dataclass
+class KeysetPage:
+    """One page of a keyset paginated query."""
+
+    items: list[Any]
+    next_cursor: str | None
+    more: bool
+    total: int | None = None
+    prev_cursor: str | None = None
+
+
+def _json_cursor_value(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not a valid cursor value")
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Return an opaque URL-safe cursor for the sort key ``values``."""
+
+    raw = json.dumps(list(values), separators=(",", ":"), default=_json_cursor_value).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str | None) -> list[Any] | None:
+    """Return the values stored in ``cursor`` or ``None`` for the first page.
+
+    Raises :class:`ValueError` when ``cursor`` was not produced by
+    :func:`encode_cursor`.
+    """
+
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw.decode("utf-8"))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise ValueError("invalid cursor") from exc
+    if not isinstance(values, list):
+        raise ValueError("invalid cursor")
+    return values
+
+
+def sqlite_sortable_timestamp(column: ColumnElement[Any]) -> ColumnElement[str]:
+    """Return ``column`` rendered as text in one canonical format (SQLite).
+
+    SQLite stores timestamps as text in more than one format (server
+    defaults have no fraction), so cursors compare this rendering instead.
+    The format is inlined rather than bound so that indexes on the same
+    expression match the queries of :func:`keyset_paginate`.
+    """
+
+    return func.strftime(literal_column("'%Y-%m-%d %H:%M:%f'"), column, type_=String)
+
+
+def _null_safe_sort_key(key: ColumnElement[Any], dialect: str) -> ColumnElement[Any]:
+    # NULLs sort differently per database and break row comparisons.
+    column = getattr(key, "expression", key)
+    column_type = getattr(column, "type", None)
+    if getattr(column, "nullable", False) and isinstance(column_type, String):
+        return func.coalesce(key, literal(""))
+    if dialect == "sqlite" and isinstance(column_type, DateTime):
+        return sqlite_sortable_timestamp(key)
+    return key
+
+
+def _cursor_literal(key: ColumnElement[Any], value: Any) -> ColumnElement[Any]:
+    key_type = getattr(key, "type", None)
+    if isinstance(key_type, DateTime) and isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError as exc:
+            raise ValueError("invalid cursor") from exc
+    return literal(value, type_=key_type)
+
+
+def keyset_paginate(
+    query: Query,
+    sort_keys: Sequence[ColumnElement[Any]],
+    *,
+    after: str | None,
+    per_page: int,
+    with_total: bool = False,
+    descending: bool = False,
+    before: str | None = None,
+    offset: int = 0,
+) -> KeysetPage:
+    """Return the page of ``query`` following the ``after`` cursor.
+
+    ``sort_keys`` replace the ordering of ``query`` and must end with a unique
+    column (usually the primary key). All keys sort ascending, or descending
+    when ``descending`` is set. ``COUNT(*)`` runs only when ``with_total`` is
+    requested.
+
+    ``before`` returns the page preceding that cursor instead (an empty string
+    returns the last page) and ``offset`` skips rows to jump to a numbered
+    page. ``prev_cursor`` is set when rows may precede the returned page.
+    """
+
+    per_page = max(1, min(per_page, 100))
+    dialect = query.session.get_bind().dialect.name
+    keys = [_null_safe_sort_key(key, dialect) for key in sort_keys]
+    backwards = before is not None
+    values = decode_cursor(before if backwards else after)
+    if values is not None and len(values) != len(keys):
+        raise ValueError("invalid cursor")
+
+    total = query.order_by(None).count() if with_total else None
+    # Walking backwards scans in the opposite order and flips the rows.
+    scan_descending = descending != backwards
+    ordering = [key.desc() for key in keys] if scan_descending else keys
+    page_query = query.order_by(None).add_columns(*keys).order_by(*ordering)
+    if values is not None:
+        row = tuple_(*keys)
+        cursor = tuple_(*[_cursor_literal(key, value) for key, value in zip(keys, values)])
+        page_query = page_query.filter(row < cursor if scan_descending else row > cursor)
+    if offset > 0:
+        page_query = page_query.offset(offset)
+    rows = page_query.limit(per_page + 1).all()
+
+    extra = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+    first_cursor = encode_cursor(rows[0][1:]) if rows else None
+    last_cursor = encode_cursor(rows[-1][1:]) if rows else None
+    if backwards:
+        prev_cursor = first_cursor if extra else None
+        next_cursor = last_cursor if values is not None else None
+    else:
+        prev_cursor = first_cursor if values is not None or offset > 0 else None
+        next_cursor = last_cursor if extra else None
+    return KeysetPage(
+        items=[row[0] for row in rows],
+        next_cursor=next_cursor,
+        more=next_cursor is not None,
+        total=total,
+        prev_cursor=prev_cursor,
+    )
+
+
+class KeysetPagination:
+    """Adapter exposing a keyset page through the ``Pagination`` interface
+    used by ``_pagination.html``.
+
+    The ``page`` argument carries either a page number or a token such as
+    ``"3.a.<cursor>"`` (page 3, rows after the cursor) or ``"2.b.<cursor>"``
+    (page 2, rows before it). Previous/next links always carry tokens; only
+    the first and last pages are offered as plain numbers and both are
+    served without ``OFFSET``. Other numbers (old bookmarks) fall back to it.
+    """
+
+    def __init__(self, page: KeysetPage, *, number: int, per_page: int, total: int) -> None:
+        self.items = page.items
+        self.page = number
+        self.per_page = per_page
+        self.total = total
+        pages = max(1, -(-total // per_page))
+        if page.more:
+            pages = max(pages, number + 1)
+        self.pages = max(pages, number)
+        self.has_prev = number > 1
+        self.has_next = page.more
+        if not self.has_prev:
+            self.prev_num = None
+        elif page.prev_cursor:
+            self.prev_num = f"{number - 1}.b.{page.prev_cursor}"
+        else:
+            self.prev_num = number - 1
+        self.next_num = f"{number + 1}.a.{page.next_cursor}" if page.more else None
+
+    def iter_pages(self, **_kwargs):
+        if self.page > 1:
+            yield 1
+        if self.page > 2:
+            yield None
+        yield self.page
+        if self.page < self.pages - 1:
+            yield None
+        if self.page < self.pages:
+            yield self.pages
+
+
+def _parse_page_token(token: str | None) -> tuple[int, str | None, str | None]:
+    """Return ``(page, direction, cursor)`` from a :class:`KeysetPagination` token."""
+
+    raw = (token or "").strip()
+    if raw.isdigit():
+        return max(int(raw), 1), None, None
+    parts = raw.split(".", 2)
+    if len(parts) == 3 and parts[0].isdigit() and parts[1] in {"a", "b"} and parts[2]:
+        return max(int(parts[0]), 1), parts[1], parts[2]
+    return 1, None, None
+
+
+def keyset_pagination(
+    query: Query,
+    sort_keys: Sequence[ColumnElement[Any]],
+    *,
+    page_token: str | None,
+    per_page: int,
+    total: int,
+    descending: bool = False,
+) -> KeysetPagination:
+    """Paginate ``query`` by keyset for templates using ``_pagination.html``.
+
+    ``total`` is supplied by the caller (usually cached) and only drives the
+    page numbers shown. Raises :class:`ValueError` for tampered cursors.
+    """
+
+    per_page = max(1, min(per_page, 100))
+    number, direction, cursor = _parse_page_token(page_token)
+    pages = max(1, -(-total // per_page))
+    size = per_page
+    options: dict[str, Any] = {"after": None}
+    if direction == "a":
+        options["after"] = cursor
+    elif direction == "b":
+        options["before"] = cursor
+    else:
+        number = min(number, pages)
+        if number > 1 and number == pages:
+            # The last page is read backwards from the end, without OFFSET.
+            options["before"] = ""
+            size = total - (pages - 1) * per_page
+        elif number > 1:
+            options["offset"] = (number - 1) * per_page
+    page = keyset_paginate(query, sort_keys, per_page=size, descending=descending, **options)
+    return KeysetPagination(page, number=number, per_page=per_page, total=total)
+
+
+@dataclass(frozen=True)
+class CountEstimate:
+    """Row count shown next to cursor paginated listings.
+
+    ``kind`` is ``"exact"``, ``"capped"`` (there are more than ``value`` rows)
+    or ``"estimated"`` (PostgreSQL planner statistics).
+    """
+
+    value: int
+    kind: str = "exact"
+
+    @property
+    def label(self) -> str:
+        formatted = f"{self.value:,}".replace(",", " ")
+        if self.kind == "capped":
+            return f"{formatted}+"
+        if self.kind == "estimated":
+            return f"≈ {formatted}"
+        return formatted
+
+
+def capped_count(query: Query, cap: int) -> CountEstimate:
+    """Count the rows of ``query`` stopping after ``cap`` of them."""
+
+    limited = query.order_by(None).with_entities(literal(1)).limit(cap + 1).subquery()
+    value = query.session.scalar(select(func.count()).select_from(limited)) or 0
+    if value > cap:
+        return CountEstimate(cap, "capped")
+    return CountEstimate(value)
+
+
+def estimated_table_count(model, cap: int) -> CountEstimate:
+    """Return the size of ``model``'s table without scanning it.
+
+    PostgreSQL reads ``pg_class.reltuples`` (summed over partitions); small
+    tables, tables never analyzed and other databases fall back to
+    :func:`capped_count`.
+    """
+
+    if _is_postgres():
+        estimate = db.session.scalar(
+            text(
+                "SELECT sum(c.reltuples) FROM pg_class c "
+                "WHERE c.reltuples > 0 AND (c.oid = CAST(:name AS regclass) OR c.oid IN "
+                "(SELECT inhrelid FROM pg_inherits WHERE inhparent = CAST(:name AS regclass)))"
+            ),
+            {"name": model.__tablename__},
+        )
+        if estimate and estimate > cap:
+            return CountEstimate(int(estimate), "estimated")
+    return capped_count(model.query, cap)
+
+
 def search_lookup(model, columns: Sequence[ColumnElement[str]], term: str, limit: int = 10):
     """Return a list of model instances matching ``term`` limited to ``limit``."""
 
@@ -70,8 +435,22 @@ def search_lookup(model, columns: Sequence[ColumnElement[str]], term: str, limit
 
 
 __all__ = [
+    "CountEstimate",
+    "KeysetPage",
+    "KeysetPagination",
     "apply_text_search",
+    "build_substring_search",
     "build_text_search",
+    "capped_count",
+    "decode_cursor",
+    "encode_cursor",
+    "estimated_table_count",
+    "keyset_paginate",
+    "keyset_pagination",
+    "looks_like_serial",
+    "normalize_serial",
     "paginate_query",
     "search_lookup",
+    "serial_prefix_condition",
+    "sqlite_sortable_timestamp",
 ]
@@ -1,14 +1,19 @@
-"""Utilidad mínima para generar archivos XLSX sin dependencias externas."""
+"""Utilidad mínima para generar y leer archivos XLSX sin dependencias externas."""
 
 from __future__ import annotations
 
 import itertools
+import re
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from io import BytesIO
-from typing import Iterable
+from typing import IO, Iterable, Iterator
+from xml.etree.ElementTree import iterparse
 from xml.sax.saxutils import escape
-from zipfile import ZIP_DEFLATED, ZipFile
+from zipfile import ZIP_DEFLATED, BadZipFile, ZipFile
+
+_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_CELL_REF = re.compile(r"^([A-Z]+)")
 
 
 def _column_letter(index: int) -> str:
@@ -251,4 +256,86 @@ def _build_sheet(rows: list[list[object]], string_index: dict[str, int]) -> str:
     )
 
 
-__all__ = ["SimpleXLSX"]
+def _column_index(reference: str) -> int:
+    match = _CELL_REF.match(reference or "")
+    if not match:
+        return 0
+    index = 0
+    for letter in match.group(1):
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+
+def _read_shared_strings(archive: ZipFile) -> list[str]:
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return []
+    strings: list[str] = []
+    with archive.open("xl/sharedStrings.xml") as handle:
+        for _event, element in iterparse(handle):
+            if element.tag == f"{_MAIN_NS}si":
+                strings.append("".join(node.text or "" for node in element.iter(f"{_MAIN_NS}t")))
+                element.clear()
+    return strings
+
+
+def _first_sheet(archive: ZipFile) -> str:
+    sheets = sorted(
+        name
+        for name in archive.namelist()
+        if name.startswith("xl/worksheets/") and name.endswith(".xml")
+    )
+    if "xl/worksheets/sheet1.xml" in sheets:
+        return "xl/worksheets/sheet1.xml"
+    if not sheets:
+        raise ValueError("El archivo XLSX no contiene hojas")
+    return sheets[0]
+
+
+def _cell_value(cell, shared_strings: list[str]) -> object:
+    kind = cell.get("t")
+    if kind == "inlineStr":
+        return "".join(node.text or "" for node in cell.iter(f"{_MAIN_NS}t"))
+    raw = cell.findtext(f"{_MAIN_NS}v")
+    if raw is None:
+        return None
+    if kind == "s":
+        return shared_strings[int(raw)]
+    if kind == "b":
+        return raw == "1"
+    if kind in {"str", "e"}:
+        return raw
+    number = float(raw)
+    return int(number) if number.is_integer() else number
+
+
+def iter_xlsx_rows(stream: IO[bytes]) -> Iterator[tuple[int, list[object]]]:
+    """Yield ``(row number, values)`` for the rows of the first sheet of an XLSX file.
+
+    Rows are parsed incrementally; only the shared strings table is kept in
+    memory. Empty cells are returned as ``None``. Writers omit empty rows, so
+    the number comes from the row's ``r`` attribute when present.
+    """
+
+    try:
+        archive = ZipFile(stream)
+    except BadZipFile as exc:
+        raise ValueError("El archivo no es un XLSX válido") from exc
+    with archive:
+        shared_strings = _read_shared_strings(archive)
+        with archive.open(_first_sheet(archive)) as handle:
+            number = 0
+            for _event, element in iterparse(handle):
+                if element.tag != f"{_MAIN_NS}row":
+                    continue
+                reference = element.get("r", "")
+                number = int(reference) if reference.isdigit() else number + 1
+                values: list[object] = []
+                for position, cell in enumerate(element.iter(f"{_MAIN_NS}c")):
+                    column = _column_index(cell.get("r", "")) if cell.get("r") else position
+                    values.extend([None] * (column - len(values)))
+                    values.append(_cell_value(cell, shared_strings))
+                element.clear()
+                yield number, values
+
+
+__all__ = ["SimpleXLSX", "iter_xlsx_rows"]
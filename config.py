@@ -84,6 +84,7 @@ class Config:
     ADJUNTOS_SUBFOLDER: str = os.getenv("ADJUNTOS_SUBFOLDER", "adjuntos")
     DOCSCAN_SUBFOLDER: str = os.getenv("DOCSCAN_SUBFOLDER", "docscan")
     EQUIPOS_SUBFOLDER: str = os.getenv("EQUIPOS_SUBFOLDER", "equipos")
+    QR_SUBFOLDER: str = os.getenv("QR_SUBFOLDER", "qr")
     EQUIPOS_MAX_FILE_SIZE: int = int(os.getenv("EQUIPOS_MAX_FILE_SIZE", 10 * 1024 * 1024))
     MAX_CONTENT_LENGTH: int = int(os.getenv("MAX_CONTENT_LENGTH", 16 * 1024 * 1024))
     ALLOWED_EXTENSIONS: set[str] = set(
@@ -97,6 +98,22 @@ class Config:
 
     DEFAULT_PAGE_SIZE: int = int(os.getenv("DEFAULT_PAGE_SIZE", 25))
     DASHBOARD_CACHE_TIMEOUT: int = int(os.getenv("DASHBOARD_CACHE_TIMEOUT", 300))
+    DASHBOARD_SNAPSHOT_ON_ACCESS: bool = _bool_env("DASHBOARD_SNAPSHOT_ON_ACCESS", True)
+    DASHBOARD_STREAM_INTERVAL: int = int(os.getenv("DASHBOARD_STREAM_INTERVAL", 30))
+    DASHBOARD_STREAM_HEARTBEAT: int = int(os.getenv("DASHBOARD_STREAM_HEARTBEAT", 15))
+    DASHBOARD_STREAM_MAX_AGE: int = int(os.getenv("DASHBOARD_STREAM_MAX_AGE", 300))
+    EQUIPOS_COUNT_CACHE_TIMEOUT: int = int(os.getenv("EQUIPOS_COUNT_CACHE_TIMEOUT", 60))
+    EQUIPOS_IMPORT_BATCH_SIZE: int = int(os.getenv("EQUIPOS_IMPORT_BATCH_SIZE", 500))
+    EQUIPOS_ETIQUETAS_MAX: int = int(os.getenv("EQUIPOS_ETIQUETAS_MAX", 5000))
+    QR_BASE_URL: str | None = os.getenv("QR_BASE_URL")
+    QR_RENDER_PROCESSES: int = int(os.getenv("QR_RENDER_PROCESSES", 0))
+    LICENCIA_STATUS_CACHE_TIMEOUT: int = int(os.getenv("LICENCIA_STATUS_CACHE_TIMEOUT", 300))
+    AUDIT_MODE: str = os.getenv("AUDIT_MODE", "commit")
+    AUDIT_BATCH_SIZE: int = int(os.getenv("AUDIT_BATCH_SIZE", 100))
+    AUDIT_FLUSH_INTERVAL: float = float(os.getenv("AUDIT_FLUSH_INTERVAL", 2.0))
+    AUDIT_ARCHIVE_FOLDER: str = os.getenv(
+        "AUDIT_ARCHIVE_FOLDER", str(BASE_DIR / "instance" / "auditoria")
+    )
 
     WEASYPRINT_BASE_URL: str = os.getenv("WEASYPRINT_BASE_URL", str(BASE_DIR))
 
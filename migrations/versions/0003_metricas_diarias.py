@@ -0,0 +1,46 @@
+"""Add the metricas_diarias rollup table for dashboard deltas and trends."""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003_metricas_diarias"
+down_revision = "0002_expand_modulo_permiso_enum"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "metricas_diarias",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("fecha", sa.Date(), nullable=False),
+        sa.Column(
+            "hospital_id",
+            sa.Integer(),
+            sa.ForeignKey("instituciones.id", ondelete="CASCADE"),
+            nullable=True,
+        ),
+        sa.Column("metrica", sa.String(length=50), nullable=False),
+        sa.Column("clave", sa.String(length=120), nullable=False, server_default=""),
+        sa.Column("valor", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("CURRENT_TIMESTAMP"),
+            nullable=False,
+        ),
+        sa.UniqueConstraint(
+            "fecha", "hospital_id", "metrica", "clave", name="uq_metrica_diaria"
+        ),
+    )
+    op.create_index("ix_metricas_diarias_fecha", "metricas_diarias", ["fecha"])
+    op.create_index(
+        "ix_metricas_diarias_metrica_fecha", "metricas_diarias", ["metrica", "fecha"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_metricas_diarias_metrica_fecha", table_name="metricas_diarias")
+    op.drop_index("ix_metricas_diarias_fecha", table_name="metricas_diarias")
+    op.drop_table("metricas_diarias")
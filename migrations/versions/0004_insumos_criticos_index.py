@@ -0,0 +1,43 @@
+"""Partial index backing the dashboard critical-supplies ranking."""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_insumos_criticos_index"
+down_revision = "0003_metricas_diarias"
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = "ix_insumos_criticos"
+PREDICATE = "stock_minimo > 0 AND stock <= stock_minimo"
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name not in {"postgresql", "sqlite"}:
+        return
+
+    divisor = (
+        "CAST(nullif(stock_minimo, 0) AS NUMERIC)"
+        if bind.dialect.name == "postgresql"
+        else "(nullif(stock_minimo, 0) + 0.0)"
+    )
+    op.create_index(
+        INDEX_NAME,
+        "insumos",
+        [
+            sa.text(f"round((stock * 100.0) / {divisor})"),
+            sa.text("stock_minimo - stock DESC"),
+            "nombre",
+        ],
+        postgresql_where=sa.text(PREDICATE),
+        sqlite_where=sa.text(PREDICATE),
+    )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name not in {"postgresql", "sqlite"}:
+        return
+    op.drop_index(INDEX_NAME, table_name="insumos")
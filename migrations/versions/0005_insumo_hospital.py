@@ -0,0 +1,48 @@
+"""Materialize the hospitals where each insumo has active associations."""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_insumo_hospital"
+down_revision = "0004_insumos_criticos_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "insumo_hospital",
+        sa.Column(
+            "insumo_id",
+            sa.Integer(),
+            sa.ForeignKey("insumos.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column(
+            "hospital_id",
+            sa.Integer(),
+            sa.ForeignKey("instituciones.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("asociaciones", sa.Integer(), nullable=False, server_default=sa.text("0")),
+    )
+    op.create_index("ix_insumo_hospital_hospital_id", "insumo_hospital", ["hospital_id"])
+
+    op.execute(
+        sa.text(
+            """
+            INSERT INTO insumo_hospital (insumo_id, hospital_id, asociaciones)
+            SELECT ei.insumo_id, e.hospital_id, COUNT(ei.id)
+            FROM equipos_insumos ei
+            JOIN equipos e ON e.id = ei.equipo_id
+            WHERE ei.fecha_desasociacion IS NULL
+            GROUP BY ei.insumo_id, e.hospital_id
+            """
+        )
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_insumo_hospital_hospital_id", table_name="insumo_hospital")
+    op.drop_table("insumo_hospital")
@@ -0,0 +1,71 @@
+"""Add the search_documents full-text index used by the global search."""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006_search_documents"
+down_revision = "0005_insumo_hospital"
+branch_labels = None
+depends_on = None
+
+FTS_TABLE = "search_documents_fts"
+
+POSTGRES_DDL = (
+    "ALTER TABLE search_documents ADD COLUMN busqueda tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('spanish', coalesce(contenido, ''))) STORED",
+    "CREATE INDEX ix_search_documents_busqueda ON search_documents USING gin (busqueda)",
+)
+SQLITE_DDL = (
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    "contenido, content='search_documents', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER search_documents_ai AFTER INSERT ON search_documents BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, contenido) VALUES (new.id, new.contenido); END",
+    f"CREATE TRIGGER search_documents_ad AFTER DELETE ON search_documents BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, contenido) "
+    "VALUES ('delete', old.id, old.contenido); END",
+    f"CREATE TRIGGER search_documents_au AFTER UPDATE ON search_documents BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, contenido) "
+    "VALUES ('delete', old.id, old.contenido); "
+    f"INSERT INTO {FTS_TABLE}(rowid, contenido) VALUES (new.id, new.contenido); END",
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "search_documents",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("entidad", sa.String(length=20), nullable=False),
+        sa.Column("entidad_id", sa.Integer(), nullable=False),
+        sa.Column("hospital_id", sa.Integer(), nullable=True),
+        sa.Column("titulo", sa.String(length=255), nullable=False, server_default=""),
+        sa.Column("detalle", sa.String(length=255), nullable=False, server_default=""),
+        sa.Column("url", sa.String(length=255), nullable=False, server_default="#"),
+        sa.Column("contenido", sa.Text(), nullable=False, server_default=""),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("CURRENT_TIMESTAMP"),
+            nullable=False,
+        ),
+        sa.UniqueConstraint("entidad", "entidad_id", name="uq_search_documents_entidad"),
+    )
+    op.create_index("ix_search_documents_hospital_id", "search_documents", ["hospital_id"])
+
+    statements = {"postgresql": POSTGRES_DDL, "sqlite": SQLITE_DDL}.get(
+        op.get_bind().dialect.name, ()
+    )
+    for statement in statements:
+        op.execute(sa.text(statement))
+    # Documents are built by the application (``flask search reindex
+    # --if-empty``, run by the entrypoint after upgrading), not by SQL here.
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "sqlite":
+        for trigger in ("search_documents_ai", "search_documents_ad", "search_documents_au"):
+            op.execute(sa.text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        op.execute(sa.text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+    op.drop_index("ix_search_documents_hospital_id", table_name="search_documents")
+    op.drop_table("search_documents")
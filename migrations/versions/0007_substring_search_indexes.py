@@ -0,0 +1,100 @@
+"""Indexes backing substring searches on equipos, insumos and series.
+
+PostgreSQL gets ``pg_trgm`` GIN indexes so ``ILIKE '%x%'`` filters stop
+scanning the tables. Every dialect gets normalized shadow columns used for
+serial prefix searches where trigram indexes are not available.
+"""
+from __future__ import annotations
+
+import re
+from unicodedata import normalize
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007_substring_search_indexes"
+down_revision = "0006_search_documents"
+branch_labels = None
+depends_on = None
+
+TRIGRAM_INDEXES = (
+    ("ix_equipos_descripcion_trgm", "equipos", "descripcion"),
+    ("ix_equipos_codigo_trgm", "equipos", "codigo"),
+    ("ix_equipos_numero_serie_trgm", "equipos", "numero_serie"),
+    ("ix_equipos_marca_trgm", "equipos", "marca"),
+    ("ix_equipos_modelo_trgm", "equipos", "modelo"),
+    ("ix_insumos_nombre_trgm", "insumos", "nombre"),
+    ("ix_insumos_numero_serie_trgm", "insumos", "numero_serie"),
+    ("ix_insumos_descripcion_trgm", "insumos", "descripcion"),
+    ("ix_insumo_series_nro_serie_trgm", "insumo_series", "nro_serie"),
+)
+
+# (table, source column, shadow column, length)
+SHADOW_COLUMNS = (
+    ("equipos", "numero_serie", "numero_serie_norm", 120),
+    ("equipos", "codigo", "codigo_norm", 50),
+    ("insumos", "numero_serie", "numero_serie_norm", 100),
+    ("insumo_series", "nro_serie", "nro_serie_norm", 128),
+)
+
+BATCH_SIZE = 1000
+
+
+def _normalize_serial(value: str | None) -> str | None:
+    # Frozen copy of ``app.utils.search.normalize_serial``.
+    if value is None:
+        return None
+    ascii_value = normalize("NFKD", value).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^0-9a-z]+", "", ascii_value.lower()) or None
+
+
+def _backfill(bind, table_name: str, source: str, target: str) -> None:
+    table = sa.table(table_name, sa.column("id"), sa.column(source), sa.column(target))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(table.c.id, table.c[source])
+            .where(table.c.id > last_id, table.c[source].isnot(None))
+            .order_by(table.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        bind.execute(
+            table.update()
+            .where(table.c.id == sa.bindparam("row_id"))
+            .values({target: sa.bindparam("valor")}),
+            [{"row_id": row_id, "valor": _normalize_serial(value)} for row_id, value in rows],
+        )
+        last_id = rows[-1][0]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    for table_name, source, target, length in SHADOW_COLUMNS:
+        op.add_column(table_name, sa.Column(target, sa.String(length), nullable=True))
+        _backfill(bind, table_name, source, target)
+        op.create_index(f"ix_{table_name}_{target}", table_name, [target])
+
+    if bind.dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, table_name, column in TRIGRAM_INDEXES:
+        op.create_index(
+            name,
+            table_name,
+            [column],
+            postgresql_using="gin",
+            postgresql_ops={column: "gin_trgm_ops"},
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        for name, table_name, _column in TRIGRAM_INDEXES:
+            op.drop_index(name, table_name=table_name)
+    for table_name, _source, target, _length in SHADOW_COLUMNS:
+        op.drop_index(f"ix_{table_name}_{target}", table_name=table_name)
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.drop_column(target)
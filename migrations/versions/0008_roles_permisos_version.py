@@ -0,0 +1,22 @@
+"""Version counter invalidating compiled role permissions."""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008_roles_permisos_version"
+down_revision = "0007_substring_search_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "roles",
+        sa.Column("permisos_version", sa.Integer(), nullable=False, server_default=sa.text("0")),
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("roles") as batch_op:
+        batch_op.drop_column("permisos_version")
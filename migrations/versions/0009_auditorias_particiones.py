@@ -0,0 +1,126 @@
+"""Composite indexes for the audit page and monthly partitions of auditorias.
+
+Every dialect gets the indexes matching the filters of ``/auditorias``. On
+PostgreSQL the table is rebuilt as ``PARTITION BY RANGE (created_at)`` with
+one partition per month plus a default partition, so old months can be
+archived by detaching them (``flask audit archive``). The primary key of a
+partitioned table must include the partition key, hence ``(id, created_at)``.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009_auditorias_particiones"
+down_revision = "0008_roles_permisos_version"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ("ix_auditorias_created_at", ["created_at"]),
+    ("ix_auditorias_hospital_id_created_at", ["hospital_id", "created_at"]),
+    ("ix_auditorias_usuario_id_created_at", ["usuario_id", "created_at"]),
+    ("ix_auditorias_modulo_accion_created_at", ["modulo", "accion", "created_at"]),
+)
+
+COLUMNS = (
+    "id, usuario_id, hospital_id, modulo, accion, entidad, entidad_id, "
+    "descripcion, cambios, ip_address, created_at"
+)
+
+COLUMN_DDL = """
+    usuario_id integer REFERENCES usuarios (id),
+    hospital_id integer REFERENCES instituciones (id),
+    modulo varchar(50),
+    accion varchar(50) NOT NULL,
+    entidad varchar(50),
+    entidad_id integer,
+    descripcion text,
+    cambios json,
+    ip_address varchar(45),
+    created_at timestamp with time zone NOT NULL DEFAULT CURRENT_TIMESTAMP
+"""
+
+MONTHS_AHEAD = 3
+
+
+def _next_month(value: date) -> date:
+    # Frozen copy of ``app.services.audit_archive_service.next_month``.
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def _create_partition(month: date) -> None:
+    op.execute(
+        f"CREATE TABLE auditorias_{month:%Y_%m} PARTITION OF auditorias "
+        f"FOR VALUES FROM ('{month:%Y-%m-%d} 00:00:00+00') "
+        f"TO ('{_next_month(month):%Y-%m-%d} 00:00:00+00')"
+    )
+
+
+def _partition_postgresql(bind) -> None:
+    op.execute("ALTER TABLE auditorias RENAME TO auditorias_legacy")
+    op.execute("ALTER TABLE auditorias_legacy RENAME CONSTRAINT auditorias_pkey TO auditorias_legacy_pkey")
+    op.execute("ALTER SEQUENCE auditorias_id_seq OWNED BY NONE")
+    op.execute(
+        "CREATE TABLE auditorias ("
+        "id integer NOT NULL DEFAULT nextval('auditorias_id_seq'),"
+        f"{COLUMN_DDL},"
+        "CONSTRAINT auditorias_pkey PRIMARY KEY (id, created_at)"
+        ") PARTITION BY RANGE (created_at)"
+    )
+
+    oldest = bind.execute(sa.text("SELECT min(created_at) FROM auditorias_legacy")).scalar()
+    today = datetime.now(timezone.utc).date()
+    month = date(today.year, today.month, 1)
+    if oldest is not None:
+        oldest = oldest.astimezone(timezone.utc)
+        month = min(month, date(oldest.year, oldest.month, 1))
+    last = date(today.year, today.month, 1)
+    for _ in range(MONTHS_AHEAD):
+        last = _next_month(last)
+    while month <= last:
+        _create_partition(month)
+        month = _next_month(month)
+    op.execute("CREATE TABLE auditorias_default PARTITION OF auditorias DEFAULT")
+
+    op.execute(f"INSERT INTO auditorias ({COLUMNS}) SELECT {COLUMNS} FROM auditorias_legacy")
+    op.execute("DROP TABLE auditorias_legacy")
+    op.execute("ALTER SEQUENCE auditorias_id_seq OWNED BY auditorias.id")
+
+
+def _unpartition_postgresql() -> None:
+    op.execute("ALTER TABLE auditorias RENAME TO auditorias_particionada")
+    op.execute(
+        "ALTER TABLE auditorias_particionada RENAME CONSTRAINT auditorias_pkey "
+        "TO auditorias_particionada_pkey"
+    )
+    op.execute("ALTER SEQUENCE auditorias_id_seq OWNED BY NONE")
+    op.execute(
+        "CREATE TABLE auditorias ("
+        "id integer NOT NULL DEFAULT nextval('auditorias_id_seq'),"
+        f"{COLUMN_DDL},"
+        "CONSTRAINT auditorias_pkey PRIMARY KEY (id)"
+        ")"
+    )
+    op.execute(f"INSERT INTO auditorias ({COLUMNS}) SELECT {COLUMNS} FROM auditorias_particionada")
+    op.execute("DROP TABLE auditorias_particionada CASCADE")
+    op.execute("ALTER SEQUENCE auditorias_id_seq OWNED BY auditorias.id")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        _partition_postgresql(bind)
+    # On a partitioned table the indexes cascade to every partition.
+    for name, columns in INDEXES:
+        op.create_index(name, "auditorias", columns)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    for name, _columns in INDEXES:
+        op.drop_index(name, table_name="auditorias")
+    if bind.dialect.name == "postgresql":
+        _unpartition_postgresql()
@@ -0,0 +1,17 @@
+"""Index backing the keyset pagination of the equipment listing."""
+from __future__ import annotations
+
+from alembic import op
+
+revision = "0010_equipos_created_at_index"
+down_revision = "0009_auditorias_particiones"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_equipos_created_at_id", "equipos", ["created_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_equipos_created_at_id", table_name="equipos")
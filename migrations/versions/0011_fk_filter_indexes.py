@@ -0,0 +1,42 @@
+"""Indexes on foreign keys and filter columns used by the listings.
+
+Composite indexes follow the query shapes of the routes: equipment listed
+per hospital or estado newest first, history and stock movements per parent
+ordered by date, documents per hospital ordered by upload time.
+``auditorias.created_at`` is already indexed by migration 0009.
+"""
+from __future__ import annotations
+
+from alembic import op
+
+revision = "0011_fk_filter_indexes"
+down_revision = "0010_equipos_created_at_index"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ("ix_equipos_hospital_id_created_at", "equipos", ["hospital_id", "created_at"]),
+    ("ix_equipos_estado_created_at", "equipos", ["estado", "created_at"]),
+    ("ix_equipos_tipo_id", "equipos", ["tipo_id"]),
+    ("ix_equipos_servicio_id", "equipos", ["servicio_id"]),
+    ("ix_equipos_oficina_id", "equipos", ["oficina_id"]),
+    ("ix_acta_items_acta_id", "acta_items", ["acta_id"]),
+    ("ix_acta_items_equipo_id", "acta_items", ["equipo_id"]),
+    ("ix_equipos_historial_equipo_id_fecha", "equipos_historial", ["equipo_id", "fecha"]),
+    ("ix_insumo_movimientos_insumo_id_fecha", "insumo_movimientos", ["insumo_id", "fecha"]),
+    ("ix_docscan_uploaded_at", "docscan", ["uploaded_at"]),
+    ("ix_docscan_hospital_id_uploaded_at", "docscan", ["hospital_id", "uploaded_at"]),
+    ("ix_adjuntos_equipo_id", "adjuntos", ["equipo_id"]),
+    ("ix_adjuntos_uploaded_at", "adjuntos", ["uploaded_at"]),
+    ("ix_vlan_dispositivos_vlan_id", "vlan_dispositivos", ["vlan_id"]),
+)
+
+
+def upgrade() -> None:
+    for name, table_name, columns in INDEXES:
+        op.create_index(name, table_name, columns)
+
+
+def downgrade() -> None:
+    for name, table_name, _columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table_name)
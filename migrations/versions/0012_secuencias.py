@@ -0,0 +1,32 @@
+"""Counters table backing the internal equipment serials.
+
+Rows are created on first use of each prefix; the counter of a day that
+already has serials is seeded from the existing ``numero_serie`` values.
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0012_secuencias"
+down_revision = "0011_fk_filter_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "secuencias",
+        sa.Column("clave", sa.String(length=60), primary_key=True),
+        sa.Column("valor", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.current_timestamp(),
+            nullable=False,
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("secuencias")
@@ -0,0 +1,32 @@
+"""Cursor index for the equipment history feed.
+
+Replaces ``(equipo_id, fecha)`` with ``(equipo_id, fecha DESC, id DESC)``
+so on PostgreSQL the history of one equipo is read newest first straight
+from the index, with ``id`` breaking ties between events of the same
+timestamp. SQLite sorts on another expression; see migration 0016.
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0013_historial_cursor_index"
+down_revision = "0012_secuencias"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_equipos_historial_equipo_id_fecha_id",
+        "equipos_historial",
+        ["equipo_id", sa.text("fecha DESC"), sa.text("id DESC")],
+    )
+    op.drop_index("ix_equipos_historial_equipo_id_fecha", table_name="equipos_historial")
+
+
+def downgrade() -> None:
+    op.create_index(
+        "ix_equipos_historial_equipo_id_fecha", "equipos_historial", ["equipo_id", "fecha"]
+    )
+    op.drop_index("ix_equipos_historial_equipo_id_fecha_id", table_name="equipos_historial")
@@ -0,0 +1,23 @@
+"""Composite index for the actas of an equipo.
+
+``(equipo_id, acta_id)`` answers "which actas include this equipo" from the
+index alone and replaces the single-column ``equipo_id`` index of 0011.
+"""
+from __future__ import annotations
+
+from alembic import op
+
+revision = "0014_acta_items_equipo_acta"
+down_revision = "0013_historial_cursor_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_acta_items_equipo_id_acta_id", "acta_items", ["equipo_id", "acta_id"])
+    op.drop_index("ix_acta_items_equipo_id", table_name="acta_items")
+
+
+def downgrade() -> None:
+    op.create_index("ix_acta_items_equipo_id", "acta_items", ["equipo_id"])
+    op.drop_index("ix_acta_items_equipo_id_acta_id", table_name="acta_items")
@@ -0,0 +1,47 @@
+"""Unique global rows in metricas_diarias.
+
+``uq_metrica_diaria`` includes the nullable ``hospital_id`` and NULLs are
+distinct in unique constraints, so nothing stopped two workers from storing
+the global totals of the same day twice. A partial unique index covers the
+``hospital_id IS NULL`` rows; existing duplicates are removed first.
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0015_metricas_globales_unicas"
+down_revision = "0014_acta_items_equipo_acta"
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = "uq_metricas_diarias_global"
+PREDICATE = "hospital_id IS NULL"
+
+
+def upgrade() -> None:
+    op.execute(
+        sa.text(
+            """
+            DELETE FROM metricas_diarias
+            WHERE hospital_id IS NULL
+              AND id NOT IN (
+                SELECT MIN(id) FROM metricas_diarias
+                WHERE hospital_id IS NULL
+                GROUP BY fecha, metrica, clave
+              )
+            """
+        )
+    )
+    op.create_index(
+        INDEX_NAME,
+        "metricas_diarias",
+        ["fecha", "metrica", "clave"],
+        unique=True,
+        postgresql_where=sa.text(PREDICATE),
+        sqlite_where=sa.text(PREDICATE),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(INDEX_NAME, table_name="metricas_diarias")
@@ -0,0 +1,45 @@
+"""Cursor index for the equipment history feed on SQLite.
+
+On SQLite ``keyset_paginate`` sorts and compares ``fecha`` through
+``strftime`` (timestamps are stored as text in more than one format), which
+the plain ``(equipo_id, fecha DESC, id DESC)`` index of migration 0013
+cannot serve: pages were sorted in a temporary B-tree. The index is rebuilt
+on the same expression there. PostgreSQL keeps the 0013 index.
+"""
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0016_historial_cursor_sqlite"
+down_revision = "0015_metricas_globales_unicas"
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = "ix_equipos_historial_equipo_id_fecha_id"
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    op.drop_index(INDEX_NAME, table_name="equipos_historial")
+    op.create_index(
+        INDEX_NAME,
+        "equipos_historial",
+        [
+            "equipo_id",
+            sa.text("strftime('%Y-%m-%d %H:%M:%f', fecha) DESC"),
+            sa.text("id DESC"),
+        ],
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    op.drop_index(INDEX_NAME, table_name="equipos_historial")
+    op.create_index(
+        INDEX_NAME,
+        "equipos_historial",
+        ["equipo_id", sa.text("fecha DESC"), sa.text("id DESC")],
+    )
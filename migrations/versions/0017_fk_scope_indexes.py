@@ -0,0 +1,34 @@
+"""Indexes on the hospital and role foreign keys the app filters by.
+
+Follow-up to 0011: offices per hospital (import catalogues), permissions per
+role (principal compilation), and users, licencias, actas and VLAN devices
+per hospital scope (dashboard, listings and reports). The remaining
+unindexed foreign keys are listed in ``index_audit_service.ALLOWED_UNINDEXED``.
+"""
+from __future__ import annotations
+
+from alembic import op
+
+revision = "0017_fk_scope_indexes"
+down_revision = "0016_historial_cursor_sqlite"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ("ix_oficinas_institucion_id", "oficinas", ["institucion_id"]),
+    ("ix_permisos_rol_id", "permisos", ["rol_id"]),
+    ("ix_usuarios_hospital_id", "usuarios", ["hospital_id"]),
+    ("ix_licencias_hospital_id", "licencias", ["hospital_id"]),
+    ("ix_actas_hospital_id", "actas", ["hospital_id"]),
+    ("ix_vlan_dispositivos_hospital_id", "vlan_dispositivos", ["hospital_id"]),
+)
+
+
+def upgrade() -> None:
+    for name, table_name, columns in INDEXES:
+        op.create_index(name, table_name, columns)
+
+
+def downgrade() -> None:
+    for name, table_name, _columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table_name)
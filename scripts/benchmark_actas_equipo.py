@@ -0,0 +1,193 @@
+"""Compara la consulta de actas por equipo: JOIN+DISTINCT+COUNT contra el índice.
+
+Crea una base con ``--actas`` actas y ``--items`` ítems repartidos entre
+``--equipos`` equipos (unos pocos concentran muchas actas, como los equipos
+con años de préstamos) y mide la primera página y las siguientes de ambas
+consultas para una muestra de equipos. La consulta nueva es
+``acta_service.actas_de_equipo``, que pagina por cursor sobre el índice
+``acta_items(equipo_id, acta_id)``.
+
+Uso::
+
+    python scripts/benchmark_actas_equipo.py
+    python scripts/benchmark_actas_equipo.py --database postgresql+psycopg2://...
+
+Sin ``--database`` se usa un archivo SQLite temporal. La base indicada debe
+estar vacía: el script crea las tablas y las elimina al terminar.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import func, insert, select, text  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models import Acta, ActaItem, Equipo, Hospital, TipoActa, TipoEquipo  # noqa: E402
+from app.services.acta_service import actas_de_equipo  # noqa: E402
+from config import Config  # noqa: E402
+
+BATCH_SIZE = 10_000
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", help="URI de SQLAlchemy (por defecto SQLite temporal).")
+    parser.add_argument("--actas", type=int, default=100_000)
+    parser.add_argument("--items", type=int, default=500_000)
+    parser.add_argument("--equipos", type=int, default=5_000)
+    parser.add_argument("--muestras", type=int, default=30, help="Equipos consultados por estrategia.")
+    parser.add_argument("--paginas", type=int, default=3, help="Páginas recorridas por equipo.")
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args(argv)
+
+
+def _insert_batches(table, rows) -> None:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            db.session.execute(insert(table), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(table), batch)
+    db.session.commit()
+
+
+def populate(args: argparse.Namespace, rng: random.Random) -> list[int]:
+    hospital = Hospital(nombre="Hospital Benchmark", tipo_institucion="Hospital", localidad="Santa Rosa")
+    tipo = TipoEquipo(nombre="Benchmark")
+    db.session.add_all([hospital, tipo])
+    db.session.commit()
+
+    _insert_batches(
+        Equipo.__table__,
+        ({"tipo_id": tipo.id, "hospital_id": hospital.id} for _ in range(args.equipos)),
+    )
+    equipo_ids = db.session.scalars(select(Equipo.id).order_by(Equipo.id)).all()
+
+    inicio = datetime(2015, 1, 1)
+    tipos = list(TipoActa)
+    _insert_batches(
+        Acta.__table__,
+        (
+            {
+                "tipo": tipos[numero % len(tipos)],
+                "fecha": inicio + timedelta(minutes=rng.randrange(5_000_000)),
+            }
+            for numero in range(args.actas)
+        ),
+    )
+    primera_acta = db.session.scalar(select(Acta.id).order_by(Acta.id)) or 1
+
+    # Pareto weights: a few equipos take part in thousands of actas.
+    pesos = [rng.paretovariate(1.2) for _ in equipo_ids]
+    _insert_batches(
+        ActaItem.__table__,
+        (
+            {
+                "acta_id": primera_acta + numero % args.actas,
+                "equipo_id": equipo_id,
+                "cantidad": 1,
+            }
+            for numero, equipo_id in enumerate(
+                rng.choices(equipo_ids, weights=pesos, k=args.items)
+            )
+        ),
+    )
+    return equipo_ids
+
+
+def legacy_pages(equipo_id: int, per_page: int, paginas: int) -> None:
+    query = (
+        Acta.query.join(Acta.items)
+        .filter(ActaItem.equipo_id == equipo_id)
+        .order_by(Acta.fecha.desc())
+        .distinct()
+    )
+    for page in range(1, paginas + 1):
+        query.paginate(page=page, per_page=per_page, error_out=False)
+
+
+def indexed_pages(equipo_id: int, per_page: int, paginas: int) -> None:
+    cursor = None
+    for _ in range(paginas):
+        page = actas_de_equipo(equipo_id, after=cursor, per_page=per_page)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+
+def measure(strategy: Callable[[int, int, int], None], equipos: list[int], args) -> list[float]:
+    timings = []
+    for equipo_id in equipos:
+        started = time.perf_counter()
+        strategy(equipo_id, args.per_page, args.paginas)
+        timings.append((time.perf_counter() - started) * 1000)
+        db.session.expunge_all()
+    return timings
+
+
+def report(nombre: str, timings: list[float]) -> None:
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(
+        f"{nombre:<22} mediana {statistics.median(ordered):8.2f} ms   "
+        f"p95 {p95:8.2f} ms   máx {ordered[-1]:8.2f} ms"
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = args.database or f"sqlite:///{Path(tmp) / 'benchmark.db'}"
+        config = type(
+            "BenchmarkConfig",
+            (Config,),
+            {"SQLALCHEMY_DATABASE_URI": uri, "TESTING": True, "SQLALCHEMY_ECHO": False},
+        )
+        app = create_app(config)
+        with app.app_context():
+            db.create_all()
+            try:
+                started = time.perf_counter()
+                equipo_ids = populate(args, rng)
+                print(
+                    f"Datos: {args.actas} actas, {args.items} ítems, {len(equipo_ids)} equipos "
+                    f"({time.perf_counter() - started:.1f} s)"
+                )
+                if db.engine.dialect.name == "postgresql":
+                    db.session.execute(text("ANALYZE actas"))
+                    db.session.execute(text("ANALYZE acta_items"))
+                    db.session.commit()
+
+                busiest = db.session.scalars(
+                    select(ActaItem.equipo_id)
+                    .group_by(ActaItem.equipo_id)
+                    .order_by(func.count().desc())
+                    .limit(args.muestras // 2)
+                ).all()
+                muestra = busiest + rng.sample(equipo_ids, args.muestras - len(busiest))
+                print(f"{args.paginas} páginas de {args.per_page} actas para {len(muestra)} equipos:")
+                report("JOIN+DISTINCT+COUNT", measure(legacy_pages, muestra, args))
+                report("Índice + cursor", measure(indexed_pages, muestra, args))
+            finally:
+                db.session.rollback()
+                db.drop_all()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
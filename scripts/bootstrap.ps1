@@ -462,6 +462,12 @@ function Ensure-Migrations {
     if ($LASTEXITCODE -ne 0) {
         throw 'La aplicación de migraciones falló.'
     }
+
+    Write-Info 'Indexando la búsqueda global si está vacía (flask search reindex --if-empty)...'
+    & $VenvPython -m flask search reindex --if-empty
+    if ($LASTEXITCODE -ne 0) {
+        throw 'La indexación de la búsqueda falló.'
+    }
 }
 
 function Run-Seed {
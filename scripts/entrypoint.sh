@@ -6,5 +6,8 @@ export FLASK_APP="${FLASK_APP:-wsgi.py}"
 python /app/scripts/wait_for_db.py
 
 flask db upgrade
+# Fills search_documents the first time (migration 0006 creates it empty).
+flask search reindex --if-empty
 
-exec gunicorn --bind 0.0.0.0:5000 --workers "${GUNICORN_WORKERS:-4}" wsgi:app
+exec gunicorn --bind 0.0.0.0:5000 --workers "${GUNICORN_WORKERS:-4}" \
+    --worker-class gthread --threads "${GUNICORN_THREADS:-32}" wsgi:app
@@ -1,6 +1,7 @@
 """Shared fixtures for the test suite."""
 from __future__ import annotations
 
+from contextlib import contextmanager
 from datetime import date, timedelta
 from pathlib import Path
 import sys
@@ -10,6 +11,7 @@ if str(PROJECT_ROOT) not in sys.path:  # pragma: no cover - test helper
     sys.path.insert(0, str(PROJECT_ROOT))
 
 import pytest
+from sqlalchemy import event, text
 
 from app import create_app
 from app.extensions import db
@@ -411,6 +413,67 @@ def data(app):
         }
 
 
+@pytest.fixture()
+def explain(app):
+    """Return a helper rendering the query plan of a statement.
+
+    Accepts a SQLAlchemy statement, compiled with its values inlined, or the
+    SQL text and parameters of a statement captured with
+    :func:`capture_statements`, planned exactly as the app sent it.
+    """
+
+    def _explain(statement, parameters=()) -> str:
+        bind = db.session.get_bind()
+        prefix = "EXPLAIN QUERY PLAN" if bind.dialect.name == "sqlite" else "EXPLAIN"
+        if isinstance(statement, str):
+            cursor = db.session.connection().exec_driver_sql(f"{prefix} {statement}", parameters)
+            rows = cursor.all()
+        else:
+            sql = statement.compile(dialect=bind.dialect, compile_kwargs={"literal_binds": True})
+            rows = db.session.execute(text(f"{prefix} {sql}")).all()
+        return "\n".join(str(row[-1]) for row in rows)
+
+    return _explain
+
+
+class StatementLog(list):
+    """SQL texts run inside :func:`capture_statements`, with their parameters."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.parameters: list[object] = []
+
+    def matching(self, fragment: str) -> list[tuple[str, object]]:
+        """Return ``(sql, parameters)`` of the statements containing ``fragment``."""
+
+        return [
+            (statement, parameters)
+            for statement, parameters in zip(self, self.parameters)
+            if fragment in statement
+        ]
+
+
+@pytest.fixture()
+def capture_statements(app):
+    """Return a context manager collecting the SQL statements run inside it."""
+
+    @contextmanager
+    def _capture():
+        log = StatementLog()
+
+        def _before_execute(conn, cursor, statement, parameters, context, executemany):
+            log.append(statement)
+            log.parameters.append(parameters)
+
+        event.listen(db.engine, "before_cursor_execute", _before_execute)
+        try:
+            yield log
+        finally:
+            event.remove(db.engine, "before_cursor_execute", _before_execute)
+
+    return _capture
+
+
 @pytest.fixture()
 def superadmin_credentials():
     return {"username": "superadmin", "password": DEFAULT_PASSWORD}
@@ -1,3 +1,9 @@
+from sqlalchemy import select
+
+from app.extensions import db
+from app.models import Usuario
+
+
 def login(client, username: str, password: str) -> None:
     client.post(
         "/auth/login",
@@ -104,3 +110,68 @@ def test_search_equipos_allows_hospital_filter(client, superadmin_credentials, d
     secondary_payload = resp_secondary.get_json()
     assert secondary_payload["results"]
     assert all("IMP-002" in item["text"] for item in secondary_payload["results"])
+
+
+def test_search_equipos_finds_serial_like_model(client, superadmin_credentials, data):
+    from app.models import Equipo
+
+    equipo = db.session.get(Equipo, data["equipo"].id)
+    equipo.modelo = "ThinkPad T480"
+    db.session.commit()
+
+    login(client, **superadmin_credentials)
+    resp = client.get("/api/equipos/search?q=T480")
+    assert resp.status_code == 200
+    results = resp.get_json()["results"]
+    assert [int(item["id"]) for item in results] == [equipo.id]
+    assert "T480" in results[0]["text"]
+
+
+def _walk_cursor(client, url: str) -> list[dict]:
+    results: list[dict] = []
+    after = ""
+    while True:
+        resp = client.get(f"{url}&after={after}")
+        assert resp.status_code == 200
+        payload = resp.get_json()
+        assert "total" not in payload
+        results.extend(payload["results"])
+        if not payload["more"]:
+            assert payload["next_cursor"] is None
+            return results
+        after = payload["next_cursor"]
+
+
+def test_search_equipos_cursor_pages_match_offset_order(
+    client, superadmin_credentials, capture_statements
+):
+    login(client, **superadmin_credentials)
+    expected = client.get("/api/equipos/search?q=&per_page=50").get_json()["results"]
+
+    with capture_statements() as statements:
+        results = _walk_cursor(client, "/api/equipos/search?q=&per_page=1")
+
+    assert [item["id"] for item in results] == [item["id"] for item in expected]
+    assert len(results) == 3
+    assert not any("count(" in statement.lower() for statement in statements)
+
+
+def test_search_cursor_total_on_request_and_invalid_cursor(client, admin_credentials):
+    login(client, **admin_credentials)
+    resp = client.get("/api/search/hospitales?q=Hospital&per_page=1&after=&with_total=1")
+    payload = resp.get_json()
+    assert payload["total"] == 2
+    assert payload["more"] is True
+    assert payload["results"][0]["label"].startswith("Hospital Central")
+
+    resp = client.get("/api/search/hospitales?q=Hospital&after=no-es-un-cursor")
+    assert resp.status_code == 400
+
+
+def test_live_search_cursor_pagination(client, superadmin_credentials):
+    login(client, **superadmin_credentials)
+    expected = db.session.scalars(
+        select(Usuario.id).order_by(Usuario.nombre, Usuario.id)
+    ).all()
+    results = _walk_cursor(client, "/api/search/usuarios?q=&per_page=2")
+    assert [item["id"] for item in results] == expected
@@ -1,8 +1,22 @@
 """Audit logging tests."""
 from __future__ import annotations
 
+import gzip
+import json
+import re
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event, select
+
+from app.extensions import db
 from app.models import Auditoria
-from app.services.audit_service import log_action
+from app.routes import auditoria as auditoria_routes
+from app.services.audit_service import (
+    BUFFER_EXTENSION_KEY,
+    AuditBuffer,
+    commit_pending_entries,
+    log_action,
+)
 
 
 def test_log_action_crea_registro(app, data):
@@ -19,3 +33,184 @@ def test_log_action_crea_registro(app, data):
         stored = Auditoria.query.get(entry.id)
         assert stored is not None
         assert stored.accion == "prueba"
+
+
+def login(client, username: str, password: str):
+    return client.post(
+        "/auth/login",
+        data={"username": username, "password": password},
+        follow_redirects=False,
+    )
+
+
+def _count_commits(app, action) -> int:
+    commits: list[object] = []
+
+    def _on_commit(conn):
+        commits.append(conn)
+
+    event.listen(db.engine, "commit", _on_commit)
+    try:
+        with app.app_context():
+            action()
+    finally:
+        event.remove(db.engine, "commit", _on_commit)
+    return len(commits)
+
+
+def test_log_action_transaction_joins_caller_commit(app, data):
+    app.config["AUDIT_MODE"] = "transaction"
+    with app.app_context():
+        log_action(usuario_id=data["superadmin"].id, accion="descartada", modulo="tests")
+        db.session.rollback()
+        log_action(usuario_id=data["superadmin"].id, accion="confirmada", modulo="tests")
+        db.session.commit()
+        acciones = {entry.accion for entry in Auditoria.query.filter_by(modulo="tests")}
+    assert acciones == {"confirmada"}
+
+
+def test_login_commits_once_in_transaction_mode(app, client, admin_credentials):
+    app.config["AUDIT_MODE"] = "transaction"
+    assert _count_commits(app, lambda: login(client, **admin_credentials)) == 1
+    # Logout logs after its last write; the after_request hook stores it.
+    assert _count_commits(app, lambda: client.get("/auth/logout")) == 1
+    acciones = [
+        entry.accion for entry in Auditoria.query.filter_by(modulo="auth").order_by(Auditoria.id)
+    ]
+    assert acciones == ["login", "logout"]
+
+
+def test_pending_entries_leave_other_changes_uncommitted(app, data):
+    from app.models import Equipo
+
+    app.config["AUDIT_MODE"] = "transaction"
+    equipo_id = data["equipo"].id
+    with app.test_request_context("/"):
+        equipo = db.session.get(Equipo, equipo_id)
+        original = equipo.descripcion
+        equipo.descripcion = "Cambio sin confirmar"
+        log_action(usuario_id=data["superadmin"].id, accion="solo-auditoria", modulo="tests")
+        commit_pending_entries(None)
+        db.session.rollback()
+
+        assert db.session.get(Equipo, equipo_id).descripcion == original
+        assert Auditoria.query.filter_by(accion="solo-auditoria").count() == 1
+
+
+def test_log_action_async_bulk_inserts_batches(app, data):
+    app.config["AUDIT_MODE"] = "async"
+    buffer = AuditBuffer(app, batch_size=2, interval=60)
+    app.extensions[BUFFER_EXTENSION_KEY] = buffer
+    with app.app_context():
+        for numero in range(5):
+            entry = log_action(
+                usuario_id=data["superadmin"].id,
+                accion="async",
+                modulo="tests",
+                registro_id=numero,
+            )
+            assert entry.id is None
+        # Worker shutdown stops the flusher and drains the queue.
+        buffer.close()
+        assert buffer.pending() == 0
+        stored = Auditoria.query.filter_by(accion="async").order_by(Auditoria.entidad_id).all()
+    assert [entry.entidad_id for entry in stored] == [0, 1, 2, 3, 4]
+    assert all(entry.created_at is not None for entry in stored)
+
+
+def test_audit_filters_use_composite_indexes(app, data, explain):
+    stmt = (
+        select(Auditoria.id)
+        .where(Auditoria.modulo == "auth", Auditoria.accion == "login")
+        .order_by(Auditoria.created_at.desc())
+    )
+    assert "ix_auditorias_modulo_accion_created_at" in explain(stmt)
+
+
+def test_audit_archive_exports_and_deletes_old_rows(app, data, tmp_path):
+    usuario_id = data["superadmin"].id
+    for accion, created_at in (
+        ("vieja", datetime(2024, 3, 31, 23, 59, tzinfo=timezone.utc)),
+        ("vieja", datetime(2024, 1, 10, tzinfo=timezone.utc)),
+        ("nueva", datetime(2024, 4, 1, tzinfo=timezone.utc)),
+    ):
+        db.session.add(Auditoria(usuario_id=usuario_id, accion=accion, created_at=created_at))
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(
+        args=["audit", "archive", "--before", "2024-04", "--output", str(tmp_path), "--batch-size", "1"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "2 registros" in result.output
+    with gzip.open(tmp_path / "auditorias_antes_2024_04.jsonl.gz", "rt", encoding="utf-8") as handle:
+        exported = [json.loads(line) for line in handle]
+    assert [row["accion"] for row in exported] == ["vieja", "vieja"]
+    assert exported[0]["usuario_id"] == usuario_id
+    assert {entry.accion for entry in Auditoria.query.all()} == {"nueva"}
+
+
+def test_audit_archive_rejects_invalid_month(app):
+    result = app.test_cli_runner().invoke(args=["audit", "archive", "--before", "2024-13"])
+    assert result.exit_code != 0
+    assert "AAAA-MM" in result.output
+
+
+def _seed_entries(usuario_id: int, count: int) -> None:
+    base = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    for numero in range(count):
+        db.session.add(
+            Auditoria(
+                usuario_id=usuario_id,
+                accion="navegar",
+                modulo="tests",
+                entidad="tests",
+                entidad_id=numero + 1,
+                # Pairs share a timestamp so the id breaks the tie.
+                created_at=base + timedelta(minutes=numero // 2),
+            )
+        )
+    db.session.commit()
+
+
+def test_audit_index_walks_pages_with_cursor(app, client, data, superadmin_credentials):
+    _seed_entries(data["superadmin"].id, 5)
+    login(client, **superadmin_credentials)
+
+    seen: list[str] = []
+    url = "/auditorias/?modulo=tests&per_page=2"
+    while url:
+        resp = client.get(url)
+        assert resp.status_code == 200
+        html = resp.get_data(as_text=True)
+        assert "5 registros" in html
+        seen.extend(re.findall(r"tests #(\d+)", html))
+        match = re.search(r'href="([^"]*after=[^"]*)"', html)
+        url = match.group(1).replace("&amp;", "&") if match else None
+
+    assert seen == ["5", "4", "3", "2", "1"]
+
+
+def test_audit_index_caps_filtered_total(app, client, data, superadmin_credentials, monkeypatch):
+    monkeypatch.setattr(auditoria_routes, "COUNT_CAP", 3)
+    _seed_entries(data["superadmin"].id, 5)
+    login(client, **superadmin_credentials)
+
+    resp = client.get("/auditorias/?modulo=tests")
+
+    assert "3+ registros" in resp.get_data(as_text=True)
+
+
+def test_audit_index_rejects_invalid_cursor(client, superadmin_credentials):
+    login(client, **superadmin_credentials)
+    assert client.get("/auditorias/?after=no-es-un-cursor").status_code == 400
+
+
+def test_audit_index_does_not_load_every_user(app, client, data, superadmin_credentials):
+    login(client, **superadmin_credentials)
+    resp = client.get(f"/auditorias/?usuario_id={data['admin'].id}")
+    html = resp.get_data(as_text=True)
+
+    assert "/api/search/usuarios" in html
+    assert f'<option value="{data["admin"].id}" selected>' in html
+    assert f'<option value="{data["gestor"].id}"' not in html
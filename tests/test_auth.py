@@ -63,3 +63,22 @@ def test_users_can_access_dashboard(client, username):
     login(client, username=username, password="Cambiar123!")
     resp = client.get("/")
     assert resp.status_code == 200
+
+
+def test_authenticated_request_statement_budget(app, client, admin_credentials, capture_statements):
+    login(client, **admin_credentials)
+
+    def get_perfil() -> list[str]:
+        with capture_statements() as statements:
+            # A fresh app context gives the request its own ``g`` and session,
+            # as in production, instead of reusing the fixture's.
+            with app.app_context():
+                assert client.get("/perfil").status_code == 200
+        return statements
+
+    # Cold: the user with role, permisos and assignments plus the license status.
+    assert len(get_perfil()) == 2
+    # Warm: only the user row; principal and license status come from caches.
+    warm = get_perfil()
+    assert len(warm) == 1
+    assert "FROM usuarios" in warm[0]
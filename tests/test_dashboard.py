@@ -0,0 +1,242 @@
+"""Tests for dashboard metrics aggregation and caching."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models import Equipo, EstadoEquipo, Hospital, Insumo, MetricaDiaria, TipoEquipo, Usuario
+from app.services.dashboard_service import collect_dashboard_metrics, get_metrics_cache
+from app.services.dashboard_stream_service import (
+    DashboardBroadcaster,
+    ScopeProducer,
+    stream_scope_events,
+)
+from app.services.metricas_service import ensure_daily_snapshot, take_snapshot
+from app.utils.scope import get_user_hospital_scope
+
+
+def login(client, username: str, password: str) -> None:
+    client.post(
+        "/auth/login",
+        data={"username": username, "password": password},
+        follow_redirects=False,
+    )
+
+
+def _kpi(payload: dict, key: str) -> dict:
+    return next(item for item in payload["kpis"] if item["key"] == key)
+
+
+def test_dashboard_metrics_are_cached_per_scope(app, data, capture_statements):
+    superadmin = db.session.get(Usuario, data["superadmin"].id)
+    first = collect_dashboard_metrics(superadmin)
+
+    with capture_statements() as statements:
+        second = collect_dashboard_metrics(superadmin)
+
+    assert statements == []
+    assert second == first
+    assert len(get_metrics_cache()) == 1
+
+
+def test_dashboard_cache_invalidated_by_equipo_flush(app, data):
+    superadmin = db.session.get(Usuario, data["superadmin"].id)
+    before = _kpi(collect_dashboard_metrics(superadmin), "equipos")["value"]
+
+    db.session.add(
+        Equipo(
+            tipo=db.session.get(TipoEquipo, data["tipos_equipo"]["router"].id),
+            estado=EstadoEquipo.OPERATIVO,
+            descripcion="Router nuevo",
+            numero_serie="RT-001",
+            hospital=db.session.get(Hospital, data["hospital"].id),
+        )
+    )
+    db.session.commit()
+
+    after = _kpi(collect_dashboard_metrics(superadmin), "equipos")["value"]
+    assert after == before + 1
+
+
+def test_dashboard_cache_disabled_with_zero_timeout(app, data):
+    app.config["DASHBOARD_CACHE_TIMEOUT"] = 0
+    collect_dashboard_metrics(db.session.get(Usuario, data["superadmin"].id))
+    assert len(get_metrics_cache()) == 0
+
+
+def test_dashboard_metrics_query_budget(app, data, capture_statements):
+    app.config["DASHBOARD_CACHE_TIMEOUT"] = 0
+    ensure_daily_snapshot()
+    for username in ("superadmin", "admin"):
+        usuario = db.session.get(Usuario, data[username].id)
+        get_user_hospital_scope(usuario)
+
+        with capture_statements() as statements:
+            payload = collect_dashboard_metrics(usuario)
+
+        assert len(statements) <= 6, statements
+        assert [kpi["key"] for kpi in payload["kpis"]] == [
+            "equipos",
+            "insumos",
+            "hospitales",
+            "licencias_hoy",
+            "licencias_pendientes",
+        ]
+
+
+def test_dashboard_metrics_respect_scope(app, data):
+    app.config["DASHBOARD_CACHE_TIMEOUT"] = 0
+    superadmin = collect_dashboard_metrics(db.session.get(Usuario, data["superadmin"].id))
+    admin = collect_dashboard_metrics(db.session.get(Usuario, data["admin"].id))
+
+    assert _kpi(superadmin, "equipos")["value"] == 3
+    assert _kpi(superadmin, "equipos")["delta"] == 3
+    assert _kpi(superadmin, "hospitales")["value"] == 2
+    assert _kpi(admin, "equipos")["value"] == 2
+    assert _kpi(admin, "hospitales")["value"] == 1
+    assert _kpi(admin, "licencias_pendientes")["value"] == 1
+    assert admin["scope"]["summary"] == "Hospital Central"
+    assert dict(zip(*admin["charts"]["equipment_type"].values())) == {
+        "Impresora": 1,
+        "Notebook": 1,
+    }
+
+
+def test_dashboard_critical_supplies_ranked_in_sql(app, data, capture_statements, explain):
+    app.config["DASHBOARD_CACHE_TIMEOUT"] = 0
+    db.session.add_all(
+        [
+            Insumo(nombre="Toner", stock=0, stock_minimo=4),
+            Insumo(nombre="Cable", stock=1, stock_minimo=4),
+            Insumo(nombre="Papel", stock=0, stock_minimo=10),
+            Insumo(nombre="Teclado", stock=5, stock_minimo=5),
+            Insumo(nombre="Sin minimo", stock=0, stock_minimo=0),
+        ]
+    )
+    db.session.commit()
+
+    with capture_statements() as statements:
+        payload = collect_dashboard_metrics(
+            db.session.get(Usuario, data["superadmin"].id), top_supplies=3
+        )
+
+    [(ranking, parameters)] = statements.matching("ORDER BY round(")
+    plan = explain(ranking, parameters)
+    assert "ix_insumos_criticos" in plan
+    assert "TEMP B-TREE" not in plan
+    assert payload["critical_supplies_total"] == 4
+    assert [row["nombre"] for row in payload["critical_supplies"]] == ["Papel", "Toner", "Cable"]
+    assert payload["critical_supplies"][2] == {
+        "id": payload["critical_supplies"][2]["id"],
+        "nombre": "Cable",
+        "stock": 1,
+        "stock_minimo": 4,
+        "faltante": 3,
+        "coverage_percent": 25,
+    }
+
+
+def test_dashboard_broadcaster_shares_producer_per_scope(app):
+    broadcaster = DashboardBroadcaster(app)
+    first = broadcaster.subscribe([1], interval=30, start=False)
+    second = broadcaster.subscribe([1], interval=30, start=False)
+    other = broadcaster.subscribe("todos", interval=30, start=False)
+
+    assert first is second
+    assert first is not other
+    assert len(broadcaster) == 2
+
+    broadcaster.unsubscribe(first)
+    assert not first.stopped
+    broadcaster.unsubscribe(second)
+    broadcaster.unsubscribe(other)
+    assert first.stopped
+    assert len(broadcaster) == 0
+
+
+def test_dashboard_producer_skips_unchanged_payloads(app):
+    producer = ScopeProducer(app, "todos", interval=30)
+    payload = {"kpis": [{"key": "equipos", "value": 3}], "generated_at": "a"}
+
+    assert producer.publish(payload) is True
+    assert producer.publish({**payload, "generated_at": "b"}) is False
+    assert producer.version == 1
+    assert producer.publish({**payload, "kpis": []}) is True
+    assert producer.version == 2
+
+
+def test_dashboard_stream_events_fan_out(app):
+    broadcaster = DashboardBroadcaster(app)
+    producer = broadcaster.subscribe("todos", interval=30, start=False)
+    producer.publish({"kpis": [], "generated_at": "a"})
+
+    events = stream_scope_events(
+        broadcaster, "todos", interval=30, heartbeat=0.01, retry=5000, max_age=60
+    )
+    assert next(events) == "retry: 5000\n\n"
+    assert next(events).startswith('data: {"kpis": []')
+    assert next(events) == ": keep-alive\n\n"
+    assert producer.subscribers == 2
+
+    events.close()
+    assert producer.subscribers == 1
+    broadcaster.unsubscribe(producer)
+    assert len(broadcaster) == 0
+
+
+def test_dashboard_deltas_use_daily_snapshot(app, data):
+    app.config["DASHBOARD_CACHE_TIMEOUT"] = 0
+    today = datetime.utcnow().date()
+    take_snapshot(db.session, today - timedelta(days=8))
+
+    db.session.add(
+        Equipo(
+            tipo=db.session.get(TipoEquipo, data["tipos_equipo"]["router"].id),
+            estado=EstadoEquipo.OPERATIVO,
+            descripcion="Router nuevo",
+            numero_serie="RT-002",
+            hospital=db.session.get(Hospital, data["hospital"].id),
+        )
+    )
+    db.session.commit()
+
+    superadmin = collect_dashboard_metrics(db.session.get(Usuario, data["superadmin"].id))
+    admin = collect_dashboard_metrics(db.session.get(Usuario, data["admin"].id))
+    assert _kpi(superadmin, "equipos")["delta"] == 1
+    assert _kpi(admin, "equipos")["delta"] == 1
+    assert _kpi(superadmin, "hospitales")["delta"] == 0
+    assert MetricaDiaria.query.filter_by(fecha=today).count() > 0
+
+
+def test_metrics_snapshot_command_is_idempotent(app, data):
+    runner = app.test_cli_runner()
+    for _ in range(2):
+        result = runner.invoke(args=["metrics", "snapshot"])
+        assert result.exit_code == 0, result.output
+
+    today = datetime.utcnow().date()
+    equipos = MetricaDiaria.query.filter_by(fecha=today, metrica="equipos", hospital_id=None).one()
+    assert equipos.valor == 3
+
+
+def test_global_snapshot_rows_are_unique(app, data):
+    today = datetime.utcnow().date()
+    take_snapshot(db.session, today)
+    db.session.add(MetricaDiaria(fecha=today, hospital_id=None, metrica="equipos", clave="", valor=3))
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
+
+
+def test_dashboard_trends_endpoint_scoped(client, data):
+    login(client, "admin", "Cambiar123!")
+    response = client.get("/api/dashboard/trends?days=90")
+    assert response.status_code == 200
+    payload = response.get_json()
+    assert payload["days"] == 90
+    assert payload["labels"] == [datetime.utcnow().date().isoformat()]
+    assert payload["series"]["equipos"] == [2]
+    assert payload["series"]["hospitales"] == [1]
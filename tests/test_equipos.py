@@ -1,8 +1,14 @@
+import re
 from io import BytesIO
 from pathlib import Path
 
-from app.models import Equipo, EquipoAdjunto, EstadoEquipo
+import pytest
+from sqlalchemy import select
+
+from app.extensions import db
+from app.models import Equipo, EquipoAdjunto, EquipoHistorial, EstadoEquipo
 from app.services import file_service
+from app.utils.search import build_substring_search
 
 
 def login(client, username: str, password: str) -> None:
@@ -144,3 +150,701 @@ def test_equipo_adjuntos_thumbnail_without_pillow(
     delete_resp = client.post(f"/files/delete/{adjunto.id}", follow_redirects=False)
     assert delete_resp.status_code == 302
     assert EquipoAdjunto.query.get(adjunto.id) is None
+
+
+def test_equipo_normalized_serial_columns(app, data):
+    equipo = db.session.get(Equipo, data["equipo"].id)
+    assert equipo.numero_serie_norm == "sn001"
+
+    equipo.numero_serie = "AB 12/34-Ñ"
+    db.session.commit()
+    assert equipo.numero_serie_norm == "ab1234n"
+
+
+def test_equipo_serial_search_matches_normalized_prefix(app):
+    if db.engine.dialect.name != "sqlite":
+        pytest.skip("SQLite fallback only")
+
+    condition = build_substring_search(
+        [Equipo.descripcion, Equipo.codigo, Equipo.numero_serie],
+        "sn00",
+        serial_columns=[Equipo.numero_serie_norm, Equipo.codigo_norm],
+    )
+    assert db.session.scalars(select(Equipo.numero_serie).where(condition)).all() == ["SN-001"]
+
+
+def test_listar_equipos_busca_serie_por_prefijo(client, admin_credentials):
+    login(client, **admin_credentials)
+    response = client.get("/equipos/?buscar=sn00")
+    html = response.get_data(as_text=True)
+    assert response.status_code == 200
+    assert "Notebook Lenovo" in html
+    assert "Impresora HP Central" not in html
+
+
+def _listar_page(client, url: str) -> tuple[list[int], dict[str, str]]:
+    html = client.get(url).get_data(as_text=True)
+    ids = [int(value) for value in re.findall(r'href="/equipos/(\d+)">Ver</a>', html)]
+    links = {
+        label: href.replace("&amp;", "&")
+        for href, label in re.findall(r'href="([^"]+)" aria-label="(\w+)"', html)
+    }
+    return ids, links
+
+
+def test_listar_equipos_pagina_por_cursor(app, client, data, superadmin_credentials):
+    app.config["DEFAULT_PAGE_SIZE"] = 1
+    login(client, **superadmin_credentials)
+    expected = [
+        equipo.id for equipo in Equipo.query.order_by(Equipo.created_at.desc(), Equipo.id.desc())
+    ]
+
+    seen: list[int] = []
+    url = "/equipos/"
+    while url:
+        ids, links = _listar_page(client, url)
+        seen.extend(ids)
+        url = links.get("Siguiente")
+    assert seen == expected
+
+    # From the last page (served backwards, no OFFSET) walk back to the first.
+    ids, links = _listar_page(client, f"/equipos/?page={len(expected)}")
+    back = list(ids)
+    while "Anterior" in links:
+        assert ".b." in links["Anterior"]
+        ids, links = _listar_page(client, links["Anterior"])
+        back[:0] = ids
+    assert back == expected
+
+
+def test_listar_equipos_cachea_el_total(app, client, superadmin_credentials, data, capture_statements):
+    login(client, **superadmin_credentials)
+    with capture_statements() as statements:
+        client.get("/equipos/?estado=")
+        client.get("/equipos/?estado=")
+        assert len(statements.matching("count(")) == 1
+        db.session.add(
+            Equipo(
+                descripcion="Equipo nuevo",
+                tipo_id=data["tipos_equipo"]["router"].id,
+                estado=EstadoEquipo.OPERATIVO,
+                hospital_id=data["hospital"].id,
+                numero_serie="CACHE-001",
+            )
+        )
+        db.session.commit()
+        client.get("/equipos/?estado=")
+        assert len(statements.matching("count(")) == 2
+
+
+def test_listar_equipos_rechaza_cursor_invalido(client, superadmin_credentials):
+    login(client, **superadmin_credentials)
+    assert client.get("/equipos/?page=2.a.basura").status_code == 400
+
+
+def test_historial_por_equipo_usa_indice_compuesto(
+    app, client, superadmin_credentials, data, capture_statements, explain
+):
+    equipo_id = data["equipo"].id
+    db.session.execute(
+        EquipoHistorial.__table__.insert(),
+        [{"equipo_id": equipo_id, "accion": f"Evento {numero}"} for numero in range(4)],
+    )
+    db.session.commit()
+    login(client, **superadmin_credentials)
+    url = f"/equipos/{equipo_id}/historial/datos"
+
+    with capture_statements() as statements:
+        primera = client.get(url, query_string={"limit": 2}).get_json()
+        client.get(url, query_string={"limit": 2, "cursor": primera["next_cursor"]})
+
+    paginas = statements.matching("FROM equipos_historial")
+    assert len(paginas) == 2
+    for sql, parameters in paginas:
+        plan = explain(sql, parameters)
+        assert "ix_equipos_historial_equipo_id_fecha_id" in plan
+        assert "TEMP B-TREE" not in plan
+
+
+def test_index_audit_cubre_columnas_de_filtro(app):
+    from sqlalchemy import Column, ForeignKey, Integer, MetaData, Table
+
+    from app.services.index_audit_service import ALLOWED_UNINDEXED, audit_indexes
+
+    assert audit_indexes(db.metadata, db.Model.registry, ALLOWED_UNINDEXED) == []
+    result = app.test_cli_runner().invoke(args=["db", "index-audit", "--strict"])
+    assert result.exit_code == 0, result.output
+
+    metadata = MetaData()
+    Table("padres", metadata, Column("id", Integer, primary_key=True))
+    Table(
+        "hijos",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("padre_id", ForeignKey("padres.id")),
+    )
+    [finding] = audit_indexes(metadata)
+    assert str(finding) == "hijos(padre_id): clave foránea a padres sin índice"
+    assert audit_indexes(metadata, allowed=[("hijos", ("padre_id",))]) == []
+
+
+def test_importar_equipos_csv_por_lotes(app, data, tmp_path, capture_statements):
+    from app.models import SearchDocument
+
+    archivo = tmp_path / "equipos.csv"
+    archivo.write_text(
+        "Hospital;Tipo;Servicio;Oficina;Código patrimonial;Número de serie;Estado;Fecha compra\n"
+        "HCN;Notebook;Emergencias;Oficina Principal;IMP-1;SN-IMP-1;operativo;2024-03-01\n"
+        "Hospital Central;router;;;IMP-2;;en taller;01/02/2023\n"
+        "HCN;Tostadora;;;IMP-3;SN-IMP-3;;\n"
+        "HCN;Notebook;;;EQ-100;SN-IMP-4;;\n"
+        "HCN;Notebook;;;IMP-1;SN-IMP-5;;\n",
+        encoding="utf-8",
+    )
+
+    with app.app_context(), capture_statements() as statements:
+        result = app.test_cli_runner().invoke(
+            args=["equipos", "import", str(archivo), "--usuario", "admin"]
+        )
+
+    assert result.exit_code == 0, result.output
+    assert "Equipos importados: 2 de 5 filas, 3 con errores" in result.output
+    assert "Fila 4: Tipo de equipo desconocido: Tostadora" in result.output
+    assert "Fila 5: Ya existe un equipo con el código EQ-100." in result.output
+    assert "Fila 6: Código patrimonial repetido en el archivo: IMP-1" in result.output
+    assert len(statements.matching("INSERT INTO equipos ")) == 1
+
+    primero = Equipo.query.filter_by(codigo="IMP-1").one()
+    assert primero.oficina_id == data["oficina"].id
+    assert primero.servicio_id == data["servicio"].id
+    assert primero.numero_serie_norm == "snimp1"
+    assert str(primero.fecha_ingreso) == "2024-03-01"
+    assert [(h.accion, h.usuario.username) for h in primero.historial] == [("Alta", "admin")]
+
+    segundo = Equipo.query.filter_by(codigo="IMP-2").one()
+    assert segundo.sin_numero_serie and segundo.numero_serie.startswith("EQ-")
+    assert segundo.estado == EstadoEquipo.EN_TALLER
+    assert SearchDocument.query.filter_by(entidad="equipo", entidad_id=segundo.id).count() == 1
+
+
+def test_importar_equipos_informa_la_fila_real(app, data, tmp_path):
+    import zipfile
+
+    from app.services.equipo_import_service import importar_equipos
+    from app.utils.xlsx import SimpleXLSX
+
+    archivo = tmp_path / "equipos.csv"
+    archivo.write_text(
+        "hospital;tipo;codigo;descripcion\n"
+        'HCN;Notebook;ML-1;"Primera línea\nsegunda línea"\n'
+        "HCN;Tostadora;ML-2;\n",
+        encoding="utf-8",
+    )
+    libro = SimpleXLSX()
+    libro.add_sheet("Equipos", [["hospital", "tipo"], ["HCN", "Notebook"], [], ["HCN", "Tostadora"]])
+    original = zipfile.ZipFile(libro.to_bytes())
+    xlsx = BytesIO()
+    # Spreadsheet writers leave empty rows out of the sheet XML.
+    with zipfile.ZipFile(xlsx, "w") as destino:
+        for item in original.infolist():
+            contenido = original.read(item)
+            if item.filename.startswith("xl/worksheets/"):
+                contenido = contenido.replace(b'<row r="3"/>', b"")
+            destino.writestr(item, contenido)
+    xlsx.seek(0)
+
+    with app.app_context():
+        with archivo.open("rb") as stream:
+            desde_csv = importar_equipos(db.session, stream, "equipos.csv")
+        desde_xlsx = importar_equipos(db.session, xlsx, "equipos.xlsx")
+
+    assert [(error.fila, error.mensaje) for error in desde_csv.errores] == [
+        (4, "Tipo de equipo desconocido: Tostadora")
+    ]
+    assert [error.fila for error in desde_xlsx.errores] == [4]
+
+
+def test_importar_equipos_csv_de_excel_en_windows_1252(app, data, tmp_path):
+    from app.services.equipo_import_service import importar_equipos
+
+    archivo = tmp_path / "equipos.csv"
+    archivo.write_bytes(
+        "Hospital;Tipo;Código patrimonial;Descripción\r\nHCN;Notebook;W-1;Guardia Médica\r\n".encode(
+            "cp1252"
+        )
+    )
+
+    with app.app_context():
+        with archivo.open("rb") as stream:
+            result = importar_equipos(db.session, stream, "equipos.csv")
+        descripcion = db.session.scalar(select(Equipo.descripcion).where(Equipo.codigo == "W-1"))
+
+    assert result.errores == []
+    assert descripcion == "Guardia Médica"
+
+
+def test_importar_equipos_rechaza_fechas_numericas_fuera_de_rango(app, data):
+    import zipfile
+
+    from app.services.equipo_import_service import importar_equipos
+    from app.utils.xlsx import SimpleXLSX
+
+    libro = SimpleXLSX()
+    libro.add_sheet(
+        "Equipos",
+        [
+            ["hospital", "tipo", "fecha_ingreso"],
+            ["HCN", "Notebook", 20240115],
+            ["HCN", "Notebook", 1],
+            ["HCN", "Notebook", 45306],
+        ],
+    )
+    original = zipfile.ZipFile(libro.to_bytes())
+    xlsx = BytesIO()
+    # Turn the third row's date cell into a boolean one, as Excel writes TRUE.
+    with zipfile.ZipFile(xlsx, "w") as destino:
+        for item in original.infolist():
+            contenido = original.read(item)
+            if item.filename.startswith("xl/worksheets/"):
+                contenido = contenido.replace(b'<c r="C3">', b'<c r="C3" t="b">')
+            destino.writestr(item, contenido)
+    xlsx.seek(0)
+
+    with app.app_context():
+        result = importar_equipos(db.session, xlsx, "equipos.xlsx")
+
+    assert [(error.fila, error.mensaje) for error in result.errores] == [
+        (2, "Fecha inválida en fecha_ingreso: 20240115"),
+        (3, "Fecha inválida en fecha_ingreso: True"),
+    ]
+    assert result.creados == 1
+
+
+def test_importar_equipos_aisla_la_fila_en_conflicto(app, data, tmp_path, monkeypatch):
+    from app.services import equipo_import_service
+
+    archivo = tmp_path / "equipos.csv"
+    archivo.write_text(
+        "hospital;tipo;codigo\n"
+        + "".join(f"HCN;Notebook;{codigo}\n" for codigo in ("LT-1", "LT-2", "EQ-100", "LT-3", "LT-4")),
+        encoding="utf-8",
+    )
+    # Simulates a code saved by another user after the existence check.
+    monkeypatch.setattr(equipo_import_service, "_codigos_existentes", lambda session, codigos: set())
+
+    with app.app_context():
+        with archivo.open("rb") as stream:
+            result = equipo_import_service.importar_equipos(db.session, stream, "equipos.csv")
+        creados = set(db.session.scalars(select(Equipo.codigo).where(Equipo.codigo.like("LT-%"))))
+
+    assert result.creados == 4
+    assert creados == {"LT-1", "LT-2", "LT-3", "LT-4"}
+    assert [error.fila for error in result.errores] == [4]
+    assert result.errores[0].mensaje.startswith("No se pudo guardar la fila por un conflicto de datos")
+
+
+def test_importar_equipos_xlsx_respeta_alcance(client, admin_credentials, data):
+    from app.utils.xlsx import SimpleXLSX
+
+    libro = SimpleXLSX()
+    libro.add_sheet(
+        "Equipos",
+        [
+            ["hospital", "tipo", "marca", "numero_serie", "es_nuevo"],
+            ["HCN", "Impresora", "HP", "XL-1", "sí"],
+            ["HCN", "Impresora", "HP", 123456, "no"],
+            ["HRG", "Impresora", "HP", "XL-3", ""],
+        ],
+    )
+    login(client, **admin_credentials)
+    response = client.post(
+        "/equipos/importar",
+        data={"archivo": (libro.to_bytes(), "equipos.xlsx")},
+        content_type="multipart/form-data",
+    )
+
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    assert "2 equipos creados de 3 filas" in body
+    assert "Hospital desconocido o fuera de tu alcance: HRG" in body
+    assert Equipo.query.filter_by(numero_serie="123456").one().es_nuevo is False
+    assert Equipo.query.filter_by(numero_serie="XL-1").one().es_nuevo is True
+
+
+def test_cambio_masivo_traslada_en_un_solo_update(
+    app, client, superadmin_credentials, data, capture_statements
+):
+    from app.models import Auditoria, InsumoHospital, InsumoSerie
+
+    ids = [data["equipo"].id, data["equipo_impresora"].id]
+    serie = InsumoSerie(insumo_id=data["insumo"].id, nro_serie="MOUSE-200")
+    db.session.add(serie)
+    db.session.commit()
+    login(client, **superadmin_credentials)
+    client.post(f"/equipos/{ids[0]}/insumos/asociar", json={"nro_serie": "MOUSE-200"})
+
+    with app.app_context(), capture_statements() as statements:
+        response = client.post(
+            "/equipos/lote",
+            data={
+                "ids": [str(equipo_id) for equipo_id in ids],
+                "estado": EstadoEquipo.PRESTADO.value,
+                "oficina_id": str(data["oficina_secundaria"].id),
+                "motivo": "Mudanza",
+            },
+        )
+
+    assert response.status_code == 302
+    assert len(statements.matching("UPDATE equipos SET")) == 1
+    assert len(statements.matching("INSERT INTO equipos_historial ")) == 1
+
+    db.session.expire_all()
+    for equipo_id in ids:
+        equipo = db.session.get(Equipo, equipo_id)
+        assert equipo.estado == EstadoEquipo.PRESTADO
+        assert equipo.hospital_id == data["hospital_secundario"].id
+        assert equipo.servicio_id == data["servicio_secundario"].id
+        assert equipo.oficina_id == data["oficina_secundaria"].id
+        assert equipo.historial[0].accion == "Traslado"
+        assert "Motivo: Mudanza" in equipo.historial[0].descripcion
+
+    entrada = Auditoria.query.filter_by(accion="cambio_masivo").one()
+    assert sorted(entrada.cambios["ids"]) == sorted(ids)
+    assert db.session.get(InsumoHospital, (data["insumo"].id, data["hospital_secundario"].id))
+
+
+def test_cambio_masivo_limpia_los_caches_al_confirmar(app, data):
+    from app.services.dashboard_service import get_metrics_cache
+    from app.services.equipo_bulk_service import CambioMasivo, aplicar_cambio_masivo
+    from app.services.equipo_service import get_count_cache
+
+    seleccion = Equipo.query.filter(Equipo.id == data["equipo"].id)
+    aplicar_cambio_masivo(
+        db.session,
+        seleccion,
+        CambioMasivo(estado=EstadoEquipo.PRESTADO),
+        usuario_id=None,
+    )
+    # Another request refills both caches before the bulk change commits.
+    get_count_cache().set("total", 5)
+    get_metrics_cache().set("todos", {"equipos": 5})
+
+    db.session.rollback()
+    assert len(get_count_cache()) == 1
+    assert len(get_metrics_cache()) == 1
+
+    aplicar_cambio_masivo(
+        db.session,
+        seleccion,
+        CambioMasivo(estado=EstadoEquipo.PRESTADO),
+        usuario_id=None,
+    )
+    get_count_cache().set("total", 5)
+    get_metrics_cache().set("todos", {"equipos": 5})
+    db.session.commit()
+
+    assert len(get_count_cache()) == 0
+    assert len(get_metrics_cache()) == 0
+
+
+def test_cambio_masivo_por_filtro_valida_la_ubicacion(client, superadmin_credentials, data):
+    login(client, **superadmin_credentials)
+    response = client.post(
+        "/equipos/lote?buscar=Impresora",
+        data={
+            "aplicar_filtro": "y",
+            "hospital_id": str(data["hospital"].id),
+            "servicio_id": str(data["servicio_secundario"].id),
+        },
+    )
+    assert response.status_code == 302
+    assert "buscar=Impresora" in response.headers["Location"]
+    assert db.session.get(Equipo, data["equipo_impresora_regional"].id).hospital_id == (
+        data["hospital_secundario"].id
+    )
+
+    response = client.post(
+        "/equipos/lote?buscar=Impresora",
+        data={"aplicar_filtro": "y", "estado": EstadoEquipo.DE_BAJA.value},
+    )
+    db.session.expire_all()
+    assert db.session.get(Equipo, data["equipo_impresora"].id).estado == EstadoEquipo.DE_BAJA
+    assert db.session.get(Equipo, data["equipo_impresora_regional"].id).estado == EstadoEquipo.DE_BAJA
+    assert db.session.get(Equipo, data["equipo"].id).estado == EstadoEquipo.OPERATIVO
+
+
+def test_reserva_de_seriales_internos_por_bloque(app, data, capture_statements):
+    from datetime import datetime
+
+    from app.models import Secuencia
+    from app.services.equipo_service import generate_internal_serial, reserve_internal_serials
+
+    dia = datetime(2024, 5, 2)
+    equipo = db.session.get(Equipo, data["equipo"].id)
+    equipo.numero_serie = "EQ-20240502-0007"
+    db.session.commit()
+
+    # The first use seeds the counter from the existing serials.
+    assert generate_internal_serial(db.session, dia) == "EQ-20240502-0008"
+    with capture_statements() as statements:
+        bloque = reserve_internal_serials(db.session, 3, dia)
+
+    assert bloque == ["EQ-20240502-0009", "EQ-20240502-0010", "EQ-20240502-0011"]
+    assert len(statements) == 1 and statements[0].startswith("UPDATE secuencias")
+    db.session.commit()
+    assert db.session.get(Secuencia, "EQ-20240502").valor == 11
+    assert reserve_internal_serials(db.session, 1, datetime(2024, 5, 3)) == ["EQ-20240503-0001"]
+
+
+def test_detalle_carga_pestanas_por_separado_con_etag(
+    app, client, superadmin_credentials, data, capture_statements
+):
+    from app.models import InsumoSerie
+
+    equipo = data["equipo"]
+    db.session.add(InsumoSerie(insumo_id=data["insumo"].id, nro_serie="MOUSE-300"))
+    db.session.commit()
+    login(client, **superadmin_credentials)
+
+    with capture_statements() as statements:
+        response = client.get(f"/equipos/{equipo.id}")
+
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    etag = response.headers["ETag"]
+    body = response.get_data(as_text=True)
+    assert f'/equipos/{equipo.id}/insumos/datos' in body
+    assert f'/equipos/{equipo.id}/evidencias/datos' in body
+    tablas = ("equipos_insumos", "equipos_historial", "acta_items", "equipos_adjuntos")
+    assert len([sql for sql in statements if any(tabla in sql for tabla in tablas)]) == 1
+
+    assert client.get(f"/equipos/{equipo.id}", headers={"If-None-Match": etag}).status_code == 304
+
+    # A new CSRF token (e.g. after logging in again) invalidates the cached page.
+    with client.session_transaction() as sesion:
+        sesion["csrf_token"] = "otro-token"
+    renovada = client.get(f"/equipos/{equipo.id}", headers={"If-None-Match": etag})
+    assert renovada.status_code == 200
+    etag = renovada.headers["ETag"]
+
+    from app.security.principal import bump_role_version
+
+    bump_role_version(data["superadmin"].rol_id)
+    db.session.commit()
+    por_permisos = client.get(f"/equipos/{equipo.id}", headers={"If-None-Match": etag})
+    assert por_permisos.status_code == 200
+    etag = por_permisos.headers["ETag"]
+
+    client.post(f"/equipos/{equipo.id}/insumos/asociar", json={"nro_serie": "MOUSE-300"})
+    refreshed = client.get(f"/equipos/{equipo.id}", headers={"If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert refreshed.headers["ETag"] != etag
+
+    insumos = client.get(f"/equipos/{equipo.id}/insumos/datos?limit=5").get_json()
+    assert insumos["total"] == 1
+    assert insumos["items"][0]["serie"]["nro_serie"] == "MOUSE-300"
+    evidencias = client.get(f"/equipos/{equipo.id}/evidencias/datos").get_json()
+    assert evidencias == {
+        "items": [],
+        "total": 0,
+        "limit": 10,
+        "offset": 0,
+        "next_offset": None,
+        "previous_offset": None,
+    }
+
+
+def test_historial_datos_pagina_por_cursor(app, client, superadmin_credentials, data, capture_statements):
+    from datetime import datetime, timedelta
+
+    equipo = data["equipo"]
+    usuario_id = data["superadmin"].id
+    base = datetime(2024, 5, 1, 12, 0)
+    db.session.execute(
+        EquipoHistorial.__table__.insert(),
+        [
+            {
+                "equipo_id": equipo.id,
+                "usuario_id": usuario_id,
+                "accion": f"Evento {numero}",
+                # Pairs of events share a timestamp; ``id`` orders them.
+                "fecha": base + timedelta(minutes=numero // 2),
+            }
+            for numero in range(7)
+        ],
+    )
+    db.session.commit()
+    login(client, **superadmin_credentials)
+    url = f"/equipos/{equipo.id}/historial/datos"
+
+    with capture_statements() as statements:
+        primera = client.get(url, query_string={"limit": 3, "tipo": "Evento"}).get_json()
+
+    assert "total" not in primera
+    assert [item["accion"] for item in primera["items"]] == ["Evento 6", "Evento 5", "Evento 4"]
+    assert all(item["usuario"] for item in primera["items"])
+    assert not [sql for sql in statements if "count(" in sql.lower()]
+    assert [sql for sql in statements if "LEFT OUTER JOIN usuarios" in sql]
+
+    vistos = [item["accion"] for item in primera["items"]]
+    cursor = primera["next_cursor"]
+    while cursor:
+        pagina = client.get(
+            url, query_string={"limit": 3, "tipo": "Evento", "cursor": cursor, "with_total": 1}
+        ).get_json()
+        assert pagina["total"] == 7
+        vistos.extend(item["accion"] for item in pagina["items"])
+        cursor = pagina["next_cursor"]
+    assert vistos == [f"Evento {numero}" for numero in range(6, -1, -1)]
+
+    assert client.get(url, query_string={"cursor": "no-es-un-cursor"}).status_code == 400
+
+    completo = client.get(f"/equipos/{equipo.id}/historial", query_string={"accion": "Evento"})
+    assert completo.status_code == 200
+    assert "Anteriores" in completo.get_data(as_text=True)
+
+
+def test_actas_por_equipo_paginan_sobre_el_indice(app, client, superadmin_credentials, data, explain):
+    from app.models import Acta, ActaItem, TipoActa
+    from app.services.acta_service import actas_de_equipo
+
+    equipo = data["equipo"]
+    otro = data["equipo_impresora"]
+    for numero in range(4):
+        acta = Acta(
+            tipo=TipoActa.PRESTAMO if numero % 2 else TipoActa.ENTREGA,
+            hospital_id=data["hospital"].id,
+        )
+        # The equipo appears twice in the same acta; the acta is listed once.
+        acta.items.extend(
+            [ActaItem(equipo_id=equipo.id), ActaItem(equipo_id=equipo.id), ActaItem(equipo_id=otro.id)]
+        )
+        db.session.add(acta)
+    db.session.commit()
+    esperadas = db.session.scalars(
+        select(ActaItem.acta_id)
+        .where(ActaItem.equipo_id == equipo.id)
+        .distinct()
+        .order_by(ActaItem.acta_id.desc())
+    ).all()
+    assert len(esperadas) == 5
+
+    page = actas_de_equipo(equipo.id, per_page=2, with_total=True)
+    assert page.total == 5
+    assert [acta.id for acta in page.items] == esperadas[:2]
+    assert [acta.items_count for acta in page.items] == [3, 3]
+
+    login(client, **superadmin_credentials)
+    url = f"/equipos/{equipo.id}/actas/datos"
+    vistas = []
+    cursor = None
+    while True:
+        respuesta = client.get(url, query_string={"limit": 2, "cursor": cursor or ""}).get_json()
+        assert "total" not in respuesta
+        vistas.extend(item["id"] for item in respuesta["items"])
+        cursor = respuesta["next_cursor"]
+        if not cursor:
+            break
+    assert vistas == esperadas
+
+    prestamos = client.get(url, query_string={"tipo": TipoActa.PRESTAMO.value, "with_total": 1}).get_json()
+    assert prestamos["total"] == 2
+    assert {item["tipo"] for item in prestamos["items"]} == {TipoActa.PRESTAMO.value}
+
+    completas = client.get(f"/equipos/{equipo.id}/actas")
+    assert completas.status_code == 200
+    assert "3 ítems" in completas.get_data(as_text=True)
+
+    if db.engine.dialect.name == "sqlite":
+        plan = explain(
+            select(ActaItem.acta_id)
+            .where(ActaItem.equipo_id == equipo.id)
+            .distinct()
+            .order_by(ActaItem.acta_id.desc())
+        )
+        assert "COVERING INDEX ix_acta_items_equipo_id_acta_id" in plan
+
+
+def _png_falso(payload: str) -> bytes:
+    return b"PNG " + payload.encode("utf-8")
+
+
+def _png_sin_uso(payload: str) -> bytes:
+    raise AssertionError(f"QR regenerado para {payload}")
+
+
+def test_qr_en_lote_con_procesos(monkeypatch, tmp_path):
+    pytest.importorskip("qrcode")
+    from app.services import qr_service
+
+    monkeypatch.setattr(qr_service, "POOL_THRESHOLD", 1)
+    payloads = [f"https://inventario.test/equipos/{numero}" for numero in range(8)]
+    rutas = qr_service.render_qr_batch(payloads, tmp_path, processes=2)
+    assert sorted(rutas) == sorted(payloads)
+    assert all(ruta.read_bytes().startswith(b"\x89PNG") for ruta in rutas.values())
+
+
+def test_etiquetas_qr_reutilizan_la_cache(app, client, superadmin_credentials, data, monkeypatch, tmp_path):
+    from app.services import pdf_service, qr_service
+    from app.services.etiqueta_service import preparar_etiquetas, render_hoja
+
+    monkeypatch.setattr(qr_service, "qrcode", object())
+    monkeypatch.setattr(qr_service, "_render_label_png", _png_falso)
+    monkeypatch.setitem(app.config, "QR_CACHE_FOLDER", str(tmp_path / "qr"))
+    monkeypatch.setitem(app.config, "QR_BASE_URL", "https://inventario.test")
+    seleccion = Equipo.query.filter(Equipo.hospital_id == data["hospital"].id)
+    etiquetas = preparar_etiquetas(seleccion, processes=1)
+    assert etiquetas
+    assert all(etiqueta.qr_path.is_file() for etiqueta in etiquetas)
+    assert etiquetas[0].url == f"https://inventario.test/equipos/{etiquetas[0].equipo_id}"
+
+    # Re-printing only reads the cache.
+    monkeypatch.setattr(qr_service, "_render_label_png", _png_sin_uso)
+    assert [etiqueta.qr_path for etiqueta in preparar_etiquetas(seleccion)] == [
+        etiqueta.qr_path for etiqueta in etiquetas
+    ]
+    hoja = render_hoja(etiquetas, tmp_path / "etiquetas.pdf")
+    assert hoja.stat().st_size > 0
+
+    login(client, **superadmin_credentials)
+    respuesta = client.get("/equipos/etiquetas", query_string={"hospital_id": data["hospital"].id})
+    assert respuesta.status_code == 200
+    if pdf_service.HTML is not None:
+        assert respuesta.mimetype == "application/pdf"
+        return
+    html = respuesta.get_data(as_text=True)
+    imagen = f"/equipos/qr/{etiquetas[0].digest}.png"
+    assert imagen in html
+    png = client.get(imagen)
+    assert png.status_code == 200
+    assert png.data == etiquetas[0].qr_path.read_bytes()
+    assert png.cache_control.max_age == 31536000
+    assert client.get(f"/equipos/qr/{'0' * 64}.png").status_code == 404
+
+
+def test_cli_etiquetas_escribe_html_sin_weasyprint(app, data, monkeypatch, tmp_path):
+    from app.services import pdf_service, qr_service
+
+    monkeypatch.setattr(pdf_service, "HTML", None)
+    monkeypatch.setattr(qr_service, "qrcode", object())
+    monkeypatch.setattr(qr_service, "_render_label_png", _png_falso)
+    monkeypatch.setitem(app.config, "QR_CACHE_FOLDER", str(tmp_path / "qr"))
+
+    result = app.test_cli_runner().invoke(
+        args=[
+            "equipos",
+            "etiquetas",
+            "--hospital",
+            str(data["hospital"].id),
+            "--output",
+            str(tmp_path / "etiquetas.pdf"),
+            "--base-url",
+            "https://inventario.test",
+            "--processes",
+            "1",
+        ]
+    )
+    assert result.exit_code == 0, result.output
+    assert not (tmp_path / "etiquetas.pdf").exists()
+    assert "file://" in (tmp_path / "etiquetas.html").read_text(encoding="utf-8")
+    assert "etiquetas.html" in result.output
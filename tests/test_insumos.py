@@ -3,10 +3,19 @@ from __future__ import annotations
 
 import pytest
 
-from app.models import Insumo, InsumoSerie, MovimientoTipo
+from app.extensions import db
+from app.models import Equipo, EquipoInsumo, Insumo, InsumoHospital, InsumoSerie, MovimientoTipo
 from app.services import insumo_service
 
 
+def login(client, username: str, password: str) -> None:
+    client.post(
+        "/auth/login",
+        data={"username": username, "password": password},
+        follow_redirects=False,
+    )
+
+
 def test_registrar_movimiento_actualiza_stock(app, data):
     insumo_id = data["insumo"].id
 
@@ -91,3 +100,61 @@ def test_agregar_series_valida_duplicados(app, data):
                 insumo=insumo,
                 numeros_serie=["SSD-010", "SSD-011", "SSD-011"],
             )
+
+
+def test_asociar_y_quitar_insumo_mantienen_insumo_hospital(client, admin_credentials, data):
+    insumo_id = data["insumo"].id
+    equipo_id = data["equipo"].id
+    serie = InsumoSerie(insumo_id=insumo_id, nro_serie="MOUSE-100")
+    db.session.add(serie)
+    db.session.commit()
+    login(client, **admin_credentials)
+
+    resp = client.post(f"/equipos/{equipo_id}/insumos/asociar", json={"nro_serie": "MOUSE-100"})
+    assert resp.status_code == 201
+    fila = db.session.get(InsumoHospital, (insumo_id, data["hospital"].id))
+    assert fila is not None and fila.asociaciones == 1
+
+    resp = client.post(
+        f"/equipos/{equipo_id}/insumos/quitar", json={"insumo_serie_id": serie.id}
+    )
+    assert resp.status_code == 200
+    db.session.expire_all()
+    assert InsumoHospital.query.filter_by(insumo_id=insumo_id).count() == 0
+
+
+def test_listar_insumos_filtra_por_hospital_materializado(client, gestor_credentials, data):
+    regional = db.session.get(Equipo, data["equipo_impresora_regional"].id)
+    insumo = Insumo(nombre="Toner regional", stock=3, stock_minimo=1)
+    serie = InsumoSerie(insumo=insumo, nro_serie="TON-REG-1", equipo=regional)
+    db.session.add_all(
+        [insumo, serie, EquipoInsumo(equipo=regional, insumo=insumo, serie=serie)]
+    )
+    db.session.commit()
+    assert insumo_service.reconstruir_insumo_hospital() == 1
+
+    login(client, **gestor_credentials)
+    resp = client.get("/insumos/")
+    assert resp.status_code == 200
+    html = resp.get_data(as_text=True)
+    assert "Mouse óptico" in html
+    assert "Toner regional" not in html
+
+
+def test_series_disponibles_busca_serie_normalizada(client, admin_credentials, data):
+    insumo_id = data["insumo"].id
+    db.session.add_all(
+        [
+            InsumoSerie(insumo_id=insumo_id, nro_serie="MOUSE-100"),
+            InsumoSerie(insumo_id=insumo_id, nro_serie="MOUSE-200"),
+        ]
+    )
+    db.session.commit()
+    assert InsumoSerie.query.filter_by(nro_serie="MOUSE-100").one().nro_serie_norm == "mouse100"
+    login(client, **admin_credentials)
+
+    resp = client.get("/insumos/series?q=óptico")
+    assert [item["id"] for item in resp.get_json()["items"]] == ["MOUSE-100", "MOUSE-200"]
+
+    resp = client.get("/insumos/series?q=mouse1")
+    assert [item["id"] for item in resp.get_json()["items"]] == ["MOUSE-100"]
@@ -5,16 +5,26 @@ from datetime import date, timedelta
 
 import pytest
 
+from app.extensions import db
 from app.models import EstadoLicencia, Licencia, TipoLicencia, Usuario, Hospital
 from app.services.licencia_service import (
     aprobar_licencia,
     cancelar_licencia,
     crear_licencia,
     enviar_licencia,
+    estado_licencia_usuario,
     licencias_superpuestas,
 )
 
 
+def login(client, username: str, password: str) -> None:
+    client.post(
+        "/auth/login",
+        data={"username": username, "password": password},
+        follow_redirects=False,
+    )
+
+
 def test_crear_y_enviar_licencia(app, data):
     usuario_id = data["admin"].id
     hospital_id = data["hospital"].id
@@ -86,3 +96,52 @@ def test_cancelar_licencia(app, data):
         assert licencia is not None and admin is not None
         cancelar_licencia(licencia, admin)
         assert licencia.estado == EstadoLicencia.CANCELADA
+
+
+def test_estado_licencia_usuario_calcula_vigencia(app, data):
+    hoy = date.today()
+    usuario = db.session.get(Usuario, data["admin"].id)
+    superadmin = db.session.get(Usuario, data["superadmin"].id)
+    licencia = crear_licencia(
+        usuario=usuario,
+        hospital_id=data["hospital"].id,
+        tipo=TipoLicencia.VACACIONES,
+        fecha_inicio=hoy + timedelta(days=5),
+        fecha_fin=hoy + timedelta(days=8),
+        motivo="Viaje",
+    )
+    aprobar_licencia(licencia, superadmin)
+
+    assert estado_licencia_usuario(usuario.id, hoy) == (False, hoy + timedelta(days=5))
+    assert estado_licencia_usuario(usuario.id, hoy + timedelta(days=6)) == (
+        True,
+        hoy + timedelta(days=9),
+    )
+    assert estado_licencia_usuario(usuario.id, hoy + timedelta(days=9)) == (False, None)
+
+
+def test_validar_licencia_usa_cache_e_invalida_al_aprobar(
+    client, admin_credentials, data, capture_statements
+):
+    login(client, **admin_credentials)
+    assert client.get("/equipos/").status_code == 200
+
+    with capture_statements() as statements:
+        assert client.get("/equipos/").status_code == 200
+    assert not any("from licencias" in statement.lower() for statement in statements)
+    assert not any("sqlite_master" in statement.lower() for statement in statements)
+
+    hoy = date.today()
+    licencia = crear_licencia(
+        usuario=db.session.get(Usuario, data["admin"].id),
+        hospital_id=data["hospital"].id,
+        tipo=TipoLicencia.ENFERMEDAD,
+        fecha_inicio=hoy,
+        fecha_fin=hoy + timedelta(days=2),
+        motivo="Reposo",
+    )
+    aprobar_licencia(licencia, db.session.get(Usuario, data["superadmin"].id))
+
+    resp = client.get("/equipos/")
+    assert resp.status_code == 302
+    assert "/auth/login" in resp.headers["Location"]
@@ -1,7 +1,10 @@
 """Tests for permission scoping."""
 from __future__ import annotations
 
+
+from app.extensions import db
 from app.models import Modulo, Permiso, Usuario
+from app.security.principal import bump_role_version, get_principal
 
 
 def test_modulo_enum_accepts_case_insensitive_values() -> None:
@@ -91,3 +94,36 @@ def test_tecnico_no_puede_guardar_permisos(client, tecnico_credentials, data):
         json={"hospitals": [0], "modules": {}},
     )
     assert resp.status_code == 403
+
+
+def test_principal_compilado_una_vez_por_version(app, data, capture_statements):
+    admin = db.session.get(Usuario, data["admin"].id)
+    principal = get_principal(admin)
+    assert principal.has_permission("inventario:read")
+    assert not principal.has_permission("insumos:read")
+
+    with capture_statements() as statements:
+        assert admin.has_permission("inventario:read")
+        assert admin.allowed_hospital_ids(Modulo.LICENCIAS.value) == {data["hospital"].id}
+        assert get_principal(admin) is principal
+    assert statements == []
+
+    bump_role_version(admin.rol_id)
+    db.session.commit()
+    assert get_principal(admin) is not principal
+    assert get_principal(admin).version == principal.version + 1
+
+
+def test_cambio_de_permisos_invalida_principal_con_version(client, gestor_credentials, data):
+    login(client, **gestor_credentials)
+    assert client.get("/insumos/").status_code == 200
+
+    gestor = db.session.get(Usuario, data["gestor"].id)
+    Permiso.query.filter_by(rol_id=gestor.rol_id, modulo=Modulo.INSUMOS).delete()
+    db.session.commit()
+    # Without a version bump the compiled principal is still served.
+    assert client.get("/insumos/").status_code == 200
+
+    bump_role_version(gestor.rol_id)
+    db.session.commit()
+    assert client.get("/insumos/").status_code == 403
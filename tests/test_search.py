@@ -0,0 +1,131 @@
+"""Tests for the global search index."""
+from __future__ import annotations
+
+
+from app.extensions import db
+from app.models import Equipo, EstadoEquipo, Hospital, Licencia, SearchDocument, TipoEquipo, Usuario
+from app.services.search_service import global_search, search_page
+
+
+def login(client, username: str, password: str) -> None:
+    client.post(
+        "/auth/login",
+        data={"username": username, "password": password},
+        follow_redirects=False,
+    )
+
+
+def test_search_index_follows_equipo_changes(app, data):
+    resultados = global_search("lenovo")
+    assert [item["tipo"] for item in resultados] == ["Equipo"]
+    assert resultados[0]["url"] == f"/equipos/{data['equipo'].id}"
+
+    equipo = db.session.get(Equipo, data["equipo"].id)
+    equipo.descripcion = "Notebook Dell Latitude"
+    equipo.marca = "Dell"
+    db.session.commit()
+    assert global_search("lenovo") == []
+    assert global_search("latit")[0]["titulo"] == "Notebook Dell Latitude"
+
+    db.session.delete(equipo)
+    db.session.commit()
+    assert global_search("latitude") == []
+
+
+def test_search_licencia_title_follows_user_rename(app, data):
+    licencia = db.session.get(Licencia, data["licencia"].id)
+    usuario = db.session.get(Usuario, licencia.user_id)
+    usuario.nombre = "Renombrado"
+    db.session.commit()
+
+    resultados = global_search(licencia.motivo)
+    assert {"tipo": "Licencia", "titulo": "Renombrado"}.items() <= resultados[-1].items()
+
+
+def test_search_scope_is_applied_in_index(app, data):
+    todos = {item["titulo"] for item in global_search("impresora hp")}
+    assert todos == {"Impresora HP Central", "Impresora HP Regional"}
+
+    central = global_search("impresora hp", [data["hospital"].id])
+    assert [item["titulo"] for item in central] == ["Impresora HP Central"]
+
+
+def test_search_route_uses_user_scope(client, admin_credentials):
+    login(client, **admin_credentials)
+    resp = client.get("/search/?q=impresora")
+    assert resp.status_code == 200
+    html = resp.get_data(as_text=True)
+    assert "Impresora HP Central" in html
+    assert "Impresora HP Regional" not in html
+
+
+def test_search_reindex_command_rebuilds_documents(app, data):
+    expected = SearchDocument.query.count()
+    SearchDocument.query.delete()
+    db.session.commit()
+    assert global_search("lenovo") == []
+
+    result = app.test_cli_runner().invoke(args=["search", "reindex", "--batch-size", "2"])
+    assert result.exit_code == 0, result.output
+    assert SearchDocument.query.count() == expected
+    assert global_search("lenovo")
+
+
+def test_search_reindex_if_empty_skips_filled_index(app, data):
+    runner = app.test_cli_runner()
+    expected = SearchDocument.query.count()
+    documento = SearchDocument.query.first()
+    documento.titulo = "Título editado"
+    db.session.commit()
+
+    result = runner.invoke(args=["search", "reindex", "--if-empty"])
+    assert result.exit_code == 0, result.output
+    assert db.session.get(SearchDocument, documento.id).titulo == "Título editado"
+
+    SearchDocument.query.delete()
+    db.session.commit()
+    result = runner.invoke(args=["search", "reindex", "--if-empty"])
+    assert result.exit_code == 0, result.output
+    assert SearchDocument.query.count() == expected
+
+
+def test_search_page_paginates_in_sql_with_facets(app, data, capture_statements):
+    hospital = db.session.get(Hospital, data["hospital"].id)
+    tipo = db.session.get(TipoEquipo, data["tipos_equipo"]["impresora"].id)
+    db.session.add_all(
+        Equipo(
+            tipo=tipo,
+            estado=EstadoEquipo.OPERATIVO,
+            descripcion=f"Impresora HP Piso {numero:02d}",
+            numero_serie=f"HP-{numero:03d}",
+            hospital=hospital,
+        )
+        for numero in range(12)
+    )
+    db.session.commit()
+
+    with capture_statements() as statements:
+        first = search_page("hp", page=1, per_page=10)
+
+    assert len(statements) == 1
+    assert first.counts == {"equipo": 14}
+    assert first.total == 14
+    assert len(first.items) == 10
+    assert first.has_next and not first.has_prev
+
+    second = search_page("hp", page=2, per_page=10)
+    assert len(second.items) == 4
+    assert not second.has_next
+    titulos = [item["titulo"] for item in first.items + second.items]
+    assert titulos == sorted(titulos)
+
+    usuarios = search_page("hp", tipo="usuario")
+    assert usuarios.items == [] and usuarios.total == 0
+
+
+def test_search_route_shows_type_facets(client, superadmin_credentials):
+    login(client, **superadmin_credentials)
+    resp = client.get("/search/?q=admin&tipo=usuario")
+    assert resp.status_code == 200
+    html = resp.get_data(as_text=True)
+    assert "Usuarios <span class=\"badge bg-secondary\">" in html